@@ -0,0 +1,109 @@
+import threading
+import uuid
+from collections import OrderedDict
+
+
+# Prefix of the handles given to the LLM in place of the data
+HANDLE_PREFIX = "artifact://"
+
+# Artifacts kept in memory before the least recently used ones are dropped
+MAX_ARTIFACTS = 64
+
+# Columns with at most this many distinct values get value counts in the summary
+MAX_DISTINCT_VALUES = 20
+
+
+class ArtifactStore():
+
+    """
+    Keeps bulk data (record lists, DataFrames) in process and hands tools a short
+    handle plus a compact summary instead, so the data never enters the LLM context.
+    Other tools resolve the handle locally to get the data back.
+    Methods
+    -------
+    put(data, kind):
+        Stores the data and returns its handle.
+    get(handle):
+        Returns the data stored under a handle.
+    resolve(value):
+        Returns the stored data when value is a handle, value itself otherwise.
+    """
+
+    def __init__(self, max_artifacts=MAX_ARTIFACTS):
+        self.max_artifacts = max_artifacts
+        self._artifacts = OrderedDict()
+        self._lock = threading.Lock()
+
+    def put(self, data, kind="records"):
+        handle = f"{HANDLE_PREFIX}{kind}/{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            self._artifacts[handle] = data
+            while len(self._artifacts) > self.max_artifacts:
+                self._artifacts.popitem(last=False)
+        return handle
+
+    def get(self, handle):
+        with self._lock:
+            if handle not in self._artifacts:
+                raise KeyError(f"Unknown or expired artifact handle '{handle}'.")
+            self._artifacts.move_to_end(handle)
+            return self._artifacts[handle]
+
+    def resolve(self, value):
+        if is_handle(value):
+            return self.get(value.strip())
+        return value
+
+
+# Store shared by all tools of the process
+artifacts = ArtifactStore()
+
+
+def is_handle(value):
+    return isinstance(value, str) and value.strip().startswith(HANDLE_PREFIX)
+
+
+def summarize(records, handle=None):
+    """
+    Builds a compact summary of a list of dict records: row count, schema and
+    per-column aggregates (sum/min/max/mean for numbers, min/max for dates and
+    value counts for low-cardinality text). Its size does not grow with the rows.
+    """
+    summary = {"handle": handle, "rows": len(records), "schema": {}, "aggregates": {}}
+    columns = {}
+    for record in records:
+        for key, value in record.items():
+            columns.setdefault(key, []).append(value)
+
+    for key, values in columns.items():
+        present = [v for v in values if v is not None and v != ""]
+        numbers = [v for v in present if isinstance(v, (int, float)) and not isinstance(v, bool)]
+
+        if present and len(numbers) == len(present):
+            summary["schema"][key] = "number"
+            summary["aggregates"][key] = {
+                "sum": round(sum(numbers), 2),
+                "min": min(numbers),
+                "max": max(numbers),
+                "mean": round(sum(numbers) / len(numbers), 2),
+            }
+            continue
+
+        summary["schema"][key] = type(present[0]).__name__ if present else "null"
+        distinct = {str(v) for v in present}
+        if key.endswith(("date", "_at")) and present:
+            text = [str(v) for v in present]
+            summary["aggregates"][key] = {"min": min(text), "max": max(text)}
+        elif len(distinct) <= MAX_DISTINCT_VALUES and len(distinct) < len(present):
+            counts = {}
+            for value in present:
+                counts[str(value)] = counts.get(str(value), 0) + 1
+            summary["aggregates"][key] = {"value_counts": counts}
+        else:
+            summary["aggregates"][key] = {"distinct": len(distinct)}
+    return summary
+
+
+def put_records(records, kind="records"):
+    """Stores records in the shared store and returns their summary, including the handle."""
+    return summarize(records, artifacts.put(records, kind))
@@ -0,0 +1,173 @@
+import functools
+import json
+import os
+import resource
+import subprocess
+import sys
+import threading
+import time
+
+
+# Dataset sizes of the full benchmark ladder
+ROW_COUNTS = (1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+# Where benchmark.py keeps its synthetic datasets, logs and the baselines checked by --check
+BENCH_DIR = ".cache/benchmarks"
+BASELINES_FILE = "benchmarks/baselines.json"
+
+# A result regresses when it exceeds its baseline by more than these factors
+TOLERANCE = {"wall_seconds": 1.25, "peak_rss_mb": 1.20, "prompt_tokens": 1.05}
+
+
+class ToolTimer():
+
+    """
+    Measures the calls and the time spent in tools and plain functions while a crew runs.
+    Tools are timed by wrapping their func, which CrewAI copies when the agents are
+    created, so wrap the tools before building the agents.
+    Methods
+    -------
+    wrap_tool(tool):
+        Times a LangChain tool under its name.
+    wrap_function(owner, name):
+        Times the function stored as attribute name of owner (a module or class).
+    restore():
+        Puts the original functions back.
+    as_dict():
+        Returns {name: {"calls": int, "seconds": float}}.
+    """
+
+    def __init__(self):
+        self.tools = {}
+        self._lock = threading.Lock()
+        self._restore = []
+
+    def wrap_tool(self, tool, name=None):
+        original = tool.func
+        tool.func = self._timed(name or tool.name, original)
+        self._restore.append(lambda: setattr(tool, "func", original))
+
+    def wrap_function(self, owner, name):
+        original = getattr(owner, name)
+        setattr(owner, name, self._timed(name, original))
+        self._restore.append(lambda: setattr(owner, name, original))
+
+    def restore(self):
+        while self._restore:
+            self._restore.pop()()
+
+    def as_dict(self):
+        with self._lock:
+            return {name: dict(timing, seconds=round(timing["seconds"], 4)) for name, timing in self.tools.items()}
+
+    def _timed(self, name, fn):
+        @functools.wraps(fn)
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                with self._lock:
+                    timing = self.tools.setdefault(name, {"calls": 0, "seconds": 0.0})
+                    timing["calls"] += 1
+                    timing["seconds"] += elapsed
+        return timed
+
+
+def peak_rss_mb():
+    """Peak resident set size of the current process in MB."""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def fake_llm_environment():
+    """Environment for a benchmark case: no OpenAI key needed, no response cache, no telemetry."""
+    os.environ.setdefault("OPENAI_API_KEY", "sk-benchmark-fake")
+    os.environ["LLM_CACHE"] = "off"
+    os.environ["OTEL_SDK_DISABLED"] = "true"
+    os.environ["CREWAI_DISABLE_TELEMETRY"] = "true"
+
+
+def run_isolated(script, case, rows, workdir, extra_args=()):
+    """
+    Runs one case in a fresh interpreter so its peak RSS is its own.
+    The case writes its result as JSON; its console output goes to a log file.
+    Returns:
+        dict: The case result, with status "failed" and the log path when the case crashed.
+    """
+    os.makedirs(workdir, exist_ok=True)
+    output = os.path.join(workdir, f"{case}_{rows}.json")
+    log_path = os.path.join(workdir, f"{case}_{rows}.log")
+    if os.path.exists(output):
+        os.remove(output)
+
+    command = [sys.executable, os.path.abspath(script), "--child", case, "--rows", str(rows),
+               "--output", os.path.abspath(output), *extra_args]
+    with open(log_path, "w") as log:
+        completed = subprocess.run(command, cwd=workdir, stdout=log, stderr=subprocess.STDOUT)
+
+    if completed.returncode != 0 or not os.path.exists(output):
+        return {"case": case, "rows": rows, "status": "failed", "log": log_path}
+    with open(output, "r") as file:
+        return dict(json.load(file), log=log_path)
+
+
+def result_key(result):
+    return f"{result['case']}/{result['rows']}"
+
+
+def load_baselines(path=BASELINES_FILE):
+    try:
+        with open(path, "r") as file:
+            return json.load(file)
+    except FileNotFoundError:
+        return {}
+
+
+def save_baselines(results, path=BASELINES_FILE):
+    """Stores the completed results as the new baselines, keeping the other cases."""
+    baselines = load_baselines(path)
+    for result in results:
+        if result["status"] == "completed":
+            baselines[result_key(result)] = {metric: result[metric] for metric in TOLERANCE}
+    folder = os.path.dirname(path)
+    if folder:
+        os.makedirs(folder, exist_ok=True)
+    with open(path, "w") as file:
+        json.dump(baselines, file, indent=2, sort_keys=True)
+
+
+def find_regressions(results, baselines, tolerance=TOLERANCE):
+    """
+    Returns one message per failed case, per case without a baseline and per metric above its
+    baseline times the tolerance. A missing baseline counts as a failure, otherwise a check
+    against an empty or stale baselines file would always pass.
+    """
+    regressions = []
+    for result in results:
+        key = result_key(result)
+        if result["status"] != "completed":
+            regressions.append(f"{key}: failed, see {result.get('log')}")
+            continue
+        if key not in baselines:
+            regressions.append(f"{key}: no baseline, store one with --save-baseline")
+            continue
+        for metric, factor in tolerance.items():
+            baseline = baselines[key].get(metric)
+            if baseline and result[metric] > baseline * factor:
+                regressions.append(f"{key}: {metric} {result[metric]} > {baseline} x {factor}")
+    return regressions
+
+
+def print_report(results):
+    print(f"{'case':<24}{'rows':>12}{'wall s':>10}{'peak MB':>10}{'prompt tok':>12}{'calls':>7}  slowest tools")
+    for result in results:
+        if result["status"] != "completed":
+            print(f"{result['case']:<24}{result['rows']:>12,}  FAILED  see {result.get('log')}")
+            continue
+        tools = sorted(result["tools"].items(), key=lambda item: -item[1]["seconds"])[:3]
+        slowest = ", ".join(f"{name} {timing['seconds']:.3f}s" for name, timing in tools)
+        print(f"{result['case']:<24}{result['rows']:>12,}{result['wall_seconds']:>10.3f}{result['peak_rss_mb']:>10.1f}"
+              f"{result['prompt_tokens']:>12,}{result['llm_calls']:>7}  {slowest}")
@@ -0,0 +1,111 @@
+import json
+import re
+import threading
+from crewai import LLM
+from crew_common.tokens import count_tokens
+
+
+class FakeLLMStats():
+
+    """
+    Call and token counters shared by every FakeLLM client of a benchmark run.
+    Methods
+    -------
+    record(role, prompt_tokens, completion_tokens):
+        Adds one model call of the agent with the given role.
+    as_dict():
+        Returns the totals and the per-agent counters.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.agents = {}
+        self._lock = threading.Lock()
+
+    def record(self, role, prompt_tokens, completion_tokens):
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += prompt_tokens
+            self.completion_tokens += completion_tokens
+            agent = self.agents.setdefault(role, {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0})
+            agent["calls"] += 1
+            agent["prompt_tokens"] += prompt_tokens
+            agent["completion_tokens"] += completion_tokens
+
+    def as_dict(self):
+        with self._lock:
+            return {"llm_calls": self.calls, "prompt_tokens": self.prompt_tokens,
+                    "completion_tokens": self.completion_tokens, "agents": json.loads(json.dumps(self.agents))}
+
+
+class FakeLLM(LLM):
+
+    """
+    A deterministic local stand-in for the OpenAI chat models, used by benchmark.py.
+    Every agent follows a script selected by its role: one step per model call, each
+    step producing a tool call or the final answer in the ReAct format CrewAI parses.
+    Nothing leaves the machine and the same data always yields the same calls.
+    Attributes
+    ----------
+    scripts : dict
+        Maps an agent role to its list of steps, see action() and final_answer().
+    stats : FakeLLMStats
+        Counters updated on every call.
+    """
+
+    def __init__(self, scripts, stats, model="fake-gpt-3.5-turbo", temperature=0.7, default_answer="Done."):
+        super().__init__(model=model, temperature=temperature)
+        self.scripts = scripts
+        self.stats = stats
+        self.default_answer = default_answer
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        prompt = "\n".join(str(message.get("content", "")) for message in messages)
+        role = agent_role(messages)
+
+        # Every earlier step of this task is in the history as an assistant message
+        step = sum(1 for message in messages if message.get("role") == "assistant")
+        script = self.scripts.get(role, [])
+        respond = script[step] if step < len(script) else final_answer(self.default_answer)
+        response = respond(prompt)
+
+        self.stats.record(role, count_tokens(prompt), count_tokens(response))
+        return response
+
+    def supports_function_calling(self):
+        return False
+
+    def supports_stop_words(self):
+        return False
+
+    def get_context_window_size(self):
+        return 128_000
+
+
+def action(tool, arguments):
+    """Script step calling a tool; arguments is a dict or a function of the prompt returning one."""
+    def step(prompt):
+        args = arguments(prompt) if callable(arguments) else arguments
+        return f"Thought: I should use the {tool} tool.\nAction: {tool}\nAction Input: {json.dumps(args)}"
+    return step
+
+
+def final_answer(answer):
+    """Script step ending the task; answer is a string or a function of the prompt returning one."""
+    def step(prompt):
+        text = answer(prompt) if callable(answer) else answer
+        return f"Thought: I now know the final answer\nFinal Answer: {text}"
+    return step
+
+
+def agent_role(messages):
+    """Finds the agent role in CrewAI's "You are <role>." system prompt."""
+    for message in messages:
+        match = re.match(r"\s*You are (.+?)\.", str(message.get("content", "")))
+        if match:
+            return match.group(1)
+    return None
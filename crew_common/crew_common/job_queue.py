@@ -0,0 +1,189 @@
+import json
+import os
+import sqlite3
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+# SQLite file holding the job table, shared by every app process on the machine
+JOBS_DB = ".cache/jobs.sqlite"
+
+# Default number of crew runs executing at the same time per app process
+MAX_CONCURRENT_JOBS = 2
+
+
+class JobQueue():
+
+    """
+    Runs crew jobs in a bounded thread pool and keeps their state in a SQLite table,
+    so the Streamlit script thread never blocks and results survive a page reload.
+    Attributes
+    ----------
+    db_path : str
+        Path of the SQLite job table.
+    max_workers : int
+        Maximum number of jobs running at the same time.
+    Methods
+    -------
+    submit(kind, fn, **params):
+        Queues fn(report, **params) and returns the job id.
+    get(job_id):
+        Returns the job as a dict, or None for an unknown id.
+    recent(limit):
+        Returns the most recently submitted jobs.
+    """
+
+    def __init__(self, db_path=JOBS_DB, max_workers=MAX_CONCURRENT_JOBS):
+        self.db_path = db_path
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="crew-job")
+
+        folder = os.path.dirname(db_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS jobs (
+                              id TEXT PRIMARY KEY,
+                              kind TEXT NOT NULL,
+                              params TEXT NOT NULL,
+                              status TEXT NOT NULL,
+                              progress TEXT NOT NULL DEFAULT '[]',
+                              result TEXT,
+                              error TEXT,
+                              owner_pid INTEGER NOT NULL,
+                              submitted_at REAL NOT NULL,
+                              started_at REAL,
+                              finished_at REAL,
+                              owner TEXT)""")
+            # Tables created before jobs recorded their owner token
+            if "owner" not in [column[1] for column in db.execute("PRAGMA table_info(jobs)")]:
+                db.execute("ALTER TABLE jobs ADD COLUMN owner TEXT")
+        self._fail_orphans()
+
+    def submit(self, kind, fn, **params):
+        job_id = uuid.uuid4().hex[:12]
+        with self._connect() as db:
+            db.execute("INSERT INTO jobs (id, kind, params, status, owner_pid, owner, submitted_at) "
+                       "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                       (job_id, kind, json.dumps(params, default=str), "queued", os.getpid(), PROCESS_TOKEN,
+                        time.time()))
+        self._executor.submit(self._run, job_id, fn, params)
+        return job_id
+
+    def get(self, job_id):
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _job(row) if row else None
+
+    def recent(self, limit=20, kind=None):
+        query = "SELECT * FROM jobs" + (" WHERE kind = ?" if kind else "") + " ORDER BY submitted_at DESC LIMIT ?"
+        with self._connect() as db:
+            rows = db.execute(query, ((kind, limit) if kind else (limit,))).fetchall()
+        return [_job(row) for row in rows]
+
+    def _run(self, job_id, fn, params):
+        self._update(job_id, status="running", started_at=time.time())
+        try:
+            result = fn(lambda line: self._report(job_id, line), **params)
+        except Exception as e:
+            self._update(job_id, status="failed", error=str(e), finished_at=time.time())
+            return
+        self._update(job_id, status="completed", result=json.dumps(result, default=str), finished_at=time.time())
+
+    def _report(self, job_id, line):
+        """Appends a progress line the UI shows while the job runs."""
+        with self._connect() as db:
+            progress = json.loads(db.execute("SELECT progress FROM jobs WHERE id = ?", (job_id,)).fetchone()[0])
+            progress.append(line)
+            db.execute("UPDATE jobs SET progress = ? WHERE id = ?", (json.dumps(progress), job_id))
+
+    def _update(self, job_id, **fields):
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            db.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def _fail_orphans(self):
+        """Marks unfinished jobs whose owning process is gone as failed, e.g. after an app restart."""
+        with self._connect() as db:
+            rows = db.execute("SELECT id, owner_pid, owner FROM jobs WHERE status IN ('queued', 'running')").fetchall()
+            orphans = [(time.time(), job_id) for job_id, pid, owner in rows if not _owner_alive(pid, owner)]
+            db.executemany("UPDATE jobs SET status = 'failed', error = 'Interrupted: the app process stopped.', "
+                           "finished_at = ? WHERE id = ?", orphans)
+
+    def _connect(self):
+        return _Connection(self.db_path)
+
+
+class _Connection():
+    """Opens a SQLite connection for one with-block and commits it on success."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.db = sqlite3.connect(self.path, timeout=30)
+        return self.db
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.db.commit()
+        self.db.close()
+
+
+def _job(row):
+    job_id, kind, params, status, progress, result, error, _, submitted_at, started_at, finished_at, _ = row
+    return {
+        "id": job_id,
+        "kind": kind,
+        "params": json.loads(params),
+        "status": status,
+        "progress": json.loads(progress),
+        "result": json.loads(result) if result else None,
+        "error": error,
+        "submitted_at": submitted_at,
+        "started_at": started_at,
+        "finished_at": finished_at,
+    }
+
+
+def _start_time(pid):
+    """Start time of a process in clock ticks since boot, None when it is not running or there is no /proc."""
+    try:
+        with open(f"/proc/{pid}/stat", "r") as file:
+            stat = file.read()
+    except OSError:
+        return None
+    # Fields after the parenthesized command name, which may contain spaces; starttime is field 22
+    return stat.rsplit(")", 1)[1].split()[19]
+
+
+def _owner_alive(pid, owner):
+    """
+    Checks whether the process that submitted a job is still running. The owner token pairs its
+    pid with its start time (or a random id without /proc), so a restarted app that got the same
+    pid, as is usual in a container, does not take the jobs of the previous process for its own.
+    """
+    if owner == PROCESS_TOKEN:
+        return True
+    if pid == os.getpid():
+        return False
+    started = owner.partition(":")[2] if owner else None
+    current = _start_time(pid)
+    if started and current is not None:
+        return current == started
+    return _process_alive(pid)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+# Identifies this process in the job table, see _owner_alive
+PROCESS_TOKEN = f"{os.getpid()}:{_start_time(os.getpid()) or uuid.uuid4().hex}"
@@ -0,0 +1,227 @@
+import copy
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from crewai import LLM
+
+
+# Where responses are stored and how much disk they may use; override with
+# LLM_CACHE_PATH / LLM_CACHE_MAX_MB, or set LLM_CACHE=off to disable caching.
+DEFAULT_PATH = ".cache/llm_responses.sqlite"
+DEFAULT_MAX_MB = 256
+
+# Values that differ on every run although the prompt means the same: run ids (tools/run_manifest.py)
+# and artifact handles (artifact_store.py). They are keyed as numbered placeholders.
+VOLATILE_VALUES = re.compile(r"\b\d{8}_\d{6}_[0-9a-f]{8}\b|artifact://[\w-]+/[0-9a-f]+")
+PLACEHOLDER = re.compile(r"<volatile:(\d+)>")
+
+
+class DiskLRUCache():
+
+    """
+    Stores model responses in a local SQLite file, keyed by a hash computed by CachedLLM.
+    Once the stored responses exceed max_bytes the least recently used ones are evicted.
+    Attributes
+    ----------
+    path : str
+        Path of the SQLite file.
+    max_bytes : int
+        Upper bound on the size of the stored responses.
+    hits : int
+        Number of lookups answered from the cache.
+    misses : int
+        Number of lookups that had to call the model.
+    Methods
+    -------
+    lookup(key):
+        Returns the cached response or None.
+    update(key, value):
+        Stores a response and evicts old entries when over max_bytes.
+    clear():
+        Removes every entry.
+    stats():
+        Returns the hit/miss counters and the current size of the cache.
+    """
+
+    def __init__(self, path=DEFAULT_PATH, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+        folder = os.path.dirname(path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        with self._connect() as db:
+            db.execute("""CREATE TABLE IF NOT EXISTS responses (
+                              key TEXT PRIMARY KEY,
+                              value TEXT NOT NULL,
+                              size INTEGER NOT NULL,
+                              last_used REAL NOT NULL)""")
+            db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+
+    def lookup(self, key):
+        with self._lock, self._connect() as db:
+            row = db.execute("SELECT value FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+            self.hits += 1
+        return row[0]
+
+    def update(self, key, value):
+        with self._lock, self._connect() as db:
+            db.execute("INSERT OR REPLACE INTO responses (key, value, size, last_used) VALUES (?, ?, ?, ?)",
+                       (key, value, len(value), time.time()))
+            self._evict(db)
+
+    def clear(self):
+        with self._lock, self._connect() as db:
+            db.execute("DELETE FROM responses")
+
+    def stats(self):
+        with self._lock, self._connect() as db:
+            entries, size = db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        return {"hits": self.hits, "misses": self.misses, "entries": entries, "bytes": size}
+
+    def _evict(self, db):
+        """Deletes the least recently used entries until the cache fits in max_bytes."""
+        size = db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if size <= self.max_bytes:
+            return
+        expired = []
+        for key, entry_size in db.execute("SELECT key, size FROM responses ORDER BY last_used"):
+            if size <= self.max_bytes:
+                break
+            expired.append((key,))
+            size -= entry_size
+        db.executemany("DELETE FROM responses WHERE key = ?", expired)
+
+    def _connect(self):
+        return _Connection(self.path)
+
+
+class CachedLLM(LLM):
+
+    """
+    Wraps the LLM of the agents so its responses are answered from a DiskLRUCache when the
+    same conversation was sent before. CrewAI calls the LLM of an agent directly, so this is
+    where the cache has to sit. The key hashes the model, temperature, stop words and the
+    messages with their run ids and artifact handles replaced by numbered placeholders, so a
+    rerun on the same data hits; those values are put back into a cached response, so a tool
+    call it holds gets the current run's ids.
+    Attributes
+    ----------
+    llm : LLM
+        The model actually called on a miss.
+    cache : DiskLRUCache
+        Where the responses are stored.
+    """
+
+    def __init__(self, llm, cache):
+        super().__init__(model=llm.model, temperature=llm.temperature)
+        self.llm = llm
+        self.cache = cache
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        # CrewAI sets the stop words on the LLM of the agent, this one. The inner LLM may be
+        # shared by agents running on other threads, so each call gets its own copy
+        stop = self.stop
+        llm = copy.copy(self.llm)
+        llm.stop = stop
+        if available_functions:
+            # The model may run these functions itself, a cached response would skip them
+            return llm.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions)
+
+        if isinstance(messages, str):
+            messages = [{"role": "user", "content": messages}]
+        values = {}
+        request = {
+            "model": self.llm.model,
+            "temperature": self.llm.temperature,
+            "stop": stop,
+            "tools": tools,
+            "messages": [{"role": message.get("role"), "content": normalize(str(message.get("content", "")), values)}
+                         for message in messages],
+        }
+        key = hashlib.sha256(json.dumps(request, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+        cached = self.cache.lookup(key)
+        if cached is not None:
+            return restore(cached, values)
+        response = llm.call(messages, tools=tools, callbacks=callbacks)
+        if isinstance(response, str):
+            self.cache.update(key, normalize(response, values, add=False))
+        return response
+
+    def supports_function_calling(self):
+        return self.llm.supports_function_calling()
+
+    def supports_stop_words(self):
+        return self.llm.supports_stop_words()
+
+    def get_context_window_size(self):
+        return self.llm.get_context_window_size()
+
+
+class _Connection():
+    """Opens a SQLite connection for one with-block and commits it on success."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.db = sqlite3.connect(self.path, timeout=30)
+        return self.db
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.db.commit()
+        self.db.close()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def llm_cache():
+    """
+    Returns the process-wide response cache used by the agents' LLM clients, see CachedLLM,
+    or None when caching is disabled with LLM_CACHE=off.
+    """
+    global _default_cache
+    if os.getenv("LLM_CACHE", "on").lower() in ("off", "0", "false", "no"):
+        return None
+    with _default_lock:
+        if _default_cache is None:
+            max_mb = float(os.getenv("LLM_CACHE_MAX_MB", DEFAULT_MAX_MB))
+            _default_cache = DiskLRUCache(os.getenv("LLM_CACHE_PATH", DEFAULT_PATH), int(max_mb * 1024 * 1024))
+    return _default_cache
+
+
+def normalize(text, values, add=True):
+    """
+    Replaces the run ids and artifact handles of text by placeholders numbered in order of first
+    appearance, recording the values in the values dict; with add=False only known values are replaced.
+    """
+    def placeholder(match):
+        value = match.group(0)
+        if value not in values:
+            if not add:
+                return value
+            values[value] = len(values)
+        return f"<volatile:{values[value]}>"
+    return VOLATILE_VALUES.sub(placeholder, text)
+
+
+def restore(text, values):
+    """Puts the values recorded by normalize back in place of their placeholders."""
+    ordered = list(values)
+    return PLACEHOLDER.sub(lambda match: ordered[int(match.group(1))] if int(match.group(1)) < len(ordered)
+                           else match.group(0), text)
@@ -0,0 +1,60 @@
+import threading
+
+
+# Model and temperature used by every agent of the crew
+DEFAULT_MODEL = "gpt-3.5-turbo"
+DEFAULT_TEMPERATURE = 0.7
+
+_clients = {}
+_clients_lock = threading.Lock()
+_client_factory = None
+
+
+def chat_model(model=DEFAULT_MODEL, temperature=DEFAULT_TEMPERATURE, cache=None):
+    """
+    Returns the process-wide model client for a model and temperature, creating it on first use.
+    crewai is only imported then, so entry points that never call a model stay light. CrewAI calls
+    this client directly, so the response cache wraps it, see CachedLLM in llm_cache.py.
+    Args:
+        model (str): OpenAI model name.
+        temperature (float): Sampling temperature.
+        cache (DiskLRUCache): Response cache, defaults to the shared on-disk cache in llm_cache.py.
+    Returns:
+        LLM: The shared client; it is thread-safe and reused by all agents and runs.
+    """
+    from crew_common.llm_cache import CachedLLM, llm_cache
+
+    if cache is None:
+        cache = llm_cache()
+
+    key = (model, temperature, id(cache))
+    with _clients_lock:
+        if key not in _clients:
+            if _client_factory is not None:
+                client = _client_factory(model, temperature)
+            else:
+                from crewai import LLM
+                client = LLM(model=model, temperature=temperature)
+            if cache is not None:
+                client = CachedLLM(client, cache)
+            # Keep the cache referenced so its id is not reused by another object
+            _clients[key] = (cache, client)
+        return _clients[key][1]
+
+
+def use_client_factory(factory):
+    """
+    Makes chat_model build its clients with factory(model, temperature) instead of crewai.LLM,
+    e.g. the local stand-in of fake_llm.py used by the benchmark.py of each project.
+    Pass None to use OpenAI again.
+    """
+    global _client_factory
+    with _clients_lock:
+        _client_factory = factory
+        _clients.clear()
+
+
+def clear_clients():
+    """Forgets the shared clients, e.g. after changing the API key or the cache settings."""
+    with _clients_lock:
+        _clients.clear()
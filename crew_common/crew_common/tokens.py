@@ -0,0 +1,13 @@
+# Counts tokens like OpenAI when tiktoken is installed; otherwise errs on the high side
+# with one token per 3 characters (JSON with many numbers averages about 3-4).
+try:
+    import tiktoken
+    _encoding = tiktoken.get_encoding("cl100k_base")
+except ImportError:
+    _encoding = None
+
+
+def count_tokens(text):
+    if _encoding is not None:
+        return len(_encoding.encode(text, disallowed_special=()))
+    return -(-len(text) // 3)
@@ -1,6 +1,4 @@
-from crewai import Agent
-from langchain_openai import ChatOpenAI
-from tools.file_handler import FileHandlerTool
+from crew_common.llm_registry import chat_model
 
 
 class MarketingAgent():
@@ -9,10 +7,10 @@ class MarketingAgent():
     A class used to represent a Marketing Agent that utilizes OpenAI's GPT models to process and analyze customer data.
     Attributes
     ----------
-    OpenAIGPT35 : ChatOpenAI
-        An instance of the ChatOpenAI class using the GPT-3.5-turbo model with a temperature of 0.7.
-    OpenAIGPT4 : ChatOpenAI
-        An instance of the ChatOpenAI class using the GPT-4 model with a temperature of 0.7.
+    OpenAIGPT35 : LLM
+        The shared client using the GPT-3.5-turbo model with a temperature of 0.7.
+    OpenAIGPT4 : LLM
+        The shared client using the GPT-4 model with a temperature of 0.7.
     Methods
     -------
     pos_agent():
@@ -22,21 +20,32 @@ class MarketingAgent():
     """
     
 
-    def __init__(self):
+    def __init__(self, cache=None):
         """
-        Initializes the agent with two OpenAI GPT models.
-        Attributes:
-            OpenAIGPT35 (ChatOpenAI): An instance of the ChatOpenAI class using the GPT-3.5-turbo model with a temperature of 0.7.
-            OpenAIGPT4 (ChatOpenAI): An instance of the ChatOpenAI class using the GPT-4 model with a temperature of 0.7.
+        Args:
+            cache (DiskLRUCache): Response cache for both models, defaults to the shared on-disk cache,
+                see crew_common/llm_cache.py.
+        The model clients are created on first use and shared by every MarketingAgent of the
+        process, see crew_common/llm_registry.py.
         """
 
-        self.OpenAIGPT35 = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.7)
-        self.OpenAIGPT4 = ChatOpenAI(model="gpt-4", temperature=0.7)
+        self.cache = cache
+
+    @property
+    def OpenAIGPT35(self):
+        return chat_model("gpt-3.5-turbo", 0.7, self.cache)
+
+    @property
+    def OpenAIGPT4(self):
+        return chat_model("gpt-4", 0.7, self.cache)
 
 
     
     def pos_agent(self):
         """POSAgent: Reads JSON and converts it to CSV"""
+        from crewai import Agent
+        from tools.file_handler import FileHandlerTool
+
         return Agent(
             role="POS Customer Data Processor",
             goal="Use the customers.json file and extracts customers data based on the filter critera and save them into CSV",
@@ -49,6 +58,9 @@ class MarketingAgent():
    
     def marketing_agent(self):
         """ # MarketingAgent: Identifies customers not opted in and lists them"""
+        from crewai import Agent
+        from tools.file_handler import FileHandlerTool
+
         return Agent(
             role="Marketing Data Analyst",
             goal="Analyze CSV file and find customers who has opt-in as N and save it.",
@@ -1,9 +1,11 @@
 import streamlit as st
-import pandas as pd
-import json
+import os
 import time
-from datetime import datetime
 from main import EmailMarketingCrew  # Import CrewAI logic
+from tools.customer_cache import load_customers
+from tools.date_range import DateRange
+from crew_common.job_queue import MAX_CONCURRENT_JOBS, JobQueue
+from tools.run_manifest import RUNS_DIR, RunManifest
 
 # Streamlit UI Setup
 st.set_page_config(page_title="Email Marketing Crew", layout="wide")
@@ -19,82 +21,164 @@ st.markdown(
     """
 )
 
-# Generate dynamic filename based on today's date
-current_date = datetime.now().strftime("%Y%m%d")  # Format: YYYYMMDD
-csv_file = f"data/{current_date}_filtered_customers.csv"
+PAGE_SIZES = [50, 100, 500, 1000]
 
-# Date range input (Passed to main.py but not used in filtering)
+
+@st.cache_resource(show_spinner="Loading customer data...")
+def load_customer_columns(path, mtime_ns):
+    """Opens the memory-mapped customer columns once per file version; mtime_ns is only part of the cache key."""
+    return load_customers(path)
+
+
+def show_customers_page(columns, key):
+    """Renders one page of the customers, decoding only the rows of that page."""
+    import numpy as np
+
+    total_rows = len(columns)
+    col1, col2 = st.columns(2)
+    page_size = col1.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = max(1, -(-total_rows // page_size))
+    page = col2.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    st.dataframe(columns.to_frame(np.arange(start, min(start + page_size, total_rows))))
+    st.caption(f"Rows {min(start + 1, total_rows)}-{min(start + page_size, total_rows)} of {total_rows}")
+
+
+def show_csv_page(path, total_rows, key):
+    """Renders one page of a CSV file, reading only the rows of that page."""
+    import pandas as pd
+
+    col1, col2 = st.columns(2)
+    page_size = col1.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = max(1, -(-total_rows // page_size))
+    page = col2.number_input(f"Page (of {pages})", min_value=1, max_value=pages, value=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    st.dataframe(pd.read_csv(path, skiprows=range(1, start + 1), nrows=page_size))
+    st.caption(f"Rows {min(start + 1, total_rows)}-{min(start + page_size, total_rows)} of {total_rows}")
+
+
+class CrewProgress():
+    """Turns CrewAI step and task callbacks into progress lines for the job table."""
+
+    def __init__(self, report):
+        self.report = report
+
+    def on_step(self, step):
+        tool = getattr(step, "tool", None)
+        if tool:
+            self.report(f"🛠️ Using tool `{tool}`")
+        elif hasattr(step, "return_values") or hasattr(step, "output"):
+            self.report("💡 Agent reached an answer")
+
+    def on_task(self, output):
+        agent = getattr(output, "agent", None) or "Agent"
+        self.report(f"✅ {agent} completed its task")
+
+
+def run_optin_crew(report, date_range, customers_file):
+    """Job body executed by the JobQueue worker thread."""
+    progress = CrewProgress(report)
+    crew = EmailMarketingCrew(date_range, customers_file,
+                              step_callback=progress.on_step, task_callback=progress.on_task)
+    report("🛠️ Extracting customers locally, then handing over to the agents...")
+    result = crew.run()
+    return {"run_id": crew.manifest.run_id, "result": str(result)}
+
+
+@st.cache_resource
+def job_queue():
+    """One job queue per app process, shared by all sessions."""
+    return JobQueue(max_workers=int(os.getenv("CREW_MAX_CONCURRENT_RUNS", MAX_CONCURRENT_JOBS)))
+
+
+# Date range input
 st.subheader("📅 Enter Customer Created Date Range")
 date_range = st.text_input("Customer Created Date Range (e.g., 2024-01-01 to 2024-01-31)")
 
-# Load full customer data (without filtering)
+# Page through the full customer data (without filtering); the columns stay open across reruns until the file changes
 st.subheader("📋 Full Customer Data:")
+customers_file = "data/customers.json"
 try:
-    with open("data/customers.json", "r") as file:
-        customers_data = json.load(file)
-
-    df = pd.DataFrame(customers_data)
-    st.dataframe(df)  # Show the full dataset
+    columns = load_customer_columns(customers_file, os.stat(customers_file).st_mtime_ns)
+    show_customers_page(columns, "customers")
 
 except Exception as e:
     st.error(f"Error loading customer data: {e}")
 
-# Placeholder for logs
-log_output = st.empty()
+queue = job_queue()
+
+# Recent runs of all analysts, each one reopens its results
+st.sidebar.subheader("🗂️ Recent runs")
+for recent in queue.recent(limit=10, kind="optin"):
+    st.sidebar.markdown(f"[{recent['status']} · {recent['params'].get('date_range')}](?job={recent['id']})")
 
 # Run button
 if st.button("🚀 Run CrewAI Process"):
     if not date_range:
         st.warning("⚠️ Please enter a valid date range.")
     else:
-        log_output.text("🔄 Initializing CrewAI Process... Please wait.")
-        time.sleep(1)
-
-        # Run the CrewAI process with the entered date range
-        crew = EmailMarketingCrew(date_range, "./data/customers.json")
-
-        with st.spinner("🤖 Agents are working..."):
-            time.sleep(1)
-            log_output.text("🛠️ POSAgent is extracting customer data...")
-            time.sleep(2)
-            log_output.text("✅ POSAgent completed customer extraction!")
-
-            log_output.text("🔍 MarketingAgent is analyzing data for opt-in status...")
-            time.sleep(2)
-            log_output.text("✅ MarketingAgent completed data analysis!")
-
-            log_output.text("📂 Generating final CSV with opt-in required customers...")
-            time.sleep(2)
-
-        result = crew.run()
-
-        # Display results
-        st.success("✅ CrewAI Process Completed!")
-        st.subheader("📝 CrewAI Output:")
-        st.code(result, language="python")
-
-        # Show process breakdown
-        st.subheader("🔎 Detailed Process:")
-        st.markdown(
-            f"""
-            - **Step 1**: `POSAgent` extracts full customer records from `customers.json` 📋  
-            - **Step 2**: `MarketingAgent` analyzes customers who **never opted in** 🧐  
-            - **Step 3**: Generates `{csv_file}` file in `data/` 📂  
-            """
-        )
-
-        # Display the final filtered CSV file
-        st.subheader("📂 Final Filtered Customer Data:")
+        # Validate here so a malformed range is reported right away instead of by the job
         try:
-            filtered_df = pd.read_csv("./data/filtered_customers.csv")
-            st.dataframe(filtered_df)  # Display as a table
-        except FileNotFoundError:
-            st.error(f"⚠️ Filtered customer file `{csv_file}` not found.")
-        except Exception as e:
-            st.error(f"⚠️ Error loading filtered data: {e}")
-
-        st.balloons()
+            DateRange.parse(date_range)
+        except ValueError as e:
+            st.error(f"⚠️ {e}")
+            st.stop()
+
+        # Run the CrewAI process in the background; the job id in the URL survives a page reload
+        st.query_params["job"] = queue.submit("optin", run_optin_crew, date_range=date_range,
+                                              customers_file="./data/customers.json")
+
+job_id = st.query_params.get("job")
+job = queue.get(job_id) if job_id else None
+if job_id and job is None:
+    st.warning(f"⚠️ Run `{job_id}` not found.")
+
+if job and job["status"] in ("queued", "running"):
+    st.info(f"🤖 Agents are working on run `{job['id']}` ({job['status']})...")
+    st.markdown("\n".join(f"- {line}" for line in job["progress"][-15:]))
+
+if job and job["status"] == "failed":
+    st.error(f"⚠️ Run `{job['id']}` failed: {job['error']}")
+
+if job and job["status"] == "completed":
+    # Each run writes into its own folder, see tools/run_manifest.py; old folders get pruned
+    run_id = job["result"]["run_id"]
+    csv_file = os.path.join(RUNS_DIR, run_id, "filtered_customers.csv")
+
+    # Display results
+    st.success("✅ CrewAI Process Completed!")
+    st.subheader("📝 CrewAI Output:")
+    st.code(job["result"]["result"], language="python")
+
+    # Show process breakdown
+    st.subheader("🔎 Detailed Process:")
+    st.markdown(
+        f"""
+        - **Step 1**: `POSAgent` extracts full customer records from `customers.json` 📋  
+        - **Step 2**: `MarketingAgent` analyzes customers who **never opted in** 🧐  
+        - **Step 3**: Generates `{csv_file}` file 📂  
+        """
+    )
+
+    # Display the final filtered CSV file
+    st.subheader("📂 Final Filtered Customer Data:")
+    try:
+        manifest = RunManifest.open(run_id)
+        filtered_file = manifest.get("filtered_customers")
+        if filtered_file is None:
+            raise FileNotFoundError(csv_file)
+        filtered_rows = manifest.data["artifacts"]["filtered_customers"]["rows"]
+        show_csv_page(filtered_file, filtered_rows, "filtered")  # Display one page as a table
+    except FileNotFoundError:
+        st.error(f"⚠️ Filtered customer file `{csv_file}` not found.")
+    except Exception as e:
+        st.error(f"⚠️ Error loading filtered data: {e}")
 
 # Footer
 st.markdown("---")
 st.caption("Powered by CrewAI, OpenAI & LangChain 🚀")
+
+# Poll the running job; the page refreshes until it has finished
+if job and job["status"] in ("queued", "running"):
+    time.sleep(2)
+    st.rerun()
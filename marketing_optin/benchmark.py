@@ -0,0 +1,149 @@
+import argparse
+import json
+import os
+import re
+import shutil
+import sys
+import time
+import numpy as np
+from crew_common.bench_harness import (BASELINES_FILE, BENCH_DIR, ROW_COUNTS, ToolTimer, fake_llm_environment,
+                                 find_regressions, load_baselines, peak_rss_mb, print_report, run_isolated,
+                                 save_baselines)
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Created date range of every benchmark run, about half of the synthetic customers
+DATE_RANGE = "2024-01-01 to 2024-06-30"
+
+STORES = [f"Store_{n}" for n in range(100, 160)]
+BRANDS = [f"Brand_{letter}" for letter in "ABCDEFGHIJ"]
+
+
+def fake_scripts():
+    """What each agent of the opt-in crew does when driven by the local fake model."""
+    from crew_common.fake_llm import action, final_answer
+
+    def extract_file(prompt):
+        match = re.search(r"records were saved to (\S+?)\.?\s", prompt)
+        return match.group(1) if match else "the extract file"
+
+    def run_id(prompt):
+        match = re.search(r"Pass run_id (\S+) to the filter tool", prompt)
+        return {"run_id": match.group(1) if match else ""}
+
+    return {
+        "POS Customer Data Processor": [
+            final_answer(lambda prompt: f"The extract is confirmed and saved to {extract_file(prompt)}."),
+        ],
+        "Marketing Data Analyst": [
+            action("Filter customer data based on conditions", run_id),
+            final_answer("The customers needing marketing emails were saved to the filtered CSV file."),
+        ],
+    }
+
+
+def synthetic_customers(rows, seed=7, chunk_rows=100_000):
+    """Writes (once) a customers JSON file with the given number of rows and returns its path."""
+    path = os.path.join(ROOT, BENCH_DIR, "data", f"customers_{rows}.json")
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    rng = np.random.default_rng(seed)
+    first_day = np.datetime64("2024-01-01")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write("[\n")
+        for start in range(0, rows, chunk_rows):
+            count = min(chunk_rows, rows - start)
+            created = first_day + rng.integers(0, 366, count)
+            updated = created + rng.integers(0, 60, count)
+            stores = rng.integers(0, len(STORES), count)
+            brands = rng.integers(0, len(BRANDS), count)
+            opt_in = rng.random(count) < 0.6
+            lines = []
+            for i in range(count):
+                number = start + i
+                lines.append(json.dumps({
+                    "id": f"CUST{number:09d}",
+                    "email": f"customer{number}@example.com",
+                    "created_at": str(created[i]),
+                    "updated_at": str(updated[i]),
+                    "shopping_store": STORES[stores[i]],
+                    "store_brand": BRANDS[brands[i]],
+                    "opt_in": "Y" if opt_in[i] else "N",
+                }))
+            separator = ",\n" if start + count < rows else "\n"
+            file.write(",\n".join(lines) + separator)
+        file.write("]\n")
+    os.replace(tmp_path, path)
+    return path
+
+
+def run_case(case, rows, output, warm=False):
+    """Child process body: runs EmailMarketingCrew.run once against the fake model and writes the measurements."""
+    fake_llm_environment()
+    customers_file = synthetic_customers(rows)
+    if not warm:
+        from tools.customer_cache import CustomerCache
+        shutil.rmtree(CustomerCache(customers_file).cache_dir, ignore_errors=True)
+
+    import main
+    from crew_common.fake_llm import FakeLLM, FakeLLMStats
+    from tools.file_handler import FileHandlerTool
+    from crew_common.llm_registry import use_client_factory
+
+    stats = FakeLLMStats()
+    scripts = fake_scripts()
+    use_client_factory(lambda model, temperature: FakeLLM(scripts, stats, model=f"fake-{model}", temperature=temperature))
+
+    timer = ToolTimer()
+    for tool in (FileHandlerTool.load_json, FileHandlerTool.save_csv, FileHandlerTool.filter_customer):
+        timer.wrap_tool(tool)
+    timer.wrap_function(main, "extract_customers")
+
+    start = time.perf_counter()
+    crew = main.EmailMarketingCrew(DATE_RANGE, customers_file)
+    crew.run()
+    wall_seconds = time.perf_counter() - start
+
+    result = {"case": case, "rows": rows, "status": "completed", "wall_seconds": round(wall_seconds, 3),
+              "peak_rss_mb": peak_rss_mb(), "tools": timer.as_dict(), "run_id": crew.manifest.run_id}
+    result.update(stats.as_dict())
+    with open(output, "w") as file:
+        json.dump(result, file, indent=2)
+
+
+# Benchmarks the opt-in crew end to end with a local fake model instead of OpenAI.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the opt-in crew with a deterministic local fake LLM.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[n for n in ROW_COUNTS if n <= 100_000],
+                        help=f"Synthetic dataset sizes, the full ladder is {' '.join(map(str, ROW_COUNTS))}.")
+    parser.add_argument("--warm", action="store_true", help="Reuse the column cache instead of measuring its build.")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Store the results in {BASELINES_FILE}.")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 when a result regresses from its baseline or has none.")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_case(args.child, args.rows[0], args.output, warm=args.warm)
+        sys.exit(0)
+
+    case = "optin_warm" if args.warm else "optin"
+    results = []
+    for rows in args.rows:
+        synthetic_customers(rows)
+        extra = ["--warm"] if args.warm else []
+        results.append(run_isolated(__file__, case, rows, os.path.join(ROOT, BENCH_DIR, "work"), extra))
+    print_report(results)
+
+    if args.save_baseline:
+        save_baselines(results, os.path.join(ROOT, BASELINES_FILE))
+    if args.check:
+        regressions = find_regressions(results, load_baselines(os.path.join(ROOT, BASELINES_FILE)))
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
@@ -1,19 +1,112 @@
-from crewai import Crew
+import argparse
+import json
+from concurrent.futures import ThreadPoolExecutor
 from agents import MarketingAgent
 from tasks import MarketingTask
+from tools.customer_cache import load_customers
+from tools.customer_filter import extract_customers
+from tools.date_range import DateRange
+from tools.run_manifest import RunManifest, prune_runs
+from tools.sharding import SHARD_COLUMNS, extract_customers_sharded
+from tools.watermark import OptOutWatermark
 from dotenv import load_dotenv
 
 load_dotenv()
 
 class EmailMarketingCrew():
 
-    def __init__(self, date_range, customers_file):
-        self.date_range = date_range
+    def __init__(self, date_range, customers_file, shopping_store=None, store_brand=None,
+                 customers=None, agents=None, shard_by=None, shard_workers=None, shard_files=False,
+                 step_callback=None, task_callback=None):
+        # Parse up front so a malformed range fails before any agent is created
+        self.date_range = DateRange.parse(date_range)
         self.customers_file = customers_file
+        self.shopping_store = shopping_store
+        self.store_brand = store_brand
+        # Optional customer columns and MarketingAgent shared between runs, see run_many
+        self.customers = customers
+        self.agents = agents
+        # Optional store/brand sharding of the local extract, see tools/sharding.py
+        if shard_by and (shopping_store or store_brand):
+            raise ValueError("Sharding runs over all stores and brands, it cannot be combined with a segment filter.")
+        self.shard_by = shard_by
+        self.shard_workers = shard_workers
+        self.shard_files = shard_files
+        # Called by CrewAI after every agent step and every finished task, e.g. to stream progress to the UI
+        self.step_callback = step_callback
+        self.task_callback = task_callback
+        self.manifest = None
 
-    def run(self):
-        # Define your custom agents and tasks in agents.py and tasks.py
+    def run(self, prune=True):
+        # Every run writes its artifacts into its own folder, recorded in the run manifest
+        self.manifest = RunManifest.create(date_range=str(self.date_range), customers_file=self.customers_file,
+                                           shopping_store=self.shopping_store, store_brand=self.store_brand)
+        try:
+            result = self._run(self.manifest)
+        except Exception:
+            self.manifest.finish("failed")
+            raise
+        self.manifest.finish()
+        # Batches prune once all their jobs are done, see run_many
+        if prune:
+            prune_runs()
+        return result
+
+    @classmethod
+    def run_many(cls, jobs, customers_file, max_workers=4):
+        """
+        Runs the crew once per job, max_workers jobs at a time.
+        The customer data and the LLM clients are loaded once and shared by all jobs.
+        Args:
+            jobs (list): Date range strings, or dicts with a date_range and optional
+                shopping_store / store_brand segment filters.
+            customers_file (str): Path to the customers JSON file.
+            max_workers (int): Maximum number of jobs running at the same time.
+        Returns:
+            list: One dict per job with its run_id, status, output file and result or error.
+        """
+        jobs = [job if isinstance(job, dict) else {"date_range": job} for job in jobs]
+
+        customers = load_customers(customers_file)
+        # Build the date index before the workers start so they only read it
+        customers.date_index("created_at")
         agents = MarketingAgent()
+
+        def run_job(job):
+            crew = None
+            try:
+                crew = cls(job["date_range"], customers_file, job.get("shopping_store"), job.get("store_brand"),
+                           customers=customers, agents=agents)
+                result = crew.run(prune=False)
+                return {"job": job, "run_id": crew.manifest.run_id, "status": "completed",
+                        "output": crew.manifest.get("filtered_customers"), "result": str(result)}
+            except Exception as e:
+                return {"job": job, "run_id": crew.manifest.run_id if crew and crew.manifest else None,
+                        "status": "failed", "output": None, "error": str(e)}
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(run_job, jobs))
+        # Pruned after the batch, never by its own jobs, and never the runs whose outputs are returned
+        prune_runs(exclude={result["run_id"] for result in results})
+        return results
+
+    def _run(self, manifest):
+        # Filter on created_at locally; the agents only see the count and the CSV path
+        # The opt-in filter is fused into the same pass, filter_customer then reuses its output
+        if self.shard_by:
+            customer_count, extract_file = extract_customers_sharded(self.customers_file, self.date_range, manifest,
+                                                                     by=self.shard_by, opt_in="N",
+                                                                     max_workers=self.shard_workers,
+                                                                     per_shard_files=self.shard_files)
+        else:
+            customer_count, extract_file = extract_customers(self.customers or self.customers_file, self.date_range,
+                                                             manifest, opt_in="N", shopping_store=self.shopping_store,
+                                                             store_brand=self.store_brand)
+
+        from crewai import Crew
+
+        # Define your custom agents and tasks in agents.py and tasks.py
+        agents = self.agents or MarketingAgent()
         tasks = MarketingTask()
 
         # Define your custom agents and tasks here
@@ -24,11 +117,14 @@ class EmailMarketingCrew():
         extract_customers_task = tasks.extract_customers_task(
             pos_agent,
             self.date_range,
-            self.customers_file
+            self.customers_file,
+            customer_count,
+            extract_file,
         )
 
         identify_opt_out_customers = tasks.identify_opt_out_customers(
             marketing_agent,
+            manifest.run_id,
         )
 
         # Define your custom crew here
@@ -42,22 +138,63 @@ class EmailMarketingCrew():
                     identify_opt_out_customers,
                 ],
             verbose=True,
+            step_callback=self.step_callback,
+            task_callback=self.task_callback,
         )
 
         result = crew.kickoff()
         return result
 
+def read_jobs(filepath):
+    """
+    Reads batch jobs from a file: either a JSON list of date ranges / job dicts,
+    or plain text with one date range per line (blank lines and # comments are skipped).
+    """
+    with open(filepath, "r") as file:
+        if filepath.endswith(".json"):
+            return json.load(file)
+        return [line.strip() for line in file if line.strip() and not line.lstrip().startswith("#")]
+
+
 # This is the main function that you will use to run your custom crew.
 if __name__ == "__main__":
-    print("## Welcome to Optin Crew")
-    print("-------------------------------")
-    customers = "./data/customers.json"
-    date_range = input("What is customer created date range? ")
-    trip_crew = EmailMarketingCrew(date_range, customers)
-    result = trip_crew.run()
-    print("\n\n########################")
-    print("## Here is you custom crew run result:")
-    print("########################\n")
-    print(result)
-
+    parser = argparse.ArgumentParser(description="Find customers who never opted in for marketing emails.")
+    parser.add_argument("--batch", help="File with the date ranges or segments to run, one job each (.json or .txt).")
+    parser.add_argument("--customers", default="./data/customers.json", help="Path to the customers JSON file.")
+    parser.add_argument("--workers", type=int, default=4, help="Maximum number of jobs running at the same time.")
+    parser.add_argument("--shard-by", choices=SHARD_COLUMNS, help="Extract the customers shard by shard in a process pool.")
+    parser.add_argument("--shard-workers", type=int, help="Number of processes used for sharding, defaults to the CPU count.")
+    parser.add_argument("--shard-files", action="store_true", help="Keep one output file per shard as well.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Merge the customers updated since the last run into data/opt_out_customers.csv, without the agents.")
+    args = parser.parse_args()
 
+    if args.incremental:
+        manifest = RunManifest.create(mode="incremental", customers_file=args.customers)
+        try:
+            summary = OptOutWatermark().update(args.customers, manifest)
+        except Exception:
+            manifest.finish("failed")
+            raise
+        manifest.finish("completed")
+        prune_runs()
+        print(json.dumps(summary, indent=2))
+    elif args.batch:
+        results = EmailMarketingCrew.run_many(read_jobs(args.batch), args.customers, max_workers=args.workers)
+        print(json.dumps([{k: v for k, v in r.items() if k != "result"} for r in results], indent=2))
+        if any(r["status"] != "completed" for r in results):
+            raise SystemExit(1)
+    else:
+        print("## Welcome to Optin Crew")
+        print("-------------------------------")
+        date_range = input("What is customer created date range? ")
+        trip_crew = EmailMarketingCrew(date_range, args.customers, shard_by=args.shard_by,
+                                       shard_workers=args.shard_workers, shard_files=args.shard_files)
+        result = trip_crew.run()
+        print("\n\n########################")
+        print("## Here is you custom crew run result:")
+        print("########################\n")
+        print(result)
+        from crew_common.llm_cache import llm_cache
+        if llm_cache() is not None:
+            print("\nLLM response cache:", llm_cache().stats())
@@ -1,4 +1,3 @@
-from crewai import Task
 from textwrap import dedent
 
 
@@ -6,38 +5,48 @@ from textwrap import dedent
 class MarketingTask():
 
 
-    def extract_customers_task(self, agent, date_range, customers):
+    def extract_customers_task(self, agent, date_range, customers, customer_count, extract_file):
         """
-        Extract customer records from JSON based on the given date range and save them as a CSV file.
+        Reports on the customer records already extracted for the given date range.
+        The created_at filter runs locally before the crew starts, so the agent only
+        receives the record count and the path of the extracted CSV file.
         Args:
             agent (str): The agent responsible for the task.
-            date_range (str): The date range for extracting customer records.
+            date_range (str): The date range used for extracting customer records.
+            customers (str): Path of the source customers JSON file.
+            customer_count (int): Number of customers created within the date range.
+            extract_file (str): Path of the CSV file holding the extracted customers.
         Returns:
             Task: A Task object with the description and expected output.
         """
-  
+        from crewai import Task
+
         return Task(
-                    description="""Load the {} file from the data folder and apply filter on the created date 
-                    which should be within date range {} provided.""".format(customers,date_range) ,
+                    description="""The customer records in {} with a created date within {} have already been
+                    extracted: {} records were saved to {}. Do not reload or re-filter the JSON file, confirm the
+                    extract and pass the CSV file path on to the next task.""".format(customers, date_range, customer_count, extract_file),
                     agent=agent,
-                    expected_output="""A CSV file containing all the fileds in the original file but should only have filtered records matching the
-                    criteria.""",
+                    expected_output="""The path of the CSV file containing all the fields in the original file but only the
+                    records matching the criteria, and the number of records it holds.""",
            
                 )
 
-    def identify_opt_out_customers(self, agent):
+    def identify_opt_out_customers(self, agent, run_id):
         """
         Identifies customers who never opted in for marketing and stores the information in a CSV file.
 
         Args:
             agent: The agent responsible for performing the task.
+            run_id (str): Id of the current run, used by the tools to find the run's extract.
 
         Returns:
             Task: A Task object with a description of the task and the expected output.
         """
-  
+        from crewai import Task
+
         return Task(
-                    description="Using the CSV file from the extract_customers_task task find records which have opt_in as N and store in the CSV.",
+                    description="""Using the CSV file from the extract_customers_task task of run {} find records which
+                    have opt_in as N and store in the CSV. Pass run_id {} to the filter tool.""".format(run_id, run_id),
                     agent=agent,
                     expected_output="A CSV file listing customers needing marketing emails.",
         )
@@ -0,0 +1,26 @@
+from crew_common.bench_harness import find_regressions
+
+
+def result(case="fake", rows=1000, **metrics):
+    return dict({"case": case, "rows": rows, "status": "completed", "wall_seconds": 1.0, "peak_rss_mb": 100.0,
+                 "prompt_tokens": 1000}, **metrics)
+
+
+def test_within_tolerance_passes():
+    baselines = {"fake/1000": {"wall_seconds": 1.0, "peak_rss_mb": 100.0, "prompt_tokens": 1000}}
+    assert find_regressions([result(wall_seconds=1.2)], baselines) == []
+
+
+def test_regression_is_reported():
+    baselines = {"fake/1000": {"wall_seconds": 1.0, "peak_rss_mb": 100.0, "prompt_tokens": 1000}}
+    regressions = find_regressions([result(wall_seconds=2.0)], baselines)
+    assert len(regressions) == 1 and regressions[0].startswith("fake/1000: wall_seconds")
+
+
+def test_missing_baseline_fails_the_check():
+    assert find_regressions([result()], {}) == ["fake/1000: no baseline, store one with --save-baseline"]
+
+
+def test_failed_case_fails_the_check():
+    failed = {"case": "fake", "rows": 1000, "status": "failed", "log": "fake_1000.log"}
+    assert find_regressions([failed], {}) == ["fake/1000: failed, see fake_1000.log"]
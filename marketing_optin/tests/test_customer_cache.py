@@ -0,0 +1,67 @@
+import json
+import os
+from tools.customer_cache import CACHE_VERSION, CustomerCache, load_customers
+
+CUSTOMERS = [
+    {"id": "C1", "email": "a@example.com", "created_at": "2025-02-10T09:30:00", "updated_at": "2025-02-11",
+     "shopping_store": "Store_1", "store_brand": "Brand_A", "opt_in": "N"},
+    {"id": "C2", "email": "b@example.com", "created_at": "2025-02-11", "updated_at": None,
+     "shopping_store": "Store_2", "store_brand": "Brand_B", "opt_in": "Y"},
+]
+
+
+def write_customers(path, customers, mtime_ns=None):
+    path.write_text(json.dumps(customers))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def test_columns_round_trip(tmp_path):
+    path = write_customers(tmp_path / "customers.json", CUSTOMERS)
+    columns = load_customers(path)
+    assert len(columns) == 2
+    assert list(columns.records()) == CUSTOMERS
+    assert columns.to_frame(fields=["id", "opt_in"]).to_dict("records") == [
+        {"id": "C1", "opt_in": "N"}, {"id": "C2", "opt_in": "Y"}]
+
+
+def test_missing_or_old_cache_is_stale(tmp_path):
+    path = write_customers(tmp_path / "customers.json", CUSTOMERS)
+    cache = CustomerCache(path)
+    assert not cache.is_fresh()
+    cache.load()
+    assert cache.is_fresh()
+
+    meta = cache.read_meta()
+    meta["version"] = CACHE_VERSION - 1
+    with open(cache.meta_path, "w") as file:
+        json.dump(meta, file)
+    assert not cache.is_fresh()
+
+
+def test_touched_file_with_the_same_content_stays_fresh(tmp_path):
+    path = write_customers(tmp_path / "customers.json", CUSTOMERS, mtime_ns=1_700_000_000_000_000_000)
+    cache = CustomerCache(path)
+    cache.load()
+
+    os.utime(path, ns=(1_800_000_000_000_000_000, 1_800_000_000_000_000_000))
+    assert cache.is_fresh()
+    assert cache.read_meta()["source_mtime_ns"] == 1_800_000_000_000_000_000
+
+
+def test_edited_file_rebuilds_the_cache(tmp_path):
+    path = write_customers(tmp_path / "customers.json", CUSTOMERS, mtime_ns=1_700_000_000_000_000_000)
+    cache = CustomerCache(path)
+    cache.load()
+
+    # Same size, new content
+    edited = [dict(CUSTOMERS[0], opt_in="Y"), CUSTOMERS[1]]
+    write_customers(tmp_path / "customers.json", edited, mtime_ns=1_800_000_000_000_000_000)
+    assert not cache.is_fresh()
+    assert list(cache.load().records(fields=["opt_in"])) == [{"opt_in": "Y"}, {"opt_in": "Y"}]
+
+    # Different size
+    write_customers(tmp_path / "customers.json", edited[:1], mtime_ns=1_800_000_000_000_000_000)
+    assert not cache.is_fresh()
+    assert len(cache.load()) == 1
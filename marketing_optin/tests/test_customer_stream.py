@@ -0,0 +1,40 @@
+import json
+import pytest
+from tools.customer_stream import _iter_array, iter_customers
+
+
+def write_json(tmp_path, text):
+    path = tmp_path / "customers.json"
+    path.write_text(text)
+    return str(path)
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64 * 1024])
+def test_numbers_split_across_chunks(tmp_path, chunk_size):
+    path = write_json(tmp_path, "[1, 23, 456, -7.25e1, true, null]")
+    assert list(_iter_array(path, chunk_size)) == [1, 23, 456, -72.5, True, None]
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 64 * 1024])
+def test_records_split_across_chunks(tmp_path, chunk_size):
+    customers = [{"id": f"C{i}", "name": "Ünïcode, \"quoted\" ]", "opt_in": "N" if i % 2 else "Y"} for i in range(20)]
+    path = write_json(tmp_path, "\n  " + json.dumps(customers, indent=2) + "\n")
+    assert list(iter_customers(path, chunk_size=chunk_size)) == customers
+
+
+def test_filters_and_fields(tmp_path):
+    path = write_json(tmp_path, json.dumps([
+        {"id": "C1", "created_at": "2025-02-10T09:30:00", "opt_in": "N", "store_brand": "A"},
+        {"id": "C2", "created_at": "2025-02-11", "opt_in": "Y", "store_brand": "A"},
+        {"id": "C3", "created_at": "2025-03-01", "opt_in": False, "store_brand": "B"},
+    ]))
+    found = iter_customers(path, fields=["id"], created_at="2025-02-01 to 2025-02-28", opt_in="N", chunk_size=4)
+    assert list(found) == [{"id": "C1"}]
+
+
+def test_empty_array_and_invalid_files(tmp_path):
+    assert list(_iter_array(write_json(tmp_path, "  [ ]  "), 2)) == []
+    with pytest.raises(ValueError):
+        list(_iter_array(write_json(tmp_path, '{"id": 1}'), 4))
+    with pytest.raises(ValueError):
+        list(_iter_array(write_json(tmp_path, '[{"id": 1},'), 4))
@@ -0,0 +1,45 @@
+from datetime import date, datetime
+import pytest
+from tools.date_range import DateRange
+
+
+@pytest.mark.parametrize("text", [
+    "2024-01-01 to 2024-01-31",
+    "2024-01-01 through 2024-01-31",
+    "2024-01-01 - 2024-01-31",
+    "2024-01-01..2024-01-31",
+    "2024-01-01, 2024-01-31",
+    "2024/01/01 until 01/31/2024",
+    "20240101 TO 20240131",
+])
+def test_parse_ranges(text):
+    assert DateRange.parse(text) == DateRange(date(2024, 1, 1), date(2024, 1, 31))
+
+
+def test_parse_single_day():
+    day = DateRange.parse(" 2024-02-29 ")
+    assert (day.start, day.end) == (date(2024, 2, 29), date(2024, 2, 29))
+
+
+def test_parse_returns_date_ranges_unchanged():
+    date_range = DateRange(date(2024, 1, 1), date(2024, 1, 2))
+    assert DateRange.parse(date_range) is date_range
+
+
+@pytest.mark.parametrize("text", ["", "   ", None, "2024-13-01", "yesterday", "2024-01-31 to 2024-01-01",
+                                  "2024-01-01 to 2024-01-02 to 2024-01-03"])
+def test_parse_rejects_invalid_ranges(text):
+    with pytest.raises(ValueError):
+        DateRange.parse(text)
+
+
+def test_contains_is_inclusive():
+    date_range = DateRange.parse("2024-01-01 to 2024-01-31")
+    assert "2024-01-01" in date_range
+    assert "2024-01-31T23:59:59" in date_range
+    assert date(2024, 1, 15) in date_range
+    assert datetime(2024, 1, 31, 12) in date_range
+    assert "2024-02-01" not in date_range
+    assert "2023-12-31T23:59:59" not in date_range
+    assert None not in date_range
+    assert "" not in date_range
@@ -0,0 +1,64 @@
+import csv
+import gzip
+import json
+import pytest
+from tools.customer_cache import load_customers
+from tools.customer_filter import extract_customers
+from tools.run_manifest import RunManifest
+from tools.sharding import extract_customers_sharded, merge_csv, partition_rows
+
+BRANDS = ["Brand_A", "Brand_B", "Brand_C"]
+
+
+@pytest.fixture
+def customers_file(tmp_path):
+    customers = [{"id": f"C{i:03d}", "email": f"c{i}@example.com", "created_at": f"2025-02-{1 + i % 28:02d}",
+                  "updated_at": "2025-03-01", "shopping_store": f"Store_{i % 4}", "store_brand": BRANDS[i % 3],
+                  "opt_in": "Y" if i % 5 == 0 else "N"} for i in range(120)]
+    path = tmp_path / "customers.json"
+    path.write_text(json.dumps(customers))
+    return str(path)
+
+
+def read_rows(path):
+    """Rows of a CSV file sorted by id, shards group them by store or brand instead."""
+    with (gzip.open(path, "rt", newline="") if path.endswith(".gz") else open(path, newline="")) as file:
+        return sorted(csv.DictReader(file), key=lambda row: row["id"])
+
+
+def test_partition_keeps_file_order_per_value(customers_file):
+    columns = load_customers(customers_file)
+    rows = columns.select(created_at="2025-02-01 to 2025-02-10")
+    shards = partition_rows(columns, rows, "store_brand")
+    assert [value for _, value, _ in shards] == BRANDS
+    merged = sorted(row for _, _, shard_rows in shards for row in shard_rows.tolist())
+    assert merged == sorted(rows.tolist())
+    for _, value, shard_rows in shards:
+        assert shard_rows.tolist() == sorted(shard_rows.tolist())
+        assert {record["store_brand"] for record in columns.records(shard_rows)} == {value}
+
+
+@pytest.mark.parametrize("by, compression", [("store_brand", None), ("shopping_store", "gzip")])
+def test_sharded_extract_matches_the_single_pass(tmp_path, customers_file, by, compression):
+    date_range = "2025-02-05 to 2025-02-20"
+    single = RunManifest.create(runs_dir=str(tmp_path / "runs"))
+    sharded = RunManifest.create(runs_dir=str(tmp_path / "runs"))
+
+    count, extract_file = extract_customers(customers_file, date_range, single, opt_in="N", compression=compression)
+    sharded_count, sharded_file = extract_customers_sharded(customers_file, date_range, sharded, by=by, opt_in="N",
+                                                            max_workers=2, compression=compression)
+
+    assert sharded_count == count > 0
+    assert read_rows(sharded_file) == read_rows(extract_file)
+    assert read_rows(sharded.get("filtered_customers")) == read_rows(single.get("filtered_customers"))
+    assert sharded.data["artifacts"]["extract"]["shards"] == len({row[by] for row in read_rows(extract_file)})
+
+
+def test_merge_csv_keeps_one_header(tmp_path):
+    sources = []
+    for index in range(3):
+        path = tmp_path / f"part{index}.csv"
+        path.write_text(f"id,name\n{index},name {index}\n")
+        sources.append(str(path))
+    merge_csv(sources, str(tmp_path / "merged.csv"), ["id", "name"])
+    assert (tmp_path / "merged.csv").read_text().splitlines() == ["id,name", "0,name 0", "1,name 1", "2,name 2"]
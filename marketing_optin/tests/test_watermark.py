@@ -0,0 +1,64 @@
+import json
+import os
+from tools.csv_stream import iter_csv_chunks
+from tools.watermark import OptOutWatermark
+
+
+def write_customers(path, customers, mtime):
+    with open(path, "w") as file:
+        json.dump(customers, file)
+    # The customer cache is rebuilt when the source size or mtime changes
+    os.utime(path, (mtime, mtime))
+
+
+def listed_ids(path):
+    return {customer["id"] for _, chunk in iter_csv_chunks(path) for customer in chunk}
+
+
+def customer(customer_id, updated_at, opt_in):
+    return {"id": customer_id, "email": f"{customer_id.lower()}@example.com", "created_at": "2025-02-01",
+            "updated_at": updated_at, "opt_in": opt_in}
+
+
+def make_watermark(tmp_path):
+    return OptOutWatermark(str(tmp_path / "state.json"), str(tmp_path / "opt_out.csv"))
+
+
+def test_same_day_update_with_day_only_dates(tmp_path):
+    source = str(tmp_path / "customers.json")
+    watermark = make_watermark(tmp_path)
+    write_customers(source, [customer("C1", "2025-02-13", "N"), customer("C2", "2025-02-12", "N")], 1_000)
+    assert watermark.update(source)["changed"] == 2
+    assert listed_ids(watermark.list_path) == {"C1", "C2"}
+
+    # C1 opts in later on the watermark day: its updated_at does not move
+    write_customers(source, [customer("C1", "2025-02-13", "Y"), customer("C2", "2025-02-12", "N")], 2_000)
+    result = watermark.update(source)
+    assert result["changed"] == 1
+    assert result["removed"] == 1
+    assert listed_ids(watermark.list_path) == {"C2"}
+
+    # Nothing changed since
+    assert watermark.update(source)["changed"] == 0
+
+
+def test_same_day_update_with_timestamps(tmp_path):
+    source = str(tmp_path / "customers.json")
+    watermark = make_watermark(tmp_path)
+    write_customers(source, [customer("C1", "2025-02-13T09:00:00", "Y"),
+                             customer("C2", "2025-02-13T10:00:00", "Y")], 1_000)
+    assert watermark.update(source)["watermark"] == "2025-02-13T10:00:00"
+    assert listed_ids(watermark.list_path) == set()
+
+    # C1 opts out in the afternoon of the same day, before the watermark moves on
+    write_customers(source, [customer("C1", "2025-02-13T15:30:00", "N"),
+                             customer("C2", "2025-02-13T10:00:00", "Y")], 2_000)
+    result = watermark.update(source)
+    assert result["changed"] == 1
+    assert result["added"] == 1
+    assert result["watermark"] == "2025-02-13T15:30:00"
+    assert listed_ids(watermark.list_path) == {"C1"}
+
+    # The extract keeps the full timestamp of the source
+    with open(watermark.list_path) as file:
+        assert "2025-02-13T15:30:00" in file.read()
@@ -0,0 +1,150 @@
+import csv
+import gzip
+import io
+
+
+# Rows buffered between two writes, or read per chunk
+CHUNK_ROWS = 10_000
+
+# File extension added for each supported compression
+COMPRESSION_EXTENSIONS = {None: "", "gzip": ".gz", "zstd": ".zst"}
+
+
+def open_text(path, mode="r", compression=None):
+    """
+    Opens a CSV file as text, compressed with gzip or zstd when asked.
+    When reading, the compression is detected from the .gz / .zst extension.
+    """
+    if compression is None and mode == "r":
+        compression = compression_of(path)
+
+    if compression is None:
+        return open(path, mode, newline="")
+    if compression == "gzip":
+        return gzip.open(path, mode + "t", newline="")
+    if compression == "zstd":
+        try:
+            import zstandard
+        except ImportError:
+            raise ImportError("zstd compression requires the 'zstandard' package: pip install zstandard") from None
+        raw = zstandard.open(path, mode + "b")
+        return io.TextIOWrapper(raw, newline="")
+    raise ValueError(f"Unsupported compression '{compression}'. Use one of: gzip, zstd.")
+
+
+def csv_path(path, compression=None):
+    """Adds the extension of the compression to a .csv path."""
+    if compression not in COMPRESSION_EXTENSIONS:
+        raise ValueError(f"Unsupported compression '{compression}'. Use one of: gzip, zstd.")
+    return path + COMPRESSION_EXTENSIONS[compression]
+
+
+def compression_of(path):
+    """Returns the compression implied by the extension of path, or None."""
+    for compression, extension in COMPRESSION_EXTENSIONS.items():
+        if extension and path.endswith(extension):
+            return compression
+    return None
+
+
+def read_fieldnames(path):
+    """Returns the header of a (possibly compressed) CSV file."""
+    with open_text(path, "r") as file:
+        return csv.DictReader(file).fieldnames or []
+
+
+class CsvChunkWriter():
+
+    """
+    Writes dict records to a CSV file in chunks of at most chunk_size rows,
+    so the caller never has to hold more than one chunk in memory.
+    Attributes
+    ----------
+    path : str
+        Path of the CSV file being written.
+    rows : int
+        Number of records written so far.
+    Methods
+    -------
+    write(record):
+        Buffers one record, flushing the buffer once it holds chunk_size rows.
+    writerows(records):
+        Writes an iterable of records.
+    close():
+        Flushes the remaining rows and closes the file.
+    """
+
+    def __init__(self, path, fieldnames, compression=None, chunk_size=CHUNK_ROWS):
+        self.path = path
+        self.rows = 0
+        self.chunk_size = chunk_size
+        self._file = open_text(path, "w", compression)
+        self._writer = csv.DictWriter(self._file, fieldnames=fieldnames, restval="", extrasaction="ignore")
+        self._writer.writeheader()
+        self._buffer = []
+
+    def write(self, record):
+        self._buffer.append(record)
+        if len(self._buffer) >= self.chunk_size:
+            self.flush()
+
+    def writerows(self, records):
+        for record in records:
+            self.write(record)
+
+    def flush(self):
+        self._writer.writerows(self._buffer)
+        self.rows += len(self._buffer)
+        self._buffer = []
+
+    def close(self):
+        if self._file.closed:
+            return
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def iter_csv_chunks(path, chunk_size=CHUNK_ROWS):
+    """
+    Reads a (possibly compressed) CSV file in chunks.
+    Yields:
+        tuple: (fieldnames, list of at most chunk_size dict records)
+    """
+    with open_text(path, "r") as file:
+        reader = csv.DictReader(file)
+        chunk = []
+        yielded = False
+        for record in reader:
+            chunk.append(record)
+            if len(chunk) >= chunk_size:
+                yield reader.fieldnames, chunk
+                chunk = []
+                yielded = True
+        # Always yield at least once so callers see the header of an empty file
+        if chunk or not yielded:
+            yield reader.fieldnames or [], chunk
+
+
+def filter_csv(source, target, accept, compression=None, chunk_size=CHUNK_ROWS):
+    """
+    Copies the records of source for which accept(record) is true into target,
+    one chunk at a time.
+    Returns:
+        int: Number of records written.
+    """
+    writer = None
+    try:
+        for fieldnames, chunk in iter_csv_chunks(source, chunk_size):
+            if writer is None:
+                writer = CsvChunkWriter(target, fieldnames, compression, chunk_size)
+            writer.writerows(record for record in chunk if accept(record))
+    finally:
+        if writer is not None:
+            writer.close()
+    return writer.rows if writer is not None else 0
@@ -0,0 +1,397 @@
+import hashlib
+import json
+import os
+import shutil
+import numpy as np
+from datetime import datetime, timedelta, timezone
+from tools.customer_index import DateIndex
+from tools.customer_stream import as_list, iter_customers, opt_in_flag
+from tools.date_range import DateRange
+
+
+# Bump when the on-disk layout changes so old caches get rebuilt
+CACHE_VERSION = 2
+
+# Columns stored as integer codes into a dictionary of distinct values
+DICTIONARY_COLUMNS = ("shopping_store", "store_brand", "opt_in")
+
+# Columns stored as integer days since 1970-01-01 for the date indexes, along with their
+# full timestamps (microseconds since the epoch, UTC) and their source text
+DATE_COLUMNS = ("created_at", "updated_at")
+
+# Day value used for a missing or unparseable date
+NO_DATE = np.iinfo(np.int32).min
+
+# Timestamp value used for a missing or unparseable date
+NO_TIME = np.iinfo(np.int64).min
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class CustomerCache():
+
+    """
+    A columnar on-disk copy of a customers JSON file, stored beside the source as
+    .<name>.cache/ and reused until the source's mtime or content hash changes.
+    Attributes
+    ----------
+    source : str
+        Path to the customers JSON file.
+    cache_dir : str
+        Folder holding meta.json and one .npy file per column.
+    Methods
+    -------
+    load():
+        Returns the cached CustomerColumns, building the cache first when it is missing or stale.
+    is_fresh():
+        Checks whether the cache still matches the source file.
+    build():
+        Converts the source JSON file into the columnar cache.
+    """
+
+    def __init__(self, source):
+        self.source = source
+        folder, name = os.path.split(os.path.abspath(source))
+        self.cache_dir = os.path.join(folder, f".{name}.cache")
+        self.meta_path = os.path.join(self.cache_dir, "meta.json")
+
+    def load(self):
+        """Returns the customer columns, memory-mapped from the cache."""
+        if not self.is_fresh():
+            self.build()
+        return CustomerColumns.open(self.cache_dir)
+
+    def read_meta(self):
+        try:
+            with open(self.meta_path, "r") as file:
+                meta = json.load(file)
+        except (FileNotFoundError, ValueError):
+            return None
+        return meta if meta.get("version") == CACHE_VERSION else None
+
+    def is_fresh(self):
+        """
+        The cache is fresh when the source size and mtime match the cached ones.
+        When only the mtime moved (e.g. the file was copied or touched) the content
+        hash decides, and a matching hash just refreshes the stored mtime.
+        """
+        meta = self.read_meta()
+        if meta is None:
+            return False
+
+        stat = os.stat(self.source)
+        if stat.st_size != meta["source_size"]:
+            return False
+        if stat.st_mtime_ns == meta["source_mtime_ns"]:
+            return True
+        if file_sha256(self.source) != meta["source_sha256"]:
+            return False
+
+        meta["source_mtime_ns"] = stat.st_mtime_ns
+        _write_json(self.meta_path, meta)
+        return True
+
+    def build(self):
+        """Converts the source JSON into columns in a single streaming pass."""
+        stat = os.stat(self.source)
+        fieldnames = []
+        values = {}
+        rows = 0
+
+        for record in iter_customers(self.source):
+            for key in record:
+                if key not in values:
+                    fieldnames.append(key)
+                    values[key] = [None] * rows
+            for key in fieldnames:
+                values[key].append(record.get(key))
+            rows += 1
+
+        tmp_dir = f"{self.cache_dir}.tmp-{os.getpid()}"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        columns = {}
+        for key in fieldnames:
+            if key in DATE_COLUMNS:
+                np.save(os.path.join(tmp_dir, f"{key}.npy"), to_days(values[key]))
+                np.save(os.path.join(tmp_dir, f"{key}.time.npy"), to_timestamps(values[key]))
+                offsets, blob = _encode_strings(values[key])
+                np.save(os.path.join(tmp_dir, f"{key}.text.offsets.npy"), offsets)
+                np.save(os.path.join(tmp_dir, f"{key}.text.npy"), blob)
+                columns[key] = {"kind": "date"}
+            elif key in DICTIONARY_COLUMNS:
+                dictionary, codes = _dictionary_encode(values[key])
+                np.save(os.path.join(tmp_dir, f"{key}.npy"), codes)
+                columns[key] = {"kind": "dictionary", "values": dictionary}
+            else:
+                offsets, blob = _encode_strings(values[key])
+                np.save(os.path.join(tmp_dir, f"{key}.offsets.npy"), offsets)
+                np.save(os.path.join(tmp_dir, f"{key}.npy"), blob)
+                columns[key] = {"kind": "string"}
+            values[key] = None
+
+        _write_json(os.path.join(tmp_dir, "meta.json"), {
+            "version": CACHE_VERSION,
+            "source_size": stat.st_size,
+            "source_mtime_ns": stat.st_mtime_ns,
+            "source_sha256": file_sha256(self.source),
+            "rows": rows,
+            "fieldnames": fieldnames,
+            "columns": columns,
+        })
+
+        # Swap the new cache in, so readers never see a half written one
+        old_dir = f"{self.cache_dir}.old-{os.getpid()}"
+        if os.path.isdir(self.cache_dir):
+            os.replace(self.cache_dir, old_dir)
+        os.replace(tmp_dir, self.cache_dir)
+        shutil.rmtree(old_dir, ignore_errors=True)
+
+
+class CustomerColumns():
+
+    """
+    Memory-mapped customer columns loaded from a CustomerCache.
+    Attributes
+    ----------
+    rows : int
+        Number of customer records.
+    fieldnames : list
+        Field names in the order of the source file.
+    Methods
+    -------
+    select(created_at, updated_at, opt_in, shopping_store, store_brand):
+        Returns the row offsets of the customers matching the filters.
+    timestamps(name, rows):
+        Returns the full timestamps of a date column for the selected rows.
+    records(rows, fields):
+        Yields customer records as dicts for the selected rows.
+    batches(rows, fields, batch_size):
+        Yields the selected records in lists of at most batch_size dicts.
+    to_frame(rows, fields):
+        Returns the selected rows as a pandas DataFrame.
+    """
+
+    def __init__(self, cache_dir, meta):
+        self.cache_dir = cache_dir
+        self.meta = meta
+        self.rows = meta["rows"]
+        self.fieldnames = meta["fieldnames"]
+        self._arrays = {}
+        self._indexes = {}
+
+    @classmethod
+    def open(cls, cache_dir):
+        with open(os.path.join(cache_dir, "meta.json"), "r") as file:
+            return cls(cache_dir, json.load(file))
+
+    def __len__(self):
+        return self.rows
+
+    def kind(self, name):
+        return self.meta["columns"][name]["kind"]
+
+    def dictionary(self, name):
+        return self.meta["columns"][name]["values"]
+
+    def array(self, name, suffix=""):
+        """Returns the raw column array (codes, days or string bytes), memory-mapped."""
+        key = name + suffix
+        if key not in self._arrays:
+            path = os.path.join(self.cache_dir, f"{key}.npy")
+            self._arrays[key] = np.load(path, mmap_mode="r")
+        return self._arrays[key]
+
+    def select(self, created_at=None, updated_at=None, opt_in=None, shopping_store=None, store_brand=None):
+        """
+        Returns the row offsets, in file order, of the customers matching the filters.
+        Date ranges are answered by binary search on the sorted DateIndex, so the
+        remaining filters only look at the k rows inside the range.
+        """
+        rows = None
+        for name, date_range in (("created_at", created_at), ("updated_at", updated_at)):
+            if not date_range:
+                continue
+            found = self.date_rows(name, DateRange.parse(date_range))
+            rows = np.sort(found) if rows is None else np.intersect1d(rows, found)
+        if rows is None:
+            rows = np.arange(self.rows)
+
+        if opt_in is not None:
+            flags = {opt_in_flag(v) for v in as_list(opt_in)}
+            rows = rows[self.code_mask("opt_in", lambda value: opt_in_flag(value) in flags, rows)]
+        if shopping_store is not None:
+            stores = set(as_list(shopping_store))
+            rows = rows[self.code_mask("shopping_store", lambda value: value in stores, rows)]
+        if store_brand is not None:
+            brands = set(as_list(store_brand))
+            rows = rows[self.code_mask("store_brand", lambda value: value in brands, rows)]
+        return rows
+
+    def date_index(self, name):
+        """Returns the sorted index over a date column, building it on first use."""
+        if name not in self._indexes:
+            self._indexes[name] = DateIndex(self.cache_dir, name, self.array(name))
+        return self._indexes[name]
+
+    def date_rows(self, name, date_range):
+        """Returns the row offsets whose date column falls inside date_range, in date order."""
+        if name not in self.meta["columns"]:
+            return np.empty(0, dtype=np.int64)
+        return self.date_index(name).lookup(date_to_day(date_range.start), date_to_day(date_range.end))
+
+    def code_mask(self, name, accept, rows):
+        """Checks the dictionary codes of the given rows against the values accepted by accept."""
+        if name not in self.meta["columns"]:
+            return np.zeros(len(rows), dtype=bool)
+        wanted = [code for code, value in enumerate(self.dictionary(name)) if accept(value)]
+        return np.isin(self.array(name)[rows], np.asarray(wanted, dtype=np.int32))
+
+    def timestamps(self, name, rows):
+        """Returns the int64 microseconds since the epoch (UTC) of a date column, NO_TIME when missing."""
+        return self.array(name, ".time")[rows]
+
+    def values(self, name, rows):
+        """Decodes one column for the given row numbers into a list of Python values."""
+        kind = self.kind(name)
+        if kind == "date":
+            # The source text, so timestamps come back whole; the days only back the indexes
+            return [value or None for value in self._strings(f"{name}.text", rows)]
+        if kind == "dictionary":
+            dictionary = self.dictionary(name)
+            return [dictionary[code] for code in self.array(name)[rows]]
+        return self._strings(name, rows)
+
+    def records(self, rows=None, fields=None, batch_size=10_000):
+        """
+        Yields customer records as dicts.
+        Args:
+            rows: Boolean mask or array of row numbers; all rows when None.
+            fields (list): Optional list of fields to keep.
+            batch_size (int): Number of rows decoded at a time.
+        """
+        for batch in self.batches(rows, fields, batch_size):
+            yield from batch
+
+    def batches(self, rows=None, fields=None, batch_size=10_000):
+        """Yields the selected customer records as lists of at most batch_size dicts."""
+        rows = self._row_numbers(rows)
+        fields = [f for f in (fields or self.fieldnames) if f in self.meta["columns"]]
+        for start in range(0, len(rows), batch_size):
+            batch = rows[start:start + batch_size]
+            columns = [self.values(name, batch) for name in fields]
+            yield [dict(zip(fields, row)) for row in zip(*columns)]
+
+    def to_frame(self, rows=None, fields=None):
+        """Returns the selected rows as a DataFrame, keeping dictionary columns as categoricals."""
+        import pandas as pd
+
+        rows = self._row_numbers(rows)
+        fields = [f for f in (fields or self.fieldnames) if f in self.meta["columns"]]
+        data = {}
+        for name in fields:
+            if self.kind(name) == "dictionary":
+                data[name] = pd.Categorical.from_codes(np.asarray(self.array(name)[rows]),
+                                                       categories=_categories(self.dictionary(name)))
+            else:
+                data[name] = self.values(name, rows)
+        return pd.DataFrame(data, columns=fields)
+
+    def _strings(self, key, rows):
+        offsets = self.array(key, ".offsets")
+        blob = self.array(key)
+        return [bytes(blob[offsets[i]:offsets[i + 1]]).decode("utf-8") for i in rows]
+
+    def _row_numbers(self, rows):
+        if rows is None:
+            return np.arange(self.rows)
+        rows = np.asarray(rows)
+        if rows.dtype == bool:
+            return np.flatnonzero(rows)
+        return rows
+
+
+def load_customers(filepath):
+    """Returns the cached columns for a customers JSON file, (re)building the cache as needed."""
+    return CustomerCache(filepath).load()
+
+
+def file_sha256(filepath, chunk_size=1024 * 1024):
+    digest = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for chunk in iter(lambda: file.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def date_to_day(value):
+    return int(np.datetime64(value, "D").astype(np.int64))
+
+
+def to_days(values):
+    """Converts ISO date strings (or timestamps, by their leading date) to int32 days since the epoch."""
+    days = np.full(len(values), NO_DATE, dtype=np.int32)
+    for i, value in enumerate(values):
+        if not value:
+            continue
+        try:
+            days[i] = date_to_day(str(value)[:10])
+        except ValueError:
+            continue
+    return days
+
+
+def timestamp_to_micros(value):
+    """Converts an ISO date or timestamp to microseconds since the epoch, in UTC when it has an offset."""
+    moment = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    if moment.tzinfo is not None:
+        moment = moment.astimezone(timezone.utc).replace(tzinfo=None)
+    return (moment - EPOCH) // timedelta(microseconds=1)
+
+
+def to_timestamps(values):
+    """Converts ISO date strings or timestamps to int64 microseconds since the epoch."""
+    times = np.full(len(values), NO_TIME, dtype=np.int64)
+    for i, value in enumerate(values):
+        if not value:
+            continue
+        try:
+            times[i] = timestamp_to_micros(value)
+        except ValueError:
+            continue
+    return times
+
+
+def days_to_strings(days):
+    days = np.asarray(days)
+    strings = days.astype("datetime64[D]").astype(str).tolist()
+    return [None if day == NO_DATE else s for day, s in zip(days.tolist(), strings)]
+
+
+def _dictionary_encode(values):
+    dictionary = {}
+    codes = np.empty(len(values), dtype=np.int32)
+    for i, value in enumerate(values):
+        codes[i] = dictionary.setdefault(value, len(dictionary))
+    return list(dictionary), codes
+
+
+def _encode_strings(values):
+    encoded = [b"" if value is None else str(value).encode("utf-8") for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(v) for v in encoded], out=offsets[1:])
+    blob = np.frombuffer(b"".join(encoded), dtype=np.uint8)
+    return offsets, blob
+
+
+def _categories(dictionary):
+    # Categorical categories must be unique and not None
+    return ["" if value is None else value for value in dictionary]
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(data, file)
+    os.replace(tmp_path, path)
@@ -0,0 +1,71 @@
+from tools.csv_stream import CHUNK_ROWS, CsvChunkWriter, csv_path
+from tools.customer_cache import CustomerColumns, load_customers
+from tools.customer_stream import opt_in_flag
+from tools.date_range import DateRange
+
+
+def extract_customers(customers, date_range, manifest, opt_in=None, shopping_store=None, store_brand=None,
+                      compression=None, chunk_size=CHUNK_ROWS):
+    """
+    Filters customer records on created_at locally, before any agent runs.
+    The filter runs over the columnar cache of the JSON file, see tools.customer_cache.
+    The matching records are written to the run's folder and recorded as its
+    "extract" artifact, which the MarketingAgent's filter_customer tool reads.
+    When opt_in is given, the opt-in filter is fused into the same pass and its
+    output is recorded as the run's "filtered_customers" artifact.
+    Records are decoded and written chunk_size rows at a time, so memory use is
+    bounded by the chunk size rather than by the number of matching customers.
+    Args:
+        customers (str | CustomerColumns): Path to the customers JSON file, or its already loaded columns.
+        date_range (str | DateRange): Created date range, e.g. "2024-01-01 to 2024-01-31".
+        manifest (RunManifest): The manifest of the current run.
+        opt_in (str | bool): Optional opt-in flag to filter the extract on, e.g. "N".
+        shopping_store (str | list): Optional stores to restrict the extract to.
+        store_brand (str | list): Optional brands to restrict the extract to.
+        compression (str): Optional "gzip" or "zstd" compression of the CSV files.
+        chunk_size (int): Number of rows decoded and written at a time.
+    Returns:
+        tuple: (number of matching customers, path of the CSV file)
+    """
+    date_range = DateRange.parse(date_range)
+
+    columns = customers if isinstance(customers, CustomerColumns) else load_customers(customers)
+    rows = columns.select(created_at=date_range, shopping_store=shopping_store, store_brand=store_brand)
+
+    extract_file = csv_path(manifest.artifact_path("extract"), compression)
+    filtered_file = csv_path(manifest.artifact_path("filtered_customers"), compression) if opt_in is not None else None
+
+    extract_rows, filtered_rows = write_extract(columns, rows, extract_file, filtered_file, opt_in,
+                                                compression, chunk_size)
+
+    manifest.record("extract", extract_file, rows=extract_rows, date_range=str(date_range))
+    if filtered_file is not None:
+        manifest.record("filtered_customers", filtered_file, rows=filtered_rows,
+                        filter_column="opt_in", filter_value=opt_in_flag(opt_in))
+
+    return extract_rows, extract_file
+
+
+def write_extract(columns, rows, extract_file, filtered_file=None, opt_in=None, compression=None,
+                  chunk_size=CHUNK_ROWS):
+    """
+    Writes the selected rows to extract_file and, in the same pass, the ones whose
+    opt_in flag matches opt_in to filtered_file.
+    Returns:
+        tuple: (rows written to extract_file, rows written to filtered_file)
+    """
+    flag = opt_in_flag(opt_in) if filtered_file is not None else None
+
+    extract = CsvChunkWriter(extract_file, columns.fieldnames, compression, chunk_size)
+    filtered = CsvChunkWriter(filtered_file, columns.fieldnames, compression, chunk_size) if flag else None
+    try:
+        for batch in columns.batches(rows, batch_size=chunk_size):
+            extract.writerows(batch)
+            if filtered is not None:
+                filtered.writerows(c for c in batch if opt_in_flag(c.get("opt_in")) == flag)
+    finally:
+        extract.close()
+        if filtered is not None:
+            filtered.close()
+
+    return extract.rows, filtered.rows if filtered is not None else 0
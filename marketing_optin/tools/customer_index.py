@@ -0,0 +1,49 @@
+import os
+import threading
+import numpy as np
+
+
+class DateIndex():
+
+    """
+    A persistent sorted index over one date column of the customer cache.
+    The index is stored next to the column as <name>.keys.npy (sorted days) and
+    <name>.order.npy (row offsets in that order), so it is rebuilt together with the cache.
+    Attributes
+    ----------
+    name : str
+        The indexed date column, e.g. created_at or updated_at.
+    Methods
+    -------
+    lookup(start_day, end_day):
+        Returns the row offsets whose date falls in the inclusive day range.
+    """
+
+    def __init__(self, cache_dir, name, days):
+        self.name = name
+        keys_path = os.path.join(cache_dir, f"{name}.keys.npy")
+        order_path = os.path.join(cache_dir, f"{name}.order.npy")
+
+        if not (os.path.exists(keys_path) and os.path.exists(order_path)):
+            order = np.argsort(days, kind="stable").astype(np.int64)
+            _save(order_path, order)
+            _save(keys_path, np.asarray(days)[order])
+
+        self.keys = np.load(keys_path, mmap_mode="r")
+        self.order = np.load(order_path, mmap_mode="r")
+
+    def __len__(self):
+        return len(self.keys)
+
+    def lookup(self, start_day, end_day):
+        """Binary search for the bounds, then a slice of the row offsets: O(log n + k)."""
+        left = np.searchsorted(self.keys, start_day, side="left")
+        right = np.searchsorted(self.keys, end_day, side="right")
+        return self.order[left:right]
+
+
+def _save(path, array):
+    # Write to a temporary file first so concurrent readers never load a partial index
+    tmp_path = f"{path}.tmp-{os.getpid()}-{threading.get_ident()}.npy"
+    np.save(tmp_path, array)
+    os.replace(tmp_path, path)
@@ -0,0 +1,139 @@
+import json
+from tools.date_range import DateRange
+
+
+# Characters read from disk per refill of the parse buffer
+CHUNK_SIZE = 64 * 1024
+
+_WHITESPACE = " \t\n\r"
+_DELIMITERS = _WHITESPACE + ",]"
+
+
+def iter_customers(filepath, fields=None, created_at=None, opt_in=None, shopping_store=None,
+                   store_brand=None, chunk_size=CHUNK_SIZE):
+    """
+    Yields customer records one at a time from the top-level JSON array in filepath.
+    Only one chunk of the file plus the record being decoded is held in memory, so
+    memory use stays flat regardless of the file size.
+    Args:
+        filepath (str): Path to the customers JSON file.
+        fields (list): Optional list of keys to keep in each yielded record.
+        created_at (str | DateRange): Only yield customers created within this range.
+        opt_in (str | bool | list): Only yield customers with this opt-in flag ("Y"/"N" or True/False).
+        shopping_store (str | list): Only yield customers of these stores.
+        store_brand (str | list): Only yield customers of these brands.
+        chunk_size (int): Number of characters read per refill.
+    Yields:
+        dict: A customer record, projected on fields when given.
+    """
+    matches = customer_predicate(created_at=created_at, opt_in=opt_in,
+                                 shopping_store=shopping_store, store_brand=store_brand)
+
+    for record in _iter_array(filepath, chunk_size):
+        if matches is not None and not matches(record):
+            continue
+        if fields:
+            record = {key: record.get(key) for key in fields}
+        yield record
+
+
+def customer_predicate(created_at=None, opt_in=None, shopping_store=None, store_brand=None):
+    """
+    Builds a function that checks a customer record against the given filters.
+    Returns None when no filter is set so callers can skip the check entirely.
+    """
+    checks = []
+    if created_at:
+        date_range = DateRange.parse(created_at)
+        checks.append(lambda record: date_range.contains(record.get("created_at")))
+    if opt_in is not None:
+        flags = {opt_in_flag(v) for v in as_list(opt_in)}
+        checks.append(lambda record: opt_in_flag(record.get("opt_in")) in flags)
+    if shopping_store is not None:
+        stores = set(as_list(shopping_store))
+        checks.append(lambda record: record.get("shopping_store") in stores)
+    if store_brand is not None:
+        brands = set(as_list(store_brand))
+        checks.append(lambda record: record.get("store_brand") in brands)
+
+    if not checks:
+        return None
+    return lambda record: all(check(record) for check in checks)
+
+
+def opt_in_flag(value):
+    """Normalizes an opt-in value (True/False, "Y"/"N", "yes"/"no") to "Y" or "N"."""
+    if isinstance(value, bool):
+        return "Y" if value else "N"
+    return "Y" if str(value).strip().upper() in ("Y", "YES", "TRUE", "1") else "N"
+
+
+def as_list(value):
+    """Wraps a single filter value in a list."""
+    if isinstance(value, (str, bool)):
+        return [value]
+    return list(value)
+
+
+def _iter_array(filepath, chunk_size):
+    """Incrementally decodes the elements of a top-level JSON array."""
+    decoder = json.JSONDecoder()
+
+    with open(filepath, "r") as file:
+        buffer = file.read(chunk_size)
+        eof = not buffer
+        pos = 0
+
+        def skip(buffer, pos, chars):
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            return pos
+
+        # Find the opening bracket of the array
+        pos = skip(buffer, pos, _WHITESPACE)
+        while pos >= len(buffer) and not eof:
+            buffer = file.read(chunk_size)
+            eof = not buffer
+            pos = skip(buffer, 0, _WHITESPACE)
+        if pos >= len(buffer) or buffer[pos] != "[":
+            raise ValueError(f"{filepath} does not contain a top-level JSON array.")
+        pos += 1
+
+        while True:
+            pos = skip(buffer, pos, _WHITESPACE + ",")
+
+            # Drop what was already consumed and top the buffer up
+            if pos >= len(buffer) - 1 and not eof:
+                more = file.read(chunk_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+
+            if pos >= len(buffer):
+                raise ValueError(f"Unexpected end of file in {filepath}.")
+            if buffer[pos] == "]":
+                return
+
+            try:
+                record, end = decoder.raw_decode(buffer, pos)
+                # A number cut off by the buffer still decodes, e.g. 45 of 456 or -7 of -7.5:
+                # a value is only complete once the delimiter after it is in the buffer
+                complete = eof or (end < len(buffer) and buffer[end] in _DELIMITERS)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                # The record spans beyond the buffer, read another chunk and retry
+                more = file.read(chunk_size)
+                eof = not more
+                buffer = buffer[pos:] + more
+                pos = 0
+                continue
+
+            yield record
+            pos = end
+            if pos > chunk_size:
+                buffer = buffer[pos:]
+                pos = 0
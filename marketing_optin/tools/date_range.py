@@ -0,0 +1,98 @@
+import re
+from datetime import date, datetime
+
+
+# Separators accepted between the two dates, e.g. "2024-01-01 to 2024-01-31"
+RANGE_SEPARATORS = re.compile(r"\s+(?:to|through|thru|until|-|–)\s+|\s*(?:\.\.|,)\s*", re.IGNORECASE)
+
+# Date formats accepted for each bound of the range
+DATE_FORMATS = ("%Y-%m-%d", "%Y/%m/%d", "%m/%d/%Y", "%Y%m%d")
+
+
+class DateRange():
+
+    """
+    An inclusive range of calendar dates used to filter customer records.
+    Attributes
+    ----------
+    start : date
+        First day of the range (inclusive).
+    end : date
+        Last day of the range (inclusive).
+    Methods
+    -------
+    parse(text):
+        Builds a DateRange from a string such as "2024-01-01 to 2024-01-31".
+    contains(value):
+        Checks whether a date or an ISO date string falls inside the range.
+    """
+
+    def __init__(self, start, end):
+        if start > end:
+            raise ValueError(f"Invalid date range: start {start} is after end {end}.")
+        self.start = start
+        self.end = end
+        # ISO strings let us compare record values without parsing them
+        self._start_iso = start.isoformat()
+        self._end_iso = end.isoformat()
+
+    @classmethod
+    def parse(cls, text):
+        """
+        Parses a date range string into typed bounds.
+        Args:
+            text (str): Either a single date or two dates separated by "to", "-", ".." or ",".
+        Returns:
+            DateRange: The parsed inclusive range.
+        """
+        if isinstance(text, DateRange):
+            return text
+        if not text or not str(text).strip():
+            raise ValueError("Date range is empty.")
+
+        parts = [p for p in RANGE_SEPARATORS.split(str(text).strip()) if p]
+        if len(parts) == 1:
+            day = parse_date(parts[0])
+            return cls(day, day)
+        if len(parts) != 2:
+            raise ValueError(f"Could not parse date range '{text}'. Expected e.g. '2024-01-01 to 2024-01-31'.")
+        return cls(parse_date(parts[0]), parse_date(parts[1]))
+
+    def contains(self, value):
+        """
+        Returns True when the value falls inside the range.
+        Strings are compared on their leading YYYY-MM-DD part, which also covers ISO timestamps.
+        """
+        if value is None or value == "":
+            return False
+        if isinstance(value, datetime):
+            value = value.date()
+        if isinstance(value, date):
+            return self.start <= value <= self.end
+        return self._start_iso <= str(value)[:10] <= self._end_iso
+
+    def __contains__(self, value):
+        return self.contains(value)
+
+    def __eq__(self, other):
+        return isinstance(other, DateRange) and (self.start, self.end) == (other.start, other.end)
+
+    def __hash__(self):
+        return hash((self.start, self.end))
+
+    def __repr__(self):
+        return f"DateRange({self._start_iso} to {self._end_iso})"
+
+    def __str__(self):
+        return f"{self._start_iso} to {self._end_iso}"
+
+
+def parse_date(text):
+    """Parses a single date in one of the supported DATE_FORMATS."""
+    text = text.strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date()
+        except ValueError:
+            continue
+    raise ValueError(f"Invalid date '{text}'. Expected YYYY-MM-DD.")
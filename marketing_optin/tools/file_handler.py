@@ -1,71 +1,105 @@
-import json
 import pandas as pd
 from datetime import datetime
 from langchain.tools import tool
-from glob import glob
-import os
+from crew_common.artifact_store import artifacts, put_records
+from tools.csv_stream import CHUNK_ROWS, CsvChunkWriter, compression_of, csv_path, filter_csv, read_fieldnames
+from tools.customer_cache import load_customers
+from tools.customer_stream import opt_in_flag
+from tools.run_manifest import RunManifest
 
 class FileHandlerTool():
 
     @tool("Load the JSON file from the path")
-    def load_json(filepath):
+    def load_json(filepath, fields=None, created_at=None, opt_in=None, shopping_store=None, store_brand=None):
         """
-        Loads the JSON file provided in the data folder.
+        Loads the customer records from the JSON file provided in the data folder.
+        Records are read from the columnar cache beside the file; only customers matching the
+        optional created_at date range, opt_in flag, shopping_store and store_brand filters are
+        kept, projected on the optional list of fields.
+        Returns a handle to the records plus a summary (row count, schema, aggregates) instead of
+        the records themselves; pass the handle to save_csv as customers.
         """
-        with open(filepath, 'r') as file:
-            return json.load(file)
+        columns = load_customers(filepath)
+        rows = columns.select(created_at=created_at, opt_in=opt_in,
+                              shopping_store=shopping_store, store_brand=store_brand)
+        return put_records(list(columns.records(rows, fields=fields)), kind="customers")
 
     @tool("Save the data in the CSV file")
-    def save_csv(customers, filename_prefix="filtered_customers"):
+    def save_csv(customers, filename_prefix="filtered_customers", run_id=None):
         """
         Extracts data from JSON and saves it into a CSV file.
-        The filename follows the pattern: YYYYMMDD_HHMMSS_filename_prefix.csv.
+        customers is either the handle returned by load_json or a list of customer records.
+        With a run_id the file is saved as the run's extract in data/runs/<run_id>/,
+        otherwise the filename follows the pattern: YYYYMMDD_HHMMSS_filename_prefix.csv.
         """
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")  # Format: YYYYMMDD_HHMMSS
-        filepath = f"data/{timestamp}_{filename_prefix}.csv"
-        
-        # Ensure customers is a valid DataFrame
-        if isinstance(customers, list) and all(isinstance(c, dict) for c in customers):
-            df = pd.DataFrame(customers)
-        elif isinstance(customers, pd.DataFrame):
-            df = customers
-        else:
+        customers = artifacts.resolve(customers)
+        is_records = isinstance(customers, list) and all(isinstance(c, dict) for c in customers)
+        if not is_records and not isinstance(customers, pd.DataFrame):
             raise ValueError("Invalid format: 'customers' should be a list of dictionaries or a DataFrame.")
 
-        df.to_csv(filepath, index=False)
+        if run_id:
+            manifest = RunManifest.open(run_id)
+            filepath = manifest.artifact_path("extract")
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")  # Format: YYYYMMDD_HHMMSS
+            filepath = f"data/{timestamp}_{filename_prefix}.csv"
+
+        # Lists are written in chunks, DataFrames through pandas' chunked writer
+        if is_records:
+            fieldnames = list(dict.fromkeys(key for c in customers for key in c))
+            with CsvChunkWriter(filepath, fieldnames) as writer:
+                writer.writerows(customers)
+            rows = writer.rows
+        else:
+            customers.to_csv(filepath, index=False, chunksize=CHUNK_ROWS)
+            rows = len(customers)
+
+        if run_id:
+            manifest.record("extract", filepath, rows=rows)
+            # The fused filter output was derived from the extract just replaced
+            manifest.remove("filtered_customers")
         return filepath
 
     @tool("Filter customer data based on conditions")
-    def filter_customer(filter_column="opt_in", filter_value=False):
+    def filter_customer(run_id, filter_column="opt_in", filter_value=False):
         """
-        Reads the latest available '*_filtered_customers.csv' file and applies a filter condition.
-        After reading, the file is renamed to '*.csv.read'.
-        The filtered data is saved as a new 'filtered_customers.csv'.
+        Reads the customer extract recorded for the run_id given in the task and applies a filter condition.
+        The extract is streamed through the filter in chunks and saved as filtered_customers.csv in the
+        run's folder; its path is returned.
         """
         try:
-            # Step 1: Find the latest file matching *_filtered_customers.csv
-            file_list = glob("data/*_filtered_customers.csv")
-            if not file_list:
-                return "No matching files found."
+            # Step 1: Look up the extract written by this run
+            manifest = RunManifest.open(run_id)
+            extract_file = manifest.get("extract")
+            if not extract_file:
+                return f"No customer extract recorded for run '{run_id}'."
 
-            # Sort files by modification time (most recent first)
-            latest_file = max(file_list, key=os.path.getmtime)
+            # Reuse the output of the fused extract + opt-in pass when it applied the same filter
+            if filter_column == "opt_in":
+                accept_value = opt_in_flag(filter_value)
 
-            # Step 2: Read the latest CSV file
-            df = pd.read_csv(latest_file)
+                def accept(record):
+                    return opt_in_flag(record.get(filter_column)) == accept_value
+            else:
+                accept_value = str(filter_value)
 
-            # Ensure the filter column exists
-            if filter_column not in df.columns:
-                raise KeyError(f"Column '{filter_column}' not found in CSV file.")
+                def accept(record):
+                    return record.get(filter_column) == accept_value
+            filtered = manifest.data["artifacts"].get("filtered_customers")
+            if filtered and (filtered.get("filter_column"), filtered.get("filter_value")) == (filter_column, accept_value):
+                return filtered["path"]
 
-            # Apply filtering
-            filtered_df = df[df[filter_column] == filter_value]
+            # Step 2: Ensure the filter column exists
+            if filter_column not in read_fieldnames(extract_file):
+                raise KeyError(f"Column '{filter_column}' not found in CSV file.")
 
-            # Step 3: Save the filtered data with the same pattern
-            filtered_filepath = "data/filtered_customers.csv"
-            filtered_df.to_csv(filtered_filepath, index=False)
+            # Step 3: Stream the extract through the filter into the run's folder
+            compression = compression_of(extract_file)
+            filtered_filepath = csv_path(manifest.artifact_path("filtered_customers"), compression)
+            rows = filter_csv(extract_file, filtered_filepath, accept, compression)
+            manifest.record("filtered_customers", filtered_filepath, rows=rows,
+                            filter_column=filter_column, filter_value=accept_value)
 
             return filtered_filepath
         except Exception as e:
             return f"Error processing file: {str(e)}"
-
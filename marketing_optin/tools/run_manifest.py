@@ -0,0 +1,157 @@
+import contextlib
+import json
+import os
+import shutil
+import threading
+import uuid
+from datetime import datetime, timedelta
+
+
+# Folder holding one sub folder per run
+RUNS_DIR = "data/runs"
+
+# Retention policy applied by prune_runs: keep at most KEEP_RUNS finished runs, none older than MAX_AGE_DAYS
+KEEP_RUNS = 50
+MAX_AGE_DAYS = 30
+
+
+class RunManifest():
+
+    """
+    Records the artifacts written by one crew run in data/runs/<run_id>/manifest.json.
+    Each run writes into its own folder, so concurrent runs never overwrite each
+    other, and tools look up their input by run id instead of scanning data/.
+    Attributes
+    ----------
+    run_id : str
+        Unique id of the run, sortable by start time.
+    run_dir : str
+        Folder holding the run's manifest and artifacts.
+    Methods
+    -------
+    create(runs_dir, **info):
+        Starts a new run and writes its manifest.
+    open(run_id, runs_dir):
+        Loads the manifest of an existing run.
+    artifact_path(name, extension):
+        Returns the path an artifact of this run should be written to.
+    record(name, path, **details):
+        Adds an artifact to the manifest.
+    get(name):
+        Returns the path of a recorded artifact.
+    remove(name):
+        Drops an artifact from the manifest and deletes its file.
+    finish(status):
+        Marks the run as completed or failed.
+    """
+
+    def __init__(self, run_id, runs_dir=RUNS_DIR, data=None):
+        self.run_id = run_id
+        self.run_dir = os.path.join(runs_dir, run_id)
+        self.path = os.path.join(self.run_dir, "manifest.json")
+        self.data = data if data is not None else self._read()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def create(cls, runs_dir=RUNS_DIR, **info):
+        run_id = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:8]}"
+        manifest = cls(run_id, runs_dir, data={
+            "run_id": run_id,
+            "status": "running",
+            "started_at": datetime.now().isoformat(timespec="seconds"),
+            "finished_at": None,
+            "info": info,
+            "artifacts": {},
+        })
+        os.makedirs(manifest.run_dir)
+        manifest._write()
+        return manifest
+
+    @classmethod
+    def open(cls, run_id, runs_dir=RUNS_DIR):
+        if not run_id or os.sep in run_id or run_id.startswith("."):
+            raise ValueError(f"Invalid run id '{run_id}'.")
+        return cls(run_id, runs_dir)
+
+    def artifact_path(self, name, extension=".csv"):
+        return os.path.join(self.run_dir, f"{name}{extension}")
+
+    def record(self, name, path, **details):
+        with self._lock:
+            # Pick up artifacts recorded through other handles on the same run first
+            self.data = self._read()
+            self.data["artifacts"][name] = {
+                "path": path,
+                "created_at": datetime.now().isoformat(timespec="seconds"),
+                **details,
+            }
+            self._write()
+        return path
+
+    def get(self, name):
+        artifact = self.data["artifacts"].get(name)
+        return artifact["path"] if artifact else None
+
+    def remove(self, name):
+        """Drops a stale artifact, e.g. one derived from an artifact being replaced; returns its path."""
+        with self._lock:
+            self.data = self._read()
+            artifact = self.data["artifacts"].pop(name, None)
+            if artifact is None:
+                return None
+            self._write()
+        with contextlib.suppress(FileNotFoundError):
+            os.remove(artifact["path"])
+        return artifact["path"]
+
+    def finish(self, status="completed"):
+        with self._lock:
+            self.data["status"] = status
+            self.data["finished_at"] = datetime.now().isoformat(timespec="seconds")
+            self._write()
+
+    def _read(self):
+        try:
+            with open(self.path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"No manifest found for run '{self.run_id}'.") from None
+
+    def _write(self):
+        tmp_path = f"{self.path}.tmp-{os.getpid()}-{threading.get_ident()}"
+        with open(tmp_path, "w") as file:
+            json.dump(self.data, file, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def prune_runs(runs_dir=RUNS_DIR, keep=KEEP_RUNS, max_age_days=MAX_AGE_DAYS, exclude=()):
+    """
+    Deletes the folders of old finished runs.
+    Of the finished runs the newest `keep` runs younger than `max_age_days` are kept.
+    Runs still marked as running are only removed once older than `max_age_days`.
+    The runs in `exclude`, e.g. those of a batch that just finished, are always kept.
+    Returns:
+        list: Ids of the removed runs.
+    """
+    if not os.path.isdir(runs_dir):
+        return []
+
+    cutoff = (datetime.now() - timedelta(days=max_age_days)).strftime("%Y%m%d_%H%M%S")
+    finished = []
+    removed = []
+    for run_id in sorted(os.listdir(runs_dir), reverse=True):
+        if run_id in exclude:
+            continue
+        try:
+            status = RunManifest(run_id, runs_dir).data.get("status")
+        except (FileNotFoundError, ValueError):
+            continue
+        if status != "running":
+            finished.append(run_id)
+        elif run_id < cutoff:
+            removed.append(run_id)
+
+    removed += [run_id for i, run_id in enumerate(finished) if i >= keep or run_id < cutoff]
+    for run_id in removed:
+        shutil.rmtree(os.path.join(runs_dir, run_id), ignore_errors=True)
+    return removed
@@ -0,0 +1,128 @@
+import csv
+import os
+import re
+import shutil
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from tools.csv_stream import CHUNK_ROWS, csv_path, open_text
+from tools.customer_cache import CustomerColumns, load_customers
+from tools.customer_filter import write_extract
+from tools.customer_stream import opt_in_flag
+from tools.date_range import DateRange
+
+
+# Columns customers can be partitioned on
+SHARD_COLUMNS = ("store_brand", "shopping_store")
+
+
+def extract_customers_sharded(customers_file, date_range, manifest, by="store_brand", opt_in=None,
+                              max_workers=None, per_shard_files=False, compression=None, chunk_size=CHUNK_ROWS):
+    """
+    Sharded version of extract_customers: the customers created in the date range are
+    selected once and partitioned by store or brand, then each shard's rows are decoded,
+    written and run through the opt-in filter in a process pool. Shards without customers
+    in the range get no process. The shard outputs are merged, shard by shard, into the run's
+    "extract" and "filtered_customers" artifacts, so rows are grouped by shard in the merged files.
+    Args:
+        customers_file (str): Path to the customers JSON file.
+        date_range (str | DateRange): Created date range, e.g. "2024-01-01 to 2024-01-31".
+        manifest (RunManifest): The manifest of the current run.
+        by (str): Column to shard on, "store_brand" or "shopping_store".
+        opt_in (str | bool): Optional opt-in flag to filter the extract on, e.g. "N".
+        max_workers (int): Number of worker processes, defaults to the number of CPUs.
+        per_shard_files (bool): Keep the per-shard files and record them in the manifest.
+        compression (str): Optional "gzip" or "zstd" compression of the CSV files.
+        chunk_size (int): Number of rows decoded and written at a time.
+    Returns:
+        tuple: (number of matching customers, path of the merged CSV file)
+    """
+    if by not in SHARD_COLUMNS:
+        raise ValueError(f"Cannot shard on '{by}'. Use one of: {', '.join(SHARD_COLUMNS)}.")
+    date_range = DateRange.parse(date_range)
+
+    # Build the cache and select the rows once, so the workers only memory-map the columns they decode
+    columns = load_customers(customers_file)
+    rows = columns.select(created_at=date_range)
+    shards = partition_rows(columns, rows, by) if by in columns.meta["columns"] else []
+
+    shard_dir = os.path.join(manifest.run_dir, "shards")
+    os.makedirs(shard_dir, exist_ok=True)
+
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [
+            executor.submit(_extract_shard, columns.cache_dir, shard_rows, value,
+                            os.path.join(shard_dir, _shard_name(code, by, value)), opt_in, compression, chunk_size)
+            for code, value, shard_rows in shards
+        ]
+        results = [future.result() for future in futures]
+
+    extract_file = csv_path(manifest.artifact_path("extract"), compression)
+    filtered_file = csv_path(manifest.artifact_path("filtered_customers"), compression) if opt_in is not None else None
+
+    extract_rows = sum(r["extract_rows"] for r in results)
+    merge_csv([r["extract"] for r in results], extract_file, columns.fieldnames, compression)
+    manifest.record("extract", extract_file, rows=extract_rows, date_range=str(date_range),
+                    sharded_by=by, shards=len(results))
+    if filtered_file is not None:
+        filtered_rows = sum(r["filtered_rows"] for r in results)
+        merge_csv([r["filtered"] for r in results], filtered_file, columns.fieldnames, compression)
+        manifest.record("filtered_customers", filtered_file, rows=filtered_rows,
+                        filter_column="opt_in", filter_value=opt_in_flag(opt_in))
+
+    if per_shard_files:
+        for result in results:
+            name = f"shard:{by}={result['value']}"
+            manifest.record(f"{name}:extract", result["extract"], rows=result["extract_rows"])
+            if result["filtered"]:
+                manifest.record(f"{name}:filtered_customers", result["filtered"], rows=result["filtered_rows"])
+    else:
+        shutil.rmtree(shard_dir, ignore_errors=True)
+
+    return extract_rows, extract_file
+
+
+def partition_rows(columns, rows, by):
+    """
+    Groups row offsets by the dictionary code of a column with one stable sort, so each
+    group stays in file order.
+    Returns:
+        list: (code, value, row offsets) of the values that have rows, in dictionary order.
+    """
+    dictionary = columns.dictionary(by)
+    codes = np.asarray(columns.array(by)[rows])
+    order = np.argsort(codes, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=len(dictionary)))))
+    return [(code, value, np.asarray(rows[order[bounds[code]:bounds[code + 1]]], dtype=np.int64))
+            for code, value in enumerate(dictionary) if bounds[code + 1] > bounds[code]]
+
+
+def merge_csv(sources, target, fieldnames, compression=None, chunk_size=1024 * 1024):
+    """Concatenates CSV files sharing the same header into target, skipping their header lines."""
+    with open_text(target, "w", compression) as out:
+        csv.writer(out).writerow(fieldnames)
+        for source in sources:
+            with open_text(source, "r") as file:
+                file.readline()
+                shutil.copyfileobj(file, out, chunk_size)
+
+
+def _extract_shard(cache_dir, rows, value, shard_path, opt_in, compression, chunk_size):
+    """Runs in a worker process: writes and filters the customers of one shard, given their row offsets."""
+    columns = CustomerColumns.open(cache_dir)
+
+    extract_file = csv_path(f"{shard_path}.extract.csv", compression)
+    filtered_file = csv_path(f"{shard_path}.filtered_customers.csv", compression) if opt_in is not None else None
+    extract_rows, filtered_rows = write_extract(columns, rows, extract_file, filtered_file, opt_in,
+                                                compression, chunk_size)
+    return {
+        "value": value,
+        "extract": extract_file,
+        "extract_rows": extract_rows,
+        "filtered": filtered_file,
+        "filtered_rows": filtered_rows,
+    }
+
+
+def _shard_name(code, by, value):
+    # Store and brand names may contain characters that are not safe in file names
+    return f"{code:04d}_{by}_{re.sub(r'[^A-Za-z0-9_.-]+', '_', str(value))}"
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import os
+import numpy as np
+from datetime import date, timedelta
+from tools.csv_stream import CHUNK_ROWS, CsvChunkWriter, iter_csv_chunks
+from tools.customer_cache import EPOCH, NO_TIME, load_customers, timestamp_to_micros
+from tools.customer_stream import opt_in_flag
+from tools.date_range import DateRange
+
+
+# Persisted high-watermark and the maintained list of customers who have not opted in
+STATE_FILE = "data/optin_state.json"
+OPT_OUT_FILE = "data/opt_out_customers.csv"
+
+
+class OptOutWatermark():
+
+    """
+    Incrementally maintains the list of customers who have not opted in.
+    After each successful update the highest updated_at timestamp seen (the watermark)
+    and a fingerprint of every customer updated at that very timestamp are persisted;
+    the next update only processes customers updated after the watermark, and those
+    updated at it whose record no longer matches its fingerprint. A source that only
+    records the day of updated_at thus still has a second change on the same day picked
+    up. The date index of the customer cache finds them in O(log n + k).
+    Attributes
+    ----------
+    state_path : str
+        JSON file holding the watermark.
+    list_path : str
+        CSV file holding the maintained opt-out list.
+    Methods
+    -------
+    update(customers_file, manifest):
+        Processes the changed customers and merges them into the opt-out list.
+    """
+
+    def __init__(self, state_path=STATE_FILE, list_path=OPT_OUT_FILE):
+        self.state_path = state_path
+        self.list_path = list_path
+
+    def read_state(self):
+        try:
+            with open(self.state_path, "r") as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {"watermark": None, "fingerprints_at_watermark": {}}
+
+    def update(self, customers_file, manifest=None, chunk_size=CHUNK_ROWS):
+        """
+        Args:
+            customers_file (str): Path to the customers JSON file.
+            manifest (RunManifest): Optional run manifest recording the changed customers and the list.
+            chunk_size (int): Number of rows decoded and written at a time.
+        Returns:
+            dict: Number of changed, added and removed customers, list size and the new watermark.
+        """
+        state = self.read_state()
+        columns = load_customers(customers_file)
+        watermark = state["watermark"]
+        # States written before fingerprints were kept have none: every customer at the watermark is processed
+        fingerprints = state.get("fingerprints_at_watermark", {})
+
+        # Customers updated at or after the watermark; the index is by the day of the source text,
+        # which can be a day behind the UTC timestamp, hence the lookup starts a day earlier
+        if "updated_at" not in columns.meta["columns"]:
+            raise ValueError(f"{customers_file} has no updated_at column to track changes with.")
+        if watermark:
+            since = timestamp_to_micros(watermark)
+            start = (EPOCH + timedelta(microseconds=since)).date() - timedelta(days=1)
+            rows = columns.date_rows("updated_at", DateRange(start, date.max))
+        else:
+            since = NO_TIME
+            rows = columns.date_index("updated_at").order
+        times = np.asarray(columns.timestamps("updated_at", rows))
+        rows, times = rows[times != NO_TIME], times[times != NO_TIME]
+
+        # At the watermark only the customers whose record changed since the last update
+        at_watermark = np.flatnonzero(times == since)
+        edited = [index for index, (customer_id, fingerprint)
+                  in zip(at_watermark, self._fingerprints(columns, rows[at_watermark]))
+                  if fingerprints.get(customer_id) != fingerprint]
+        selected = times > since
+        selected[edited] = True
+        changed = np.asarray(rows[selected], dtype=np.int64)
+
+        changed_ids = set()
+        now_listed = set()
+        changed_file = manifest.artifact_path("extract") if manifest else None
+        changed_out = CsvChunkWriter(changed_file, columns.fieldnames) if manifest else None
+        try:
+            for batch in columns.batches(changed, batch_size=chunk_size):
+                for customer in batch:
+                    changed_ids.add(customer["id"])
+                    if opt_in_flag(customer.get("opt_in")) == "N":
+                        now_listed.add(customer["id"])
+                if changed_out is not None:
+                    changed_out.writerows(batch)
+        finally:
+            if changed_out is not None:
+                changed_out.close()
+
+        previously_listed, size = self._merge(columns, changed, changed_ids, chunk_size)
+
+        # Advance the watermark only once the list is safely replaced
+        if len(changed):
+            last = times.max()
+            state = {"watermark": (EPOCH + timedelta(microseconds=int(last))).isoformat(),
+                     "fingerprints_at_watermark": dict(self._fingerprints(columns, rows[times == last]))}
+            _write_json(self.state_path, state)
+
+        if manifest:
+            manifest.record("extract", changed_file, rows=len(changed), since=watermark)
+            manifest.record("opt_out_customers", self.list_path, rows=size)
+
+        return {
+            "changed": len(changed),
+            "added": len(now_listed - previously_listed),
+            "removed": len(previously_listed - now_listed),
+            "opt_out_customers": size,
+            "watermark": state["watermark"],
+        }
+
+    def _fingerprints(self, columns, rows):
+        """Yields (id, hash of the whole record) for the given rows."""
+        for customer in columns.records(rows):
+            record = json.dumps(customer, sort_keys=True, default=str)
+            yield customer["id"], hashlib.sha1(record.encode("utf-8")).hexdigest()
+
+    def _merge(self, columns, changed, changed_ids, chunk_size):
+        """
+        Rewrites the opt-out list: entries of changed customers are dropped and replaced by
+        their current record when they still have not opted in.
+        Returns:
+            tuple: (ids of changed customers that were on the list, new list size)
+        """
+        previously_listed = set()
+        tmp_path = f"{self.list_path}.tmp-{os.getpid()}"
+        folder = os.path.dirname(self.list_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+
+        with CsvChunkWriter(tmp_path, columns.fieldnames, chunk_size=chunk_size) as out:
+            if os.path.exists(self.list_path):
+                for _, chunk in iter_csv_chunks(self.list_path, chunk_size):
+                    for customer in chunk:
+                        if customer["id"] in changed_ids:
+                            previously_listed.add(customer["id"])
+                        else:
+                            out.write(customer)
+            for batch in columns.batches(changed, batch_size=chunk_size):
+                out.writerows(c for c in batch if opt_in_flag(c.get("opt_in")) == "N")
+
+        os.replace(tmp_path, self.list_path)
+        return previously_listed, out.rows
+
+
+def _write_json(path, data):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        json.dump(data, file, indent=2)
+    os.replace(tmp_path, path)
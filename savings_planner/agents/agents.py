@@ -1,24 +1,46 @@
-from crewai import Agent
-from langchain_openai import ChatOpenAI
-from typing import List
-from tools.tools import FinancialTools
+from typing import List, TYPE_CHECKING
+from crew_common.llm_registry import chat_model
+
+if TYPE_CHECKING:
+    from crewai import Agent
 
 class Agents:
         
-    def __init__(self):
+    def __init__(self, cache=None):
         """
-        Initializes the agent with two OpenAI GPT models.
+        Args:
+            cache (DiskLRUCache): Response cache for both models, defaults to the shared on-disk cache,
+                see crew_common/llm_cache.py.
         Attributes:
-            OpenAIGPT35 (ChatOpenAI): An instance of the ChatOpenAI class using the GPT-3.5-turbo model with a temperature of 0.7.
-            OpenAIGPT4 (ChatOpenAI): An instance of the ChatOpenAI class using the GPT-4 model with a temperature of 0.7.
+            OpenAIGPT35 (LLM): The shared client using the GPT-3.5-turbo model with a temperature of 0.7.
+            OpenAIGPT4 (LLM): The shared client using the GPT-4 model with a temperature of 0.7.
+        The clients are created on first use and shared by the whole process, see crew_common/llm_registry.py.
+        Each agent is created once per Agents instance, so the tasks and the crew use the same agents.
         """
 
-        self.OpenAIGPT35 = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.7)
-        self.OpenAIGPT4 = ChatOpenAI(model="gpt-4", temperature=0.7)
+        self.cache = cache
+        self._agents = {}
+
+    @property
+    def OpenAIGPT35(self):
+        return chat_model("gpt-3.5-turbo", 0.7, self.cache)
+
+    @property
+    def OpenAIGPT4(self):
+        return chat_model("gpt-4", 0.7, self.cache)
 
+    def _agent(self, name: str, **config) -> "Agent":
+        """Creates the named agent on first use and returns the same instance afterwards."""
+        if name not in self._agents:
+            from crewai import Agent
+            self._agents[name] = Agent(llm=self.OpenAIGPT35, verbose=True, **config)
+        return self._agents[name]
 
-    def create_expense_analyst(self) -> Agent:
-        return Agent(
+    def create_expense_analyst(self) -> "Agent":
+        from tools.tools import FinancialTools
+
+        return self._agent(
+            "expense_analyst",
             role='Expense Analyst',
             goal='Analyze and categorize expenses, identifying patterns and potential savings',
             backstory="""You are an expert financial analyst specializing in personal expense analysis.
@@ -26,41 +48,45 @@ class Agents:
             You have years of experience in categorizing expenses and detecting unusual spending patterns.""",
             tools=[
                 FinancialTools.calculate_category_totals,
-                FinancialTools.calculate_daily_averages
-            ],
-            llm=self.OpenAIGPT35,
-            verbose=True
+                FinancialTools.calculate_daily_averages,
+                FinancialTools.detect_unusual_transactions,
+                FinancialTools.detect_recurring_expenses
+            ]
         )
 
-    def create_savings_advisor(self) -> Agent:
-        return Agent(
+    def create_savings_advisor(self) -> "Agent":
+        from tools.tools import FinancialTools
+
+        return self._agent(
+            "savings_advisor",
             role='Savings Advisor',
             goal='Generate actionable savings recommendations based on expense analysis',
             backstory="""You are a professional financial advisor with years of experience in helping
             people optimize their savings. You excel at creating personalized saving strategies and
             providing practical advice that leads to measurable results.""",
             tools=[
-                FinancialTools.project_annual_savings
-            ],
-            llm=self.OpenAIGPT35,
-            verbose=True
+                FinancialTools.project_annual_savings,
+                FinancialTools.compare_savings_scenarios
+            ]
         )
 
-    def create_goal_specialist(self) -> Agent:
-        return Agent(
+    def create_goal_specialist(self) -> "Agent":
+        from tools.tools import FinancialTools
+
+        return self._agent(
+            "goal_specialist",
             role='Financial Goal Specialist',
             goal='Set and track realistic financial goals based on spending patterns and savings potential',
             backstory="""You are a goal-setting expert who specializes in creating achievable financial
             targets. You understand how to balance ambition with reality, ensuring that financial goals
             are both challenging and attainable.""",
             tools=[
-                FinancialTools.project_annual_savings
-            ],
-            llm=self.OpenAIGPT35,
-            verbose=True
+                FinancialTools.project_annual_savings,
+                FinancialTools.compare_savings_scenarios
+            ]
         )
 
-    def get_all_agents(self) -> List[Agent]:
+    def get_all_agents(self) -> List["Agent"]:
         """Return all agents in the correct order for the workflow."""
         return [
             self.create_expense_analyst(),
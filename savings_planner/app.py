@@ -1,73 +1,124 @@
 import streamlit as st
-import pandas as pd
 import logging
-from crewai import Crew, Process
+import os
+import time
 from dotenv import load_dotenv
 from agents.agents import Agents
 from tasks.tasks import Tasks
-from tools.tools import FinancialTools
+from crew_common.job_queue import MAX_CONCURRENT_JOBS, JobQueue
 import json
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
     
 
-def main():
-    load_dotenv()
-    csv_file = "./data/expenses.csv"
+def run_savings_crew(report, csv_file, dag=False):
+    """Job body executed by the JobQueue worker thread."""
+    from crewai import Crew, Process
+    from tools.tools import FinancialTools
+    from tools import analytics_cache
+    from tools.task_graph import TaskGraph
+
     agents = Agents()
     tasks = Tasks(agents)
     tools = FinancialTools()
+
+    expenses = tools.load_from_csv(csv_file)
+    report("🤖 Agents are being activated...")
+
+    def task_callback(output):
+        report(f"✅ {getattr(output, 'agent', None) or 'Agent'} completed its task")
+
+    if dag:
+        # Independent tasks run concurrently, their outputs are merged into one JSON document
+        graph = TaskGraph(tasks.get_task_graph(expenses), verbose=True, task_callback=task_callback)
+        result = json.dumps(tasks.merge_outputs(graph.run()))
+    else:
+        # Create and run the crew
+        crew = Crew(
+            agents=agents.get_all_agents(),
+            tasks=tasks.get_all_tasks(expenses),
+            verbose=True,
+            process=Process.sequential,
+            task_callback=task_callback,
+        )
+
+        # Execute the analysis
+        result = crew.kickoff()
+    logging.info("=== result ===  %s", result)
+    logging.info("CrewAI Analysis Completed")
+
+    # Memoized by content hash, so the results of the crew's tool calls are reused
+    return {
+        "result": str(result),
+        "category_totals": analytics_cache.category_totals(expenses),
+        "daily_averages": analytics_cache.category_means(expenses),
+    }
+
+
+@st.cache_resource
+def job_queue():
+    """One job queue per app process, shared by all sessions."""
+    return JobQueue(max_workers=int(os.getenv("CREW_MAX_CONCURRENT_RUNS", MAX_CONCURRENT_JOBS)))
+
+
+@st.cache_resource(show_spinner="Loading expenses...")
+def load_expenses(csv_file, mtime_ns):
+    """Loads the expenses once per file version; mtime_ns is only part of the cache key.
+    Reusing the same table across reruns also reuses its content hash, see tools/analytics_cache.py."""
+    from tools.tools import FinancialTools
+
+    return FinancialTools.load_from_csv(csv_file)
+
+
+def main():
+    load_dotenv()
+    csv_file = "./data/expenses.csv"
+    queue = job_queue()
+    job = None
     
     try:
-        # Load expense data from CSV
-        expenses = tools.load_from_csv(csv_file)
+        # Load expense data from CSV, cached across reruns until the file changes
+        expenses = load_expenses(csv_file, os.stat(csv_file).st_mtime_ns)
         logging.info("Successfully loaded expenses.csv file")
 
         st.title("AI-Powered Savings Planner")
         st.subheader("📊 Expenses Data")
-        df_expenses = pd.DataFrame(expenses)
+        df_expenses = expenses.to_frame()
         st.dataframe(df_expenses)
 
+        dag = st.checkbox("Run independent tasks concurrently", value=False)
         if st.button("Run AI Analysis"):  # Wait for user to trigger agent execution
-            st.info("🤖 Agents are being activated...")
-            
-             # Create and run the crew
-            crew = Crew(
-                agents=agents.get_all_agents(),
-                tasks=tasks.get_all_tasks(expenses),
-                verbose=True,
-                process=Process.sequential
-            )
-            
-            # Execute the analysis
-            result = crew.kickoff()
-            print(dir(result))
-            logging.info("=== result ===  %s", result)
-            logging.info("=== dir(result) ===  %s", dir(result))
-
-            # Extract financial goals
-                    
-            logging.info("CrewAI Analysis Completed")
+            # Run the crew in the background; the job id in the URL survives a page reload
+            st.query_params["job"] = queue.submit("savings", run_savings_crew, csv_file=csv_file, dag=dag)
+
+        job_id = st.query_params.get("job")
+        job = queue.get(job_id) if job_id else None
+
+        if job and job["status"] in ("queued", "running"):
+            st.info(f"🤖 Agents are working on run `{job['id']}` ({job['status']})...")
+            st.markdown("\n".join(f"- {line}" for line in job["progress"][-15:]))
+
+        if job and job["status"] == "failed":
+            st.error(f"Error: run `{job['id']}` failed: {job['error']}")
+
+        if job and job["status"] == "completed":
             st.success("✅ AI Analysis Completed!")
-                   
-            data = {
-                "expenses": []
-            }
-            data["expenses"].extend(expenses)
-            category_totals = tools.calculate_category_totals(data)
-            daily_averages = tools.calculate_daily_averages(data)
+            result = job["result"]
                 
             st.subheader("🤖 CrewAI Analysis Results")
             
-            logging.info("=== AI Savings Planner Results ===  %s", result)
-            st.json(result)
+            logging.info("=== AI Savings Planner Results ===  %s", result["result"])
+            try:
+                st.json(json.loads(result["result"]))
+            except ValueError:
+                st.markdown(result["result"])
             
             st.subheader("💰 Category Totals")
-            st.table(category_totals)
+            st.table(result["category_totals"])
             
             st.subheader("📅 Daily Averages")
-            st.table(daily_averages)
+            st.table(result["daily_averages"])
             
     except FileNotFoundError as e:
         st.error(f"Error: {e}")
@@ -76,5 +127,10 @@ def main():
     except Exception as e:
         st.error(f"An unexpected error occurred: {e}")
 
+    # Poll the running job; the page refreshes until it has finished
+    if job and job["status"] in ("queued", "running"):
+        time.sleep(2)
+        st.rerun()
+
 if __name__ == "__main__":
     main()
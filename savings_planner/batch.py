@@ -0,0 +1,189 @@
+from dotenv import load_dotenv
+import argparse
+import contextlib
+import csv
+import json
+import logging
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from agents.agents import Agents
+from tasks.tasks import Tasks
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+
+# Crews running at the same time; their model calls all go through one LLMScheduler
+MAX_CONCURRENT_ACCOUNTS = 8
+
+
+def find_accounts(source):
+    """
+    Lists the accounts of a batch.
+    Args:
+        source (str): A directory of expense CSV files, one account per file named after it, or a
+            manifest CSV file with account_id and expenses_file columns (paths relative to the manifest).
+    Returns:
+        list: (account id, expenses file) pairs.
+    """
+    if os.path.isdir(source):
+        return [(os.path.splitext(name)[0], os.path.join(source, name))
+                for name in sorted(os.listdir(source)) if name.lower().endswith(".csv")]
+
+    if not os.path.exists(source):
+        raise FileNotFoundError(f"Accounts directory or manifest not found: {source}")
+    folder = os.path.dirname(source)
+    with open(source, "r", newline="") as file:
+        reader = csv.DictReader(file)
+        for name in ("account_id", "expenses_file"):
+            if name not in (reader.fieldnames or []):
+                raise KeyError(f"Missing required manifest column: '{name}'")
+        return [(row["account_id"], os.path.join(folder, row["expenses_file"])) for row in reader]
+
+
+def load_account(expenses_file):
+    """Worker process body: loads and aggregates the expenses of one account."""
+    from tools.analytics_cache import content_hash
+    from tools.expense_engine import aggregate_expenses
+    from tools.expense_table import read_expenses_csv
+
+    expenses = read_expenses_csv(expenses_file)
+    # Hashed here so the parent process does not hash the table again
+    content_hash(expenses)
+    return expenses, aggregate_expenses(expenses)
+
+
+def plan_account(account, expenses_file, loaded, output_dir, dag=False):
+    """Runs the savings crew for one account and writes its result file; returns its summary row."""
+    from crewai import Crew, Process
+    from tools import analytics_cache
+    from tools.task_graph import TaskGraph
+
+    start = time.perf_counter()
+    file_name = re.sub(r"[^\w.-]", "_", account) + ".json"
+    row = {"account": account, "expenses_file": expenses_file, "result_file": os.path.join(output_dir, file_name)}
+    document = dict(row)
+    try:
+        expenses, aggregates = loaded.result()
+        analytics_cache.analytics_cache().put_aggregates(expenses, aggregates)
+        row["rows"] = len(expenses)
+
+        agents = Agents()
+        tasks = Tasks(agents)
+        if dag:
+            result = tasks.merge_outputs(TaskGraph(tasks.get_task_graph(expenses)).run())
+        else:
+            crew = Crew(agents=agents.get_all_agents(), tasks=tasks.get_all_tasks(expenses),
+                        process=Process.sequential)
+            result = str(crew.kickoff())
+            with contextlib.suppress(ValueError):
+                result = json.loads(result)
+
+        row["status"] = "completed"
+        document.update(result=result, category_totals=analytics_cache.category_totals(expenses),
+                        daily_averages=analytics_cache.category_means(expenses))
+    except Exception as e:
+        logging.error("Account %s failed: %s", account, e)
+        row.update(status="failed", error=str(e))
+
+    row["seconds"] = round(time.perf_counter() - start, 3)
+    document.update(row)
+    with open(row["result_file"], "w") as file:
+        json.dump(document, file, indent=2)
+    return row
+
+
+def run_batch(source, output_dir, workers=None, concurrency=MAX_CONCURRENT_ACCOUNTS, rpm=None, tpm=None,
+              dag=False, llm_factory=None):
+    """
+    Plans the savings of every account of a batch. Expense files are loaded and aggregated in a
+    process pool, ahead of the crews but never more than 2 x `concurrency` accounts in flight, while
+    up to `concurrency` crews run in threads whose model calls share one requests and tokens per minute budget.
+    Args:
+        source (str): Accounts directory or manifest, see find_accounts.
+        output_dir (str): Folder of the result files, one per account, and of summary.json.
+        workers (int): Number of loader processes, defaults to the number of CPUs.
+        concurrency (int): Number of accounts planned at the same time.
+        rpm (int): Model requests allowed per minute, defaults to DEFAULT_RPM.
+        tpm (int): Model tokens allowed per minute, defaults to DEFAULT_TPM.
+        dag (bool): Run each crew as a task graph, see tools/task_graph.py.
+        llm_factory (callable): Builds the underlying model from (model, temperature), defaults to OpenAI.
+    Returns:
+        dict: The batch summary, also written to summary.json.
+    """
+    from crewai import LLM
+    from crew_common.llm_registry import use_client_factory
+    from tools.llm_scheduler import DEFAULT_RPM, DEFAULT_TPM, LLMScheduler, ScheduledLLM
+
+    accounts = find_accounts(source)
+    os.makedirs(output_dir, exist_ok=True)
+    scheduler = LLMScheduler(rpm=rpm or DEFAULT_RPM, tpm=tpm or DEFAULT_TPM)
+    llm_factory = llm_factory or (lambda model, temperature: LLM(model=model, temperature=temperature))
+    use_client_factory(lambda model, temperature: ScheduledLLM(llm_factory(model, temperature), scheduler))
+
+    start = time.perf_counter()
+    # Bounds the accounts loaded ahead of the crews, so memory does not grow with the batch
+    slots = threading.BoundedSemaphore(2 * concurrency)
+    futures = []
+    try:
+        # Loaders are started on demand while crews run in threads holding logging and HTTP locks,
+        # so they must not be forked from this process
+        loader_context = multiprocessing.get_context("forkserver" if os.name == "posix" else "spawn")
+        with ProcessPoolExecutor(max_workers=workers, mp_context=loader_context) as loaders, ThreadPoolExecutor(
+                max_workers=concurrency, thread_name_prefix="account") as planners:
+            for account, expenses_file in accounts:
+                slots.acquire()
+                loaded = loaders.submit(load_account, expenses_file)
+                future = planners.submit(plan_account, account, expenses_file, loaded, output_dir, dag)
+                future.add_done_callback(lambda _: slots.release())
+                futures.append(future)
+            rows = [future.result() for future in futures]
+    finally:
+        use_client_factory(None)
+
+    wall_seconds = time.perf_counter() - start
+    completed = sum(1 for row in rows if row["status"] == "completed")
+    summary = {
+        "source": source,
+        "accounts": len(rows),
+        "completed": completed,
+        "failed": len(rows) - completed,
+        "wall_seconds": round(wall_seconds, 3),
+        "accounts_per_minute": round(len(rows) / wall_seconds * 60, 2) if wall_seconds else 0.0,
+        "llm": scheduler.stats(),
+        "results": rows,
+    }
+    with open(os.path.join(output_dir, "summary.json"), "w") as file:
+        json.dump(summary, file, indent=2)
+    return summary
+
+
+# Plans the savings of many accounts in one run, e.g. overnight.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Plan the savings of a batch of accounts.")
+    parser.add_argument("source", help="Directory of expense CSV files (one per account) or a manifest CSV file "
+                                       "with account_id and expenses_file columns.")
+    parser.add_argument("--output-dir", default="./results", help="Folder of the result files and summary.json.")
+    parser.add_argument("--workers", type=int, help="Loader processes, defaults to the number of CPUs.")
+    parser.add_argument("--concurrency", type=int, default=MAX_CONCURRENT_ACCOUNTS,
+                        help="Accounts planned at the same time.")
+    parser.add_argument("--rpm", type=int, default=os.getenv("OPENAI_RPM"), help="Model requests per minute.")
+    parser.add_argument("--tpm", type=int, default=os.getenv("OPENAI_TPM"), help="Model tokens per minute.")
+    parser.add_argument("--dag", action="store_true", help="Run each crew as a task graph, see main.py --dag.")
+    args = parser.parse_args()
+
+    load_dotenv()
+    try:
+        summary = run_batch(args.source, args.output_dir, args.workers, args.concurrency, args.rpm, args.tpm, args.dag)
+    except (FileNotFoundError, KeyError) as e:
+        print(f"Error: {e}")
+        sys.exit(1)
+
+    print(f"Planned {summary['accounts']} accounts ({summary['failed']} failed) in {summary['wall_seconds']:.1f}s: "
+          f"{summary['accounts_per_minute']} accounts per minute")
+    print("Model calls:", summary["llm"])
+    print("Results in", args.output_dir)
@@ -0,0 +1,179 @@
+import argparse
+import json
+import os
+import re
+import sys
+import time
+import numpy as np
+from crew_common.bench_harness import (BASELINES_FILE, BENCH_DIR, ROW_COUNTS, ToolTimer, fake_llm_environment,
+                                 find_regressions, load_baselines, peak_rss_mb, print_report, run_isolated,
+                                 save_baselines)
+
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+# Categories of the synthetic expenses with their merchants and a typical amount
+CATEGORIES = {
+    "Groceries": (["HEB", "Walmart", "Costco", "Trader Joes"], 60.0),
+    "Dining": (["Chipotle", "Olive Garden", "Local Diner"], 25.0),
+    "Coffee": (["Starbucks", "Dunkin"], 5.5),
+    "Ice Cream": (["Braums", "Dairy Queen"], 6.0),
+    "Transport": (["Car Gas", "Uber", "Parking"], 35.0),
+    "Car Wash": (["Quick Car Wash"], 10.0),
+    "Utilities": (["Electric Co", "Water Utility", "Internet"], 90.0),
+    "Entertainment": (["Netflix", "Cinema", "Concert Tickets"], 20.0),
+    "Education": (["Books", "Online Course"], 40.0),
+    "Health": (["Pharmacy", "Gym Membership"], 30.0),
+}
+
+# Reduction targets the fake savings advisor passes to project_annual_savings and compare_savings_scenarios
+REDUCTION_TARGETS = {"Dining": 20, "Coffee": 30, "Entertainment": 15}
+SCENARIOS = {"light": {"Dining": 10, "Coffee": 15}, "target": REDUCTION_TARGETS,
+             "aggressive": {"Dining": 40, "Coffee": 50, "Entertainment": 30, "Groceries": 10}}
+
+ANALYSIS = {
+    "category_analysis": {"Groceries": {"total_spent": 0.0, "percentage_of_total": 0.0,
+                                        "transaction_count": 0, "average_transaction": 0.0}},
+    "spending_patterns": {"recurring_expenses": [], "unusual_transactions": []},
+    "reduction_opportunities": [{"category": "Dining", "potential_savings": 0.0, "recommendation": "Cook at home."}],
+}
+SUGGESTIONS = {
+    "savings_targets": {"monthly": 0.0, "annual": 0.0, "confidence_level": "medium"},
+    "category_recommendations": [],
+    "quick_wins": [],
+    "long_term_strategies": [],
+}
+GOALS = {
+    "financial_goals": [],
+    "tracking_metrics": {"key_performance_indicators": [],
+                         "review_schedule": {"frequency": "monthly", "next_review_date": "", "review_points": []}},
+    "adjustment_triggers": [],
+}
+
+
+def fake_scripts():
+    """What each agent of the savings crew does when driven by the local fake model."""
+    from crew_common.fake_llm import action, final_answer
+
+    def expenses(prompt):
+        match = re.search(r"artifact://expenses/[0-9a-f]+", prompt)
+        return match.group(0) if match else ""
+
+    return {
+        "Expense Analyst": [
+            action("calculate_category_totals", lambda prompt: {"expenses": expenses(prompt)}),
+            action("calculate_daily_averages", lambda prompt: {"expenses": expenses(prompt)}),
+            action("detect_unusual_transactions", lambda prompt: {"expenses": expenses(prompt)}),
+            action("detect_recurring_expenses", lambda prompt: {"expenses": expenses(prompt)}),
+            final_answer(json.dumps(ANALYSIS)),
+        ],
+        "Savings Advisor": [
+            action("project_annual_savings",
+                   lambda prompt: {"reduction_targets": REDUCTION_TARGETS, "expenses": expenses(prompt)}),
+            action("compare_savings_scenarios", lambda prompt: {"scenarios": SCENARIOS, "expenses": expenses(prompt)}),
+            final_answer(json.dumps(SUGGESTIONS)),
+        ],
+        "Financial Goal Specialist": [
+            final_answer(json.dumps(GOALS)),
+        ],
+    }
+
+
+def synthetic_expenses(rows, seed=7, chunk_rows=100_000):
+    """Writes (once) an expenses CSV file with the given number of rows, in date order, and returns its path."""
+    path = os.path.join(ROOT, BENCH_DIR, "data", f"expenses_{rows}.csv")
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    names = list(CATEGORIES)
+    rng = np.random.default_rng(seed)
+    first_day = np.datetime64("2024-01-01")
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as file:
+        file.write("date,category,amount,description\n")
+        for start in range(0, rows, chunk_rows):
+            count = min(chunk_rows, rows - start)
+            # Spread the rows evenly over one year so the dates stay sorted across chunks
+            days = first_day + (np.arange(start, start + count) * 366 // max(rows, 1))
+            categories = rng.integers(0, len(names), count)
+            noise = rng.lognormal(0.0, 0.5, count)
+            picks = rng.integers(0, 1 << 16, count)
+            lines = []
+            for i in range(count):
+                category = names[categories[i]]
+                merchants, typical = CATEGORIES[category]
+                lines.append(f"{days[i]},{category},{typical * noise[i]:.2f},{merchants[picks[i] % len(merchants)]}\n")
+            file.writelines(lines)
+    os.replace(tmp_path, path)
+    return path
+
+
+def run_case(case, rows, output):
+    """Child process body: runs the savings main() flow once against the fake model and writes the measurements."""
+    fake_llm_environment()
+    csv_file = synthetic_expenses(rows)
+
+    import main
+    from crew_common.fake_llm import FakeLLM, FakeLLMStats
+    from crew_common.llm_registry import use_client_factory
+    from tools.tools import FinancialTools
+
+    stats = FakeLLMStats()
+    scripts = fake_scripts()
+    use_client_factory(lambda model, temperature: FakeLLM(scripts, stats, model=f"fake-{model}", temperature=temperature))
+
+    timer = ToolTimer()
+    for tool in (FinancialTools.load_from_csv, FinancialTools.calculate_category_totals,
+                 FinancialTools.calculate_daily_averages, FinancialTools.detect_unusual_transactions,
+                 FinancialTools.detect_recurring_expenses, FinancialTools.project_annual_savings,
+                 FinancialTools.compare_savings_scenarios):
+        timer.wrap_tool(tool)
+
+    start = time.perf_counter()
+    try:
+        main.main(csv_file, dag=case == "savings-dag")
+    except SystemExit as e:
+        # main() exits with status 1 on errors, after printing them to the log
+        if e.code:
+            raise
+    wall_seconds = time.perf_counter() - start
+
+    result = {"case": case, "rows": rows, "status": "completed", "wall_seconds": round(wall_seconds, 3),
+              "peak_rss_mb": peak_rss_mb(), "tools": timer.as_dict()}
+    result.update(stats.as_dict())
+    with open(output, "w") as file:
+        json.dump(result, file, indent=2)
+
+
+# Benchmarks the savings planner end to end with a local fake model instead of OpenAI.
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the savings planner with a deterministic local fake LLM.")
+    parser.add_argument("--rows", type=int, nargs="+", default=[n for n in ROW_COUNTS if n <= 100_000],
+                        help=f"Synthetic dataset sizes, the full ladder is {' '.join(map(str, ROW_COUNTS))}.")
+    parser.add_argument("--save-baseline", action="store_true", help=f"Store the results in {BASELINES_FILE}.")
+    parser.add_argument("--check", action="store_true", help="Exit with status 1 when a result regresses from its baseline or has none.")
+    parser.add_argument("--dag", action="store_true", help="Run the crew as a task graph (main.py --dag).")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_case(args.child, args.rows[0], args.output)
+        sys.exit(0)
+
+    results = []
+    for rows in args.rows:
+        synthetic_expenses(rows)
+        case = "savings-dag" if args.dag else "savings"
+        results.append(run_isolated(__file__, case, rows, os.path.join(ROOT, BENCH_DIR, "work")))
+    print_report(results)
+
+    if args.save_baseline:
+        save_baselines(results, os.path.join(ROOT, BASELINES_FILE))
+    if args.check:
+        regressions = find_regressions(results, load_baselines(os.path.join(ROOT, BASELINES_FILE)))
+        for regression in regressions:
+            print("REGRESSION", regression)
+        if regressions:
+            sys.exit(1)
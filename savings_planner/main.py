@@ -1,22 +1,27 @@
-from crewai import Crew, Process
 from dotenv import load_dotenv
+import argparse
+import json
 import os
 import sys
 from agents.agents import Agents
 from tasks.tasks import Tasks
-from tools.tools import FinancialTools
 import logging
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 
-def main():
+def main(csv_file="./data/expenses.csv", dag=False, ledger=False, rebuild=False):
+    # Heavy imports are deferred until the crew actually runs
+    from crewai import Crew, Process
+    from tools.tools import FinancialTools
+    from tools import analytics_cache
+    from crew_common.llm_cache import llm_cache
+    from tools.expense_ledger import ExpenseLedger
+    from tools.task_graph import TaskGraph
+
     # Load environment variables
     load_dotenv()
     
-    # Check for CSV file
-    csv_file = "./data/expenses.csv"
-    
     
     # Initialize components
     agents = Agents()
@@ -26,32 +31,48 @@ def main():
     try:
         # Load expense data from CSV
         #expenses = tools.load_from_csv(filepath=csv_file)
-        expenses = tools.load_from_csv('./data/expenses.csv')
-        logging.info("Successfully loaded expenses.csv file")
+        if ledger or rebuild:
+            # Only the rows appended since the last run are parsed, unless a rebuild is asked for
+            expenses = ExpenseLedger(csv_file)
+            rows = 0 if rebuild else len(expenses)
+            if rebuild:
+                expenses.rebuild()
+            else:
+                expenses.refresh()
+            logging.info("Ledger %s: %d rows, %d new since the last run", csv_file, len(expenses),
+                         max(len(expenses) - rows, 0))
+        else:
+            expenses = tools.load_from_csv(csv_file)
+        logging.info("Successfully loaded %s file", csv_file)
         
-        # Create and run the crew
-        crew = Crew(
-            agents=agents.get_all_agents(),
-            tasks=tasks.get_all_tasks(expenses),
-            verbose=True,
-            process=Process.sequential
-        )
-        
-        # Execute the analysis
-        result = crew.kickoff()
+        if dag:
+            # Run independent tasks concurrently and merge their outputs into one JSON document
+            graph = TaskGraph(tasks.get_task_graph(expenses), verbose=True)
+            result = json.dumps(tasks.merge_outputs(graph.run()), indent=2)
+            logging.info("Task timings: %s", graph.timings)
+        else:
+            # Create and run the crew
+            crew = Crew(
+                agents=agents.get_all_agents(),
+                tasks=tasks.get_all_tasks(expenses),
+                verbose=True,
+                process=Process.sequential
+            )
+
+            # Execute the analysis
+            result = crew.kickoff()
         
         # Print results
         logging.info("\n=== AI Savings Planner Results === %s", result)
+        if llm_cache() is not None:
+            logging.info("LLM response cache: %s", llm_cache().stats())
                      
 
         # Calculate and display metrics
-        data = {
-            "expenses":[]
-        }
-        data["expenses"].extend(expenses)
-        logging.info("\n==Calculating other mertrics %s", data)
-        category_totals = tools.calculate_category_totals(data)
-        daily_averages = tools.calculate_daily_averages(data)
+        logging.info("\n==Calculating other mertrics for %d expenses", len(expenses))
+        # Memoized by content hash, so the results of the crew's tool calls are reused
+        category_totals = analytics_cache.category_totals(expenses)
+        daily_averages = analytics_cache.category_means(expenses)
         
         print("\n=== Expense Metrics ===")
         print("Category Totals:", category_totals)
@@ -69,4 +90,13 @@ def main():
         sys.exit(1)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="AI savings planner")
+    parser.add_argument("csv_file", nargs="?", default="./data/expenses.csv", help="Expenses CSV file.")
+    parser.add_argument("--dag", action="store_true",
+                        help="Run independent tasks concurrently instead of one after the other.")
+    parser.add_argument("--ledger", action="store_true",
+                        help="Treat the CSV file as an append-only ledger and only parse the rows added since the last run.")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="Rebuild the ledger from the whole CSV file, e.g. after editing past rows. Implies --ledger.")
+    args = parser.parse_args()
+    main(args.csv_file, dag=args.dag, ledger=args.ledger, rebuild=args.rebuild)
\ No newline at end of file
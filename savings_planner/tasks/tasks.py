@@ -1,22 +1,58 @@
-from crewai import Task
-from typing import List, Dict
+from typing import List, Dict, TYPE_CHECKING
 import json
-from agents.agents import Agents
+import logging
+from tools.analytics_cache import category_totals
+from crew_common.artifact_store import artifacts
+from tools.expense_ledger import ExpenseLedger
+from tools.expense_summary import SUMMARY_TOKEN_BUDGET, summarize_expenses
+
+if TYPE_CHECKING:
+    from crewai import Task
+    from agents.agents import Agents
+
+# Number of per-category sub-analyses the expense analysis is split into by get_task_graph
+CATEGORY_ANALYSIS_TASKS = 3
+
+# Said instead of pointing at the row-level tools, which have no rows to look at in ledger mode
+LEDGER_NO_ROWS = "the individual transactions are not kept in ledger mode"
 
 class Tasks:
-    def __init__(self, agents: Agents):
+    def __init__(self, agents: "Agents", summary_token_budget: int = SUMMARY_TOKEN_BUDGET):
         self.agents = agents
+        self.summary_token_budget = summary_token_budget
+        self._references = {}
+
+    def expenses_reference(self, expenses: List[Dict]) -> str:
+        """Store the expenses once and describe them by handle and a budgeted summary, never by value."""
+        # The expenses are kept with their reference, so their id() cannot be reused by another object
+        key = id(expenses)
+        if key not in self._references:
+            handle = artifacts.put(expenses, kind="expenses")
+            summary = summarize_expenses(expenses, handle, self.summary_token_budget)
+            self._references[key] = (expenses, (
+                f"handle {summary['handle']} (pass this handle as `expenses` to the tools)\n"
+                f"            summary: {json.dumps(summary)}"
+            ))
+        return self._references[key][1]
 
-    def create_expense_analysis_task(self, expenses: List[Dict]) -> Task:
+    def create_expense_analysis_task(self, expenses: List[Dict]) -> "Task":
+        from crewai import Task
+
+        if isinstance(expenses, ExpenseLedger):
+            recurring = f"leave recurring_expenses empty, {LEDGER_NO_ROWS}"
+            unusual = f"leave unusual_transactions empty, {LEDGER_NO_ROWS}"
+        else:
+            recurring = "take recurring_expenses from detect_recurring_expenses"
+            unusual = "take unusual_transactions from detect_unusual_transactions"
         return Task(
             description=f"""Analyze the provided expenses data:
             1. Categorize all expenses into meaningful groups
-            2. Identify recurring spending patterns
-            3. Flag unnecessary or excessive spending
+            2. Identify recurring spending patterns ({recurring})
+            3. Flag unnecessary or excessive spending ({unusual})
             4. Calculate spending distribution by category
             5. Identify potential areas for immediate cost reduction
             
-            expenses: {json.dumps(expenses)}
+            expenses: {self.expenses_reference(expenses)}
             
             Provide a detailed analysis with specific numbers and percentages.
             """,
@@ -58,17 +94,20 @@ class Tasks:
             agent=self.agents.create_expense_analyst()
         )
 
-    def create_savings_suggestion_task(self, analysis_result: str, expenses: List[Dict]) -> Task:
+    def create_savings_suggestion_task(self, analysis_result: str, expenses: List[Dict],
+                                       context: List["Task"] = None) -> "Task":
+        from crewai import Task
+
         return Task(
             description=f"""Based on the expense analysis, provide comprehensive savings recommendations:
             1. Identify specific areas for potential savings
-            2. Suggest realistic monthly and annual savings targets
+            2. Suggest realistic monthly and annual savings targets (compare candidate targets in one compare_savings_scenarios call)
             3. Provide actionable steps to achieve savings goals
             4. Recommend specific strategies for each expense category
             5. Prioritize quick wins vs long-term savings strategies
             
             Analysis results: {analysis_result}
-            Expenses : {expenses}
+            Expenses : {self.expenses_reference(expenses)}
             
             Focus on practical, implementable suggestions with estimated savings potential.
             """,
@@ -110,10 +149,13 @@ class Tasks:
                     }
                 ]
             }""",
-            agent=self.agents.create_savings_advisor()
+            agent=self.agents.create_savings_advisor(),
+            context=context
         )
 
-    def create_goal_tracking_task(self, analysis_result: str, savings_suggestions: str) -> Task:
+    def create_goal_tracking_task(self, analysis_result: str, savings_suggestions: str) -> "Task":
+        from crewai import Task
+
         return Task(
             description=f"""Create a goal tracking framework based on the analysis and recommendations:
             1. Set SMART financial goals (Specific, Measurable, Achievable, Relevant, Time-bound)
@@ -172,10 +214,214 @@ class Tasks:
             agent=self.agents.create_goal_specialist()
         )
 
-    def get_all_tasks(self, expenses: List[Dict]) -> List[Task]:
+    def get_all_tasks(self, expenses: List[Dict]) -> List["Task"]:
         """Return all tasks in the correct sequence."""
         return [
             self.create_expense_analysis_task(expenses),
             self.create_savings_suggestion_task("{{task1.expected_output}}", expenses),
-            self.create_goal_tracking_task(expenses, "{{task2.expected_output}}")
-        ]
\ No newline at end of file
+            self.create_goal_tracking_task(self.expenses_reference(expenses), "{{task2.expected_output}}")
+        ]
+
+    def create_category_analysis_task(self, expenses: List[Dict], categories: List[str]) -> "Task":
+        from crewai import Task
+
+        return Task(
+            description=f"""Analyze the provided expenses data for these categories only: {", ".join(categories)}
+            1. Calculate the spending distribution of each of these categories
+            2. Flag unnecessary or excessive spending in them
+            3. Identify potential areas for immediate cost reduction in them
+            
+            expenses: {self.expenses_reference(expenses)}
+            
+            Provide a detailed analysis with specific numbers and percentages of the overall total.
+            """,
+            expected_output="""Provide a structured JSON response with the following format:
+            {
+                "category_analysis": {
+                    "category_name": {
+                        "total_spent": float,
+                        "percentage_of_total": float,
+                        "transaction_count": int,
+                        "average_transaction": float
+                    }
+                },
+                "reduction_opportunities": [
+                    {
+                        "category": string,
+                        "potential_savings": float,
+                        "recommendation": string
+                    }
+                ]
+            }""",
+            agent=self.agents.create_expense_analyst()
+        )
+
+    def create_spending_patterns_task(self, expenses: List[Dict]) -> "Task":
+        from crewai import Task
+
+        if isinstance(expenses, ExpenseLedger):
+            recurring = f"Leave recurring_expenses empty, {LEDGER_NO_ROWS}"
+            unusual = f"Leave unusual_transactions empty, {LEDGER_NO_ROWS}"
+        else:
+            recurring = ("Identify recurring expenses with their frequency and typical amount, "
+                         "as found by detect_recurring_expenses")
+            unusual = "Flag unusual transactions and why they stand out, as found by detect_unusual_transactions"
+        return Task(
+            description=f"""Identify the spending patterns of the provided expenses data:
+            1. {recurring}
+            2. {unusual}
+            
+            expenses: {self.expenses_reference(expenses)}
+            """,
+            expected_output="""Provide a structured JSON response with the following format:
+            {
+                "spending_patterns": {
+                    "recurring_expenses": [
+                        {
+                            "category": string,
+                            "frequency": string,
+                            "typical_amount": float
+                        }
+                    ],
+                    "unusual_transactions": [
+                        {
+                            "date": string,
+                            "category": string,
+                            "amount": float,
+                            "reason_flagged": string
+                        }
+                    ]
+                }
+            }""",
+            agent=self.agents.create_expense_analyst()
+        )
+
+    def create_kpi_tracking_task(self, analysis: List["Task"]) -> "Task":
+        from crewai import Task
+
+        return Task(
+            description="""Define how progress on the spending reductions will be tracked:
+            1. Define success metrics and KPIs, with their current value from the expense analysis
+            2. Establish a review schedule
+            
+            The expense analysis is provided as context.
+            """,
+            expected_output="""Provide a JSON response with the following format only:
+            {
+                "tracking_metrics": {
+                    "key_performance_indicators": [
+                        {
+                            "metric_name": string,
+                            "current_value": float,
+                            "target_value": float,
+                            "measurement_frequency": string,
+                            "data_source": string
+                        }
+                    ],
+                    "review_schedule": {
+                        "frequency": string,
+                        "next_review_date": string,
+                        "review_points": [string]
+                    }
+                }
+            }""",
+            agent=self.agents.create_goal_specialist(),
+            context=analysis
+        )
+
+    def create_goal_setting_task(self, context: List["Task"]) -> "Task":
+        from crewai import Task
+
+        return Task(
+            description="""Set financial goals based on the analysis and recommendations:
+            1. Set SMART financial goals (Specific, Measurable, Achievable, Relevant, Time-bound)
+            2. Create milestone checkpoints for each goal
+            3. Define when and how to adjust the goals
+            
+            The expense analysis and the savings suggestions are provided as context.
+            """,
+            expected_output="""Provide a JSON response with the following format only:
+            {
+                "financial_goals": [
+                    {
+                        "goal_id": string,
+                        "description": string,
+                        "target_amount": float,
+                        "deadline": string,
+                        "category": string,
+                        "milestones": [
+                            {
+                                "description": string,
+                                "target_date": string,
+                                "target_amount": float,
+                                "success_criteria": string
+                            }
+                        ]
+                    }
+                ],
+                "adjustment_triggers": [
+                    {
+                        "trigger_condition": string,
+                        "threshold": float,
+                        "recommended_actions": [string]
+                    }
+                ]
+            }""",
+            agent=self.agents.create_goal_specialist(),
+            context=context
+        )
+
+    def get_task_graph(self, expenses: List[Dict]) -> Dict[str, "Task"]:
+        """
+        Return the tasks as a dependency graph for tools/task_graph.py, dependencies first.
+        The expense analysis is split into per-category sub-analyses and the spending patterns,
+        which run concurrently; the savings suggestions and the KPIs only need the analysis,
+        the goals also need the suggestions.
+        """
+        ranked = sorted(category_totals(expenses).items(), key=lambda item: -item[1])
+        batches = [[category for category, _ in ranked[i::CATEGORY_ANALYSIS_TASKS]]
+                   for i in range(CATEGORY_ANALYSIS_TASKS)]
+
+        graph = {}
+        for i, categories in enumerate(batch for batch in batches if batch):
+            graph[f"category_analysis_{i + 1}"] = self.create_category_analysis_task(expenses, categories)
+        graph["spending_patterns"] = self.create_spending_patterns_task(expenses)
+        analysis = list(graph.values())
+
+        graph["savings_suggestions"] = self.create_savings_suggestion_task(
+            "provided as context by the expense analysis tasks", expenses, context=analysis)
+        graph["tracking_metrics"] = self.create_kpi_tracking_task(analysis)
+        graph["financial_goals"] = self.create_goal_setting_task(analysis + [graph["savings_suggestions"]])
+        return graph
+
+    def merge_outputs(self, outputs: Dict[str, str]) -> Dict:
+        """Assemble the raw outputs of the task graph into one JSON document."""
+        parts = {name: _parse_json(name, raw) for name, raw in outputs.items()}
+
+        analysis = {"category_analysis": {}, "spending_patterns": {}, "reduction_opportunities": []}
+        for name, part in parts.items():
+            if name.startswith("category_analysis_"):
+                analysis["category_analysis"].update(part.get("category_analysis") or {})
+                analysis["reduction_opportunities"].extend(part.get("reduction_opportunities") or [])
+        analysis["spending_patterns"] = parts["spending_patterns"].get("spending_patterns", parts["spending_patterns"])
+
+        goals = dict(parts["financial_goals"])
+        goals["tracking_metrics"] = parts["tracking_metrics"].get("tracking_metrics", parts["tracking_metrics"])
+        return {
+            "expense_analysis": analysis,
+            "savings_suggestions": parts["savings_suggestions"],
+            "goal_tracking": goals,
+        }
+
+
+def _parse_json(name: str, raw: str) -> Dict:
+    """Parse the JSON object of a task output, tolerating Markdown fences or text around it."""
+    start, end = raw.find("{"), raw.rfind("}")
+    try:
+        value = json.loads(raw[start:end + 1] if start >= 0 else raw)
+    except ValueError:
+        value = None
+    if not isinstance(value, dict):
+        logging.warning("Task %s did not return a JSON object, keeping its raw output", name)
+        return {"raw": raw}
+    return value
\ No newline at end of file
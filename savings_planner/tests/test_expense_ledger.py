@@ -0,0 +1,77 @@
+import numpy as np
+from tools.expense_ledger import ExpenseLedger
+
+HEADER = "date,category,amount,description\n"
+
+
+def rows(count, start=0):
+    categories = ["Groceries", "Dining", "Fuel", "Utilities"]
+    return "".join(f"2025-02-{1 + i % 28:02d},{categories[i % 4]},{(i % 50) + 0.25:.2f},Shop {i % 7}\n"
+                   for i in range(start, start + count))
+
+
+def full_aggregates(tmp_path, path):
+    return ExpenseLedger(str(path), state_path=str(tmp_path / "full.npz"), verify_blocks=None).refresh()
+
+
+def assert_same(aggregates, expected):
+    assert aggregates.rows == expected.rows
+    assert aggregates.categories == expected.categories
+    np.testing.assert_allclose(aggregates.totals, expected.totals)
+    np.testing.assert_array_equal(aggregates.counts, expected.counts)
+    np.testing.assert_array_equal(aggregates.category_days, expected.category_days)
+    np.testing.assert_array_equal(aggregates.days, expected.days)
+    np.testing.assert_allclose(aggregates.day_totals, expected.day_totals)
+
+
+def test_appends_match_a_full_rebuild(tmp_path):
+    path = tmp_path / "expenses.csv"
+    path.write_text(HEADER + rows(100))
+    state_path = str(tmp_path / "ledger.npz")
+    ExpenseLedger(str(path), state_path=state_path, block_bytes=256).refresh()
+
+    # A partial last line is left for the next refresh
+    with open(path, "a") as file:
+        file.write(rows(50, start=100) + "2025-02-03,Fuel,12")
+    ledger = ExpenseLedger(str(path), state_path=state_path, block_bytes=256)
+    assert ledger.rows == 100
+    assert ledger.refresh().rows == 150
+
+    with open(path, "a") as file:
+        file.write(".50,Shop 1\n" + rows(30, start=151))
+    ledger = ExpenseLedger(str(path), state_path=state_path, block_bytes=256)
+    assert_same(ledger.refresh(), full_aggregates(tmp_path, path))
+    assert ledger.rows == 181
+
+
+def test_mid_file_edit_triggers_a_rebuild(tmp_path):
+    path = tmp_path / "expenses.csv"
+    text = HEADER + rows(400)
+    path.write_text(text)
+    state_path = str(tmp_path / "ledger.npz")
+    ledger = ExpenseLedger(str(path), state_path=state_path, block_bytes=256, verify_blocks=None)
+    ledger.refresh()
+    assert len(ledger.block_sums) > 10
+
+    # Same length, far from the first and the last blocks
+    middle = text.index("\n", len(text) // 2) + 1
+    edited = text[:middle] + text[middle:].replace(",Fuel,", ",Rent,", 1)
+    assert len(edited) == len(text)
+    path.write_text(edited)
+
+    ledger = ExpenseLedger(str(path), state_path=state_path, block_bytes=256, verify_blocks=None)
+    aggregates = ledger.refresh()
+    assert "Rent" in aggregates.categories
+    assert_same(aggregates, full_aggregates(tmp_path, path))
+
+
+def test_content_hash_follows_the_consumed_bytes(tmp_path):
+    path = tmp_path / "expenses.csv"
+    path.write_text(HEADER + rows(20))
+    ledger = ExpenseLedger(str(path), state_path=str(tmp_path / "ledger.npz"), block_bytes=256)
+    first = ledger.content_hash()
+    assert ledger.content_hash() == first
+
+    with open(path, "a") as file:
+        file.write(rows(1, start=20))
+    assert ledger.content_hash() != first
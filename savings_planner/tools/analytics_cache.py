@@ -0,0 +1,231 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from tools.anomalies import MAX_FLAGGED, ROBUST_Z_THRESHOLD, detect_unusual_transactions
+from tools.expense_engine import aggregate_expenses
+from tools.expense_ledger import ExpenseLedger
+from tools.expense_table import ExpenseTable
+from tools.recurring import MAX_RECURRING, detect_recurring_expenses
+from tools.scenarios import rank_scenarios
+
+
+# In-process entries kept before the least recently used ones are dropped
+MAX_ENTRIES = 256
+
+# The on-disk tier is off unless ANALYTICS_CACHE=disk; ANALYTICS_CACHE=off disables caching entirely
+DEFAULT_PATH = ".cache/analytics.sqlite"
+MAX_DISK_ENTRIES = 10_000
+
+
+class AnalyticsCache():
+
+    """
+    Memoizes expense analytics (category totals, averages, savings projections) by the
+    content hash of the expense dataset, so the tool calls of the crew, the metrics computed
+    after it and every Streamlit rerun share one computation per dataset.
+    Results live in an in-process LRU and, optionally, in a SQLite file that survives restarts.
+    Attributes
+    ----------
+    max_entries : int
+        Size of the in-process LRU.
+    path : str
+        SQLite file of the on-disk tier, None when it is disabled.
+    Methods
+    -------
+    get_or_compute(expenses, kind, compute, **params):
+        Returns the cached result for the dataset, kind and params, computing and storing it when missing.
+    aggregates(expenses):
+        Returns the ExpenseAggregates of the dataset, kept in process only.
+    put_aggregates(expenses, aggregates):
+        Stores ExpenseAggregates computed elsewhere, e.g. in a worker process.
+    stats():
+        Returns the hit and miss counters.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+        if path:
+            folder = os.path.dirname(path)
+            if folder:
+                os.makedirs(folder, exist_ok=True)
+            with self._connect() as db:
+                db.execute("""CREATE TABLE IF NOT EXISTS analytics (
+                                  key TEXT PRIMARY KEY,
+                                  value TEXT NOT NULL,
+                                  last_used REAL NOT NULL)""")
+                db.execute("CREATE INDEX IF NOT EXISTS analytics_last_used ON analytics (last_used)")
+
+    def get_or_compute(self, expenses, kind, compute, **params):
+        key = f"{content_hash(expenses)}:{kind}:{json.dumps(params, sort_keys=True, default=str)}"
+        found, value = self._get(key, persistent=True)
+        if found:
+            return value
+        value = compute()
+        self._put(key, value, persistent=True)
+        return value
+
+    def aggregates(self, expenses):
+        key = f"{content_hash(expenses)}:aggregates"
+        found, value = self._get(key, persistent=False)
+        if found:
+            return value
+        # A ledger only parses the rows appended since its last refresh
+        value = expenses.refresh() if isinstance(expenses, ExpenseLedger) else aggregate_expenses(expenses)
+        self._put(key, value, persistent=False)
+        return value
+
+    def put_aggregates(self, expenses, aggregates):
+        self._put(f"{content_hash(expenses)}:aggregates", aggregates, persistent=False)
+
+    def stats(self):
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._entries), "disk": self.path}
+
+    def _get(self, key, persistent):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return True, self._entries[key]
+
+        if persistent and self.path:
+            with self._connect() as db:
+                row = db.execute("SELECT value FROM analytics WHERE key = ?", (key,)).fetchone()
+                if row is not None:
+                    db.execute("UPDATE analytics SET last_used = ? WHERE key = ?", (time.time(), key))
+            if row is not None:
+                value = json.loads(row[0])
+                self._remember(key, value)
+                with self._lock:
+                    self.hits += 1
+                return True, value
+
+        with self._lock:
+            self.misses += 1
+        return False, None
+
+    def _put(self, key, value, persistent):
+        self._remember(key, value)
+        if persistent and self.path:
+            with self._connect() as db:
+                db.execute("INSERT OR REPLACE INTO analytics (key, value, last_used) VALUES (?, ?, ?)",
+                           (key, json.dumps(value), time.time()))
+                db.execute("""DELETE FROM analytics WHERE key IN (
+                                  SELECT key FROM analytics ORDER BY last_used DESC LIMIT -1 OFFSET ?)""",
+                           (MAX_DISK_ENTRIES,))
+
+    def _remember(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _connect(self):
+        return _Connection(self.path)
+
+
+class _Connection():
+    """Opens a SQLite connection for one with-block and commits it on success."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def __enter__(self):
+        self.db = sqlite3.connect(self.path, timeout=30)
+        return self.db
+
+    def __exit__(self, exc_type, *exc):
+        if exc_type is None:
+            self.db.commit()
+        self.db.close()
+
+
+def content_hash(expenses):
+    """
+    SHA-256 of the expense data. For an ExpenseTable it hashes the column buffers and
+    dictionaries once and keeps the result on the table; record lists are hashed as JSON.
+    An ExpenseLedger is identified by its consumed offset and block checksums, without reading the rows.
+    """
+    if isinstance(expenses, ExpenseLedger):
+        return expenses.content_hash()
+    if isinstance(expenses, ExpenseTable):
+        if expenses.content_hash is None:
+            digest = hashlib.sha256()
+            for column in (expenses.days, expenses.category_codes, expenses.amounts, expenses.description_codes):
+                digest.update(column.tobytes())
+            digest.update(json.dumps([expenses.categories, expenses.descriptions]).encode("utf-8"))
+            expenses.content_hash = digest.hexdigest()
+        return expenses.content_hash
+
+    digest = hashlib.sha256()
+    for expense in expenses:
+        digest.update(json.dumps(expense, sort_keys=True, default=str).encode("utf-8"))
+    return digest.hexdigest()
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def analytics_cache():
+    """
+    Returns the process-wide analytics cache, or a cache that keeps nothing when ANALYTICS_CACHE=off.
+    ANALYTICS_CACHE=disk adds the on-disk tier at ANALYTICS_CACHE_PATH (default .cache/analytics.sqlite).
+    """
+    global _default_cache
+    mode = os.getenv("ANALYTICS_CACHE", "memory").lower()
+    if mode in ("off", "0", "false", "no"):
+        return AnalyticsCache(max_entries=0)
+    with _default_lock:
+        if _default_cache is None:
+            path = os.getenv("ANALYTICS_CACHE_PATH", DEFAULT_PATH) if mode == "disk" else None
+            _default_cache = AnalyticsCache(path=path)
+    return _default_cache
+
+
+def category_totals(expenses):
+    cache = analytics_cache()
+    return cache.get_or_compute(expenses, "category_totals", lambda: cache.aggregates(expenses).category_totals())
+
+
+def category_means(expenses):
+    cache = analytics_cache()
+    return cache.get_or_compute(expenses, "category_means", lambda: cache.aggregates(expenses).category_means())
+
+
+def annual_savings(expenses, reduction_targets):
+    cache = analytics_cache()
+    return cache.get_or_compute(expenses, "annual_savings",
+                                lambda: cache.aggregates(expenses).project_annual_savings(reduction_targets),
+                                reduction_targets=reduction_targets)
+
+
+def savings_scenarios(expenses, scenarios):
+    cache = analytics_cache()
+    return cache.get_or_compute(expenses, "savings_scenarios",
+                                lambda: rank_scenarios(cache.aggregates(expenses), scenarios),
+                                scenarios=scenarios)
+
+
+def unusual_transactions(expenses, threshold=ROBUST_Z_THRESHOLD, limit=MAX_FLAGGED):
+    cache = analytics_cache()
+    return cache.get_or_compute(expenses, "unusual_transactions",
+                                lambda: detect_unusual_transactions(expenses, threshold, limit),
+                                threshold=threshold, limit=limit)
+
+
+def recurring_expenses(expenses, limit=MAX_RECURRING):
+    cache = analytics_cache()
+    return cache.get_or_compute(expenses, "recurring_expenses", lambda: detect_recurring_expenses(expenses, limit),
+                                limit=limit)
@@ -0,0 +1,77 @@
+import numpy as np
+from tools.expense_engine import encode_expenses
+
+
+# Robust z-score above which a transaction is flagged (Iglewicz and Hoaglin's usual cut-off)
+ROBUST_Z_THRESHOLD = 3.5
+
+# Categories with fewer expenses have no reliable typical amount and are not checked
+MIN_CATEGORY_EXPENSES = 5
+
+# Flagged transactions returned, most unusual first; the rest are only counted
+MAX_FLAGGED = 20
+
+# Scales the MAD, and the mean absolute deviation when the MAD is 0, to a standard deviation
+MAD_SCALE = 1.4826
+MEAN_AD_SCALE = 1.2533
+
+
+def detect_unusual_transactions(expenses, threshold=ROBUST_Z_THRESHOLD, limit=MAX_FLAGGED):
+    """
+    Flags transactions whose amount is far from the typical amount of their category, using
+    robust statistics so the outliers themselves do not hide: the distance to the category
+    median in units of the scaled median absolute deviation (MAD). The rows are grouped by
+    category with one sort of the category codes, and each group needs two partitions, so
+    millions of rows take a fraction of a second; only the flagged rows are decoded.
+    Args:
+        expenses (List[Dict]): Expense records or an ExpenseTable.
+        threshold (float): Robust z-score above which a transaction is flagged.
+        limit (int): Maximum number of flagged transactions returned.
+    Returns:
+        dict: flagged_total and unusual_transactions, the most unusual first, each with date,
+            category, amount, description, robust_z and reason_flagged.
+    """
+    codes, categories, _, amounts = encode_expenses(expenses)
+    medians, spreads = category_spreads(codes, len(categories), amounts)
+
+    scores = np.zeros(len(amounts))
+    checked = spreads[codes] > 0
+    scores[checked] = (amounts[checked] - medians[codes[checked]]) / spreads[codes[checked]]
+    flagged = np.flatnonzero(np.abs(scores) > threshold)
+    flagged = flagged[np.argsort(-np.abs(scores[flagged]), kind="stable")]
+
+    unusual = []
+    for row in flagged[:limit].tolist():
+        expense = expenses[row]
+        median = float(medians[codes[row]])
+        direction = "above" if scores[row] > 0 else "below"
+        unusual.append({
+            "date": expense["date"],
+            "category": expense["category"],
+            "amount": expense["amount"],
+            "description": expense.get("description"),
+            "robust_z": round(float(scores[row]), 1),
+            "reason_flagged": (f"{abs(scores[row]):.1f} robust deviations {direction} the median "
+                               f"{expense['category']} amount of {median:.2f}"),
+        })
+    return {"flagged_total": len(flagged), "unusual_transactions": unusual}
+
+
+def category_spreads(codes, size, amounts):
+    """
+    Median amount and robust standard deviation (scaled MAD, or scaled mean absolute deviation
+    when more than half the amounts equal the median) per category code. Both are 0 for the
+    categories with fewer than MIN_CATEGORY_EXPENSES expenses.
+    """
+    order = np.argsort(codes, kind="stable")
+    bounds = np.concatenate(([0], np.cumsum(np.bincount(codes, minlength=size))))
+    medians = np.zeros(size)
+    spreads = np.zeros(size)
+    for code in range(size):
+        group = amounts[order[bounds[code]:bounds[code + 1]]]
+        if len(group) < MIN_CATEGORY_EXPENSES:
+            continue
+        medians[code] = np.median(group)
+        deviations = np.abs(group - medians[code])
+        spreads[code] = MAD_SCALE * np.median(deviations) or MEAN_AD_SCALE * deviations.mean()
+    return medians, spreads
@@ -0,0 +1,145 @@
+import numpy as np
+from tools.expense_table import ExpenseTable
+
+
+class ExpenseAggregates():
+
+    """
+    Per-category and per-day aggregates of a set of expenses, computed in one vectorized
+    group-by over dictionary-encoded category codes (np.bincount), so tens of millions of
+    rows take a few NumPy passes instead of several Python loops over dicts.
+    Attributes
+    ----------
+    categories : list
+        Category names in order of first appearance; index i is category code i.
+    totals : np.ndarray
+        Sum of the amounts per category code.
+    counts : np.ndarray
+        Number of expenses per category code.
+    category_days : np.ndarray
+        Number of distinct days with an expense per category code.
+    days : np.ndarray
+        Sorted distinct days (datetime64[D]) of the expenses.
+    day_totals : np.ndarray
+        Sum of the amounts per entry of days.
+    rows : int
+        Number of expenses.
+    Methods
+    -------
+    category_totals():
+        Returns {category: total}.
+    category_means():
+        Returns {category: average amount per expense}.
+    project_annual_savings(reduction_targets):
+        Projects the annual savings of percentage reduction targets per category.
+    project_scenarios(targets):
+        Projects the annual savings of a matrix of reduction-target vectors at once.
+    """
+
+    def __init__(self, categories, totals, counts, category_days, days, day_totals, rows):
+        self.categories = categories
+        self.totals = totals
+        self.counts = counts
+        self.category_days = category_days
+        self.days = days
+        self.day_totals = day_totals
+        self.rows = rows
+        self._codes = {category: code for code, category in enumerate(categories)}
+
+    @classmethod
+    def from_columns(cls, codes, categories, days, amounts):
+        """
+        Args:
+            codes (np.ndarray): Category code per expense, indexing categories.
+            categories (list): Category names.
+            days (np.ndarray): Day per expense as datetime64[D].
+            amounts (np.ndarray): Amount per expense.
+        """
+        size = len(categories)
+        totals = np.bincount(codes, weights=amounts, minlength=size)
+        counts = np.bincount(codes, minlength=size)
+
+        distinct_days, day_index = np.unique(days, return_inverse=True)
+        day_totals = np.bincount(day_index, weights=amounts, minlength=len(distinct_days))
+        # Distinct (category, day) pairs give the number of days each category was spent on
+        pairs = np.unique(codes.astype(np.int64) * max(len(distinct_days), 1) + day_index)
+        category_days = np.bincount(pairs // max(len(distinct_days), 1), minlength=size)
+        return cls(categories, totals, counts, category_days, distinct_days, day_totals, len(codes))
+
+    @property
+    def distinct_days(self):
+        return len(self.days)
+
+    @property
+    def total(self):
+        return float(self.totals.sum())
+
+    def category_totals(self):
+        return dict(zip(self.categories, self.totals.tolist()))
+
+    def category_means(self):
+        means = np.divide(self.totals, self.counts, out=np.zeros_like(self.totals), where=self.counts > 0)
+        return dict(zip(self.categories, means.tolist()))
+
+    def target_vector(self, reduction_targets):
+        """Turns {category: percent} into a vector aligned with the category codes; unknown categories are ignored."""
+        vector = np.zeros(len(self.categories))
+        for category, target in reduction_targets.items():
+            code = self._codes.get(category)
+            if code is not None:
+                vector[code] = float(target)
+        return vector
+
+    def target_matrix(self, scenarios):
+        """Stacks the target vectors of several {category: percent} dicts into a scenarios x categories matrix."""
+        matrix = np.zeros((len(scenarios), len(self.categories)))
+        for row, reduction_targets in enumerate(scenarios):
+            matrix[row] = self.target_vector(reduction_targets)
+        return matrix
+
+    def project_annual_savings(self, reduction_targets):
+        """Savings of the period extrapolated from the distinct days in the data to 365 days."""
+        return round(float(self.project_scenarios(self.target_vector(reduction_targets)[None, :])[0]), 2)
+
+    def project_scenarios(self, targets):
+        """
+        Args:
+            targets (np.ndarray): Percent reduction per category code, one row per scenario.
+        Returns:
+            np.ndarray: Projected annual savings per scenario, unrounded.
+        """
+        targets = np.atleast_2d(np.asarray(targets, dtype=np.float64))
+        if not self.distinct_days:
+            return np.zeros(len(targets))
+        return targets @ self.totals / 100 / self.distinct_days * 365
+
+
+def aggregate_expenses(expenses):
+    """
+    Aggregates expense records (dicts with date, category and amount) in one pass.
+    Returns:
+        ExpenseAggregates: Totals, counts, means, distinct days and per-day sums.
+    """
+    return ExpenseAggregates.from_columns(*encode_expenses(expenses))
+
+
+def encode_expenses(expenses):
+    """
+    Converts expense records to columns: category codes with their dictionary, days and amounts.
+    An ExpenseTable already holds them and is returned as is.
+    Returns:
+        tuple: (codes, categories, days, amounts)
+    """
+    if isinstance(expenses, ExpenseTable):
+        return expenses.category_codes, expenses.categories, expenses.days, expenses.amounts
+
+    rows = len(expenses)
+    dictionary = {}
+    codes = np.fromiter((dictionary.setdefault(e["category"], len(dictionary)) for e in expenses),
+                        dtype=np.int32, count=rows)
+    amounts = np.fromiter((e["amount"] for e in expenses), dtype=np.float64, count=rows)
+    # Dates repeat a lot, so only the distinct date strings are parsed
+    dates = {}
+    date_codes = np.fromiter((dates.setdefault(e["date"], len(dates)) for e in expenses), dtype=np.int32, count=rows)
+    days = np.array(list(dates), dtype="datetime64[D]")[date_codes]
+    return codes, list(dictionary), days, amounts
@@ -0,0 +1,280 @@
+import hashlib
+import io
+import json
+import logging
+import os
+import random
+import threading
+import zlib
+import numpy as np
+from tools.expense_engine import ExpenseAggregates
+from tools.expense_table import read_expenses_csv
+
+
+# Folder of the persisted ledger states, one file per expenses CSV file
+LEDGER_DIR = ".cache/ledger"
+
+# Size of the blocks of the consumed part of the file whose checksums are kept in the state
+BLOCK_BYTES = 1024 * 1024
+
+# Blocks verified on every refresh besides the first and the last ones; None verifies every block
+VERIFY_BLOCKS = 8
+
+# Bumped whenever the layout of the persisted state changes, older states are rebuilt
+STATE_VERSION = 2
+
+
+class ExpenseLedger():
+
+    """
+    Treats an expenses CSV file as an append-only ledger. The byte offset and the number of
+    rows already consumed are persisted with the aggregates of those rows (category totals
+    and counts, distinct (category, day) pairs, per-day sums and per-description totals), so
+    a refresh only parses the rows appended since and merges them into the aggregates: the
+    cost follows the new rows, plus the distinct days and categories, not the file size.
+    The CRC-32 of every BLOCK_BYTES block of the consumed bytes is kept in the state. A refresh
+    verifies the first and last blocks plus VERIFY_BLOCKS others picked at random, and rebuilds
+    from scratch when the file got shorter or a verified block changed, i.e. when rows were
+    truncated or edited. An edit in the middle of a large file is therefore caught with a
+    probability that grows with every refresh, not on the first one; pass verify_blocks=None
+    to verify every block, or call rebuild() after editing the file.
+    A partial last line, still being written, is left for the next refresh.
+    Attributes
+    ----------
+    path : str
+        The expenses CSV file.
+    state_path : str
+        File of the persisted state.
+    offset : int
+        Bytes of the file consumed so far.
+    rows : int
+        Valid rows consumed so far.
+    skipped : int
+        Rows consumed but skipped because of an invalid amount or date.
+    block_sums : np.ndarray
+        CRC-32 of each complete block of the consumed bytes.
+    verify_blocks : int | None
+        Blocks verified on a refresh besides the first and the last ones, None for all.
+    Methods
+    -------
+    refresh():
+        Consumes the appended rows and returns the ExpenseAggregates of the whole file.
+    rebuild():
+        Forgets the state and consumes the whole file again.
+    content_hash():
+        Identifies the consumed content from its block checksums, for tools/analytics_cache.py.
+    merchants():
+        Returns {description: (total, count)}.
+    """
+
+    def __init__(self, path, state_path=None, block_bytes=BLOCK_BYTES, verify_blocks=VERIFY_BLOCKS):
+        self.path = path
+        self.block_bytes = block_bytes
+        self.verify_blocks = verify_blocks
+        if state_path is None:
+            name = hashlib.sha1(os.path.abspath(path).encode("utf-8")).hexdigest()[:16]
+            state_path = os.path.join(LEDGER_DIR, f"{name}.npz")
+        self.state_path = state_path
+        self._lock = threading.Lock()
+        self._aggregates = None
+        self._reset()
+        self._load_state()
+
+    def __len__(self):
+        return self.rows
+
+    def refresh(self):
+        with self._lock:
+            try:
+                size = os.path.getsize(self.path)
+            except FileNotFoundError:
+                raise FileNotFoundError(f"CSV file not found: {self.path}") from None
+
+            with open(self.path, "rb") as file:
+                if self.offset and not self._unchanged(file, size):
+                    logging.info("%s was truncated or edited, rebuilding its ledger", self.path)
+                    self._reset()
+                if not self.offset:
+                    file.seek(0)
+                    self.header = file.readline()
+                    if not self.header.endswith(b"\n"):
+                        # No complete header line yet
+                        self.header = b""
+                        return self._current()
+                    self.offset = len(self.header)
+
+                file.seek(self.offset)
+                tail = file.read(size - self.offset)
+            # Only complete lines are consumed
+            tail = tail[:tail.rfind(b"\n") + 1]
+            if tail:
+                self._consume(tail)
+                self.offset += len(tail)
+                self._save_state()
+            return self._current()
+
+    def rebuild(self):
+        with self._lock:
+            self._reset()
+        return self.refresh()
+
+    def content_hash(self):
+        self.refresh()
+        key = f"{os.path.abspath(self.path)}:{self.offset}:{self.rows}:{self.last_block_sum}"
+        digest = hashlib.sha256(key.encode("utf-8"))
+        digest.update(self.block_sums.tobytes())
+        return digest.hexdigest()
+
+    def merchants(self):
+        with self._lock:
+            return {name: (total, count) for name, total, count
+                    in zip(self.descriptions, self.description_totals.tolist(), self.description_counts.tolist())}
+
+    def _consume(self, tail):
+        """Parses the new complete lines with the header in front and merges them into the aggregates."""
+        table = read_expenses_csv(io.BytesIO(self.header + tail), label=f"the rows appended to {self.path}")
+        self.skipped += table.skipped
+        self.rows += len(table)
+        codes = _extend(self.categories, self._category_index, table.categories, table.category_codes)
+        description_codes = _extend(self.descriptions, self._description_index, table.descriptions,
+                                    table.description_codes)
+
+        size = len(self.categories)
+        self.totals = _grow(self.totals, size) + np.bincount(codes, weights=table.amounts, minlength=size)
+        self.counts = _grow(self.counts, size) + np.bincount(codes, minlength=size)
+        size = len(self.descriptions)
+        self.description_totals = (_grow(self.description_totals, size)
+                                   + np.bincount(description_codes, weights=table.amounts, minlength=size))
+        self.description_counts = _grow(self.description_counts, size) + np.bincount(description_codes, minlength=size)
+
+        # (category, day) pairs packed into one int64: category code in the high 32 bits
+        day_numbers = table.days.astype(np.int64)
+        self.pairs = np.union1d(self.pairs, (codes.astype(np.int64) << 32) | (day_numbers & 0xFFFFFFFF))
+
+        new_days, day_index = np.unique(table.days, return_inverse=True)
+        days = np.union1d(self.days, new_days)
+        day_totals = np.zeros(len(days))
+        day_totals[np.searchsorted(days, self.days)] += self.day_totals
+        day_totals[np.searchsorted(days, new_days)] += np.bincount(day_index, weights=table.amounts,
+                                                                   minlength=len(new_days))
+        self.days, self.day_totals = days, day_totals
+        self._aggregates = None
+
+    def _current(self):
+        if self._aggregates is None:
+            category_days = np.bincount(self.pairs >> 32, minlength=len(self.categories))
+            # The arrays are replaced, never modified, on the next consume; the category list grows in place
+            self._aggregates = ExpenseAggregates(list(self.categories), self.totals, self.counts, category_days,
+                                                 self.days, self.day_totals, self.rows)
+        return self._aggregates
+
+    def _unchanged(self, file, size):
+        """Edit detection: the file did not shrink and the verified blocks of the consumed bytes are the same."""
+        if size < self.offset:
+            return False
+        blocks = len(self.block_sums)
+        if self.verify_blocks is None or blocks <= self.verify_blocks + 2:
+            indexes = range(blocks)
+        else:
+            indexes = sorted({0, blocks - 1, *random.sample(range(1, blocks - 1), self.verify_blocks)})
+        for index in indexes:
+            file.seek(index * self.block_bytes)
+            if zlib.crc32(file.read(self.block_bytes)) != self.block_sums[index]:
+                return False
+        # The partial block after the complete ones is always verified
+        file.seek(blocks * self.block_bytes)
+        return zlib.crc32(file.read(self.offset - blocks * self.block_bytes)) == self.last_block_sum
+
+    def _update_block_sums(self):
+        """Checksums the blocks completed since the last save and the partial block up to offset."""
+        blocks = len(self.block_sums)
+        sums = []
+        with open(self.path, "rb") as file:
+            file.seek(blocks * self.block_bytes)
+            while (blocks + len(sums) + 1) * self.block_bytes <= self.offset:
+                sums.append(zlib.crc32(file.read(self.block_bytes)))
+            self.last_block_sum = zlib.crc32(file.read(self.offset - (blocks + len(sums)) * self.block_bytes))
+        if sums:
+            self.block_sums = np.concatenate([self.block_sums, np.array(sums, dtype=np.uint32)])
+
+    def _reset(self):
+        self.offset = 0
+        self.rows = 0
+        self.skipped = 0
+        self.header = b""
+        self.block_sums = np.zeros(0, dtype=np.uint32)
+        self.last_block_sum = None
+        self.categories = []
+        self.totals = np.zeros(0)
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.pairs = np.zeros(0, dtype=np.int64)
+        self.days = np.zeros(0, dtype="datetime64[D]")
+        self.day_totals = np.zeros(0)
+        self.descriptions = []
+        self.description_totals = np.zeros(0)
+        self.description_counts = np.zeros(0, dtype=np.int64)
+        self._category_index = {}
+        self._description_index = {}
+        self._aggregates = None
+
+    def _load_state(self):
+        try:
+            with np.load(self.state_path, allow_pickle=False) as state:
+                meta = json.loads(str(state["meta"]))
+                if (meta.get("version") != STATE_VERSION or meta.get("path") != os.path.abspath(self.path)
+                        or meta.get("block_bytes") != self.block_bytes):
+                    return
+                arrays = {name: state[name] for name in state.files if name != "meta"}
+        except (FileNotFoundError, OSError, ValueError, KeyError):
+            return
+
+        self.offset, self.rows, self.skipped = meta["offset"], meta["rows"], meta["skipped"]
+        self.header = meta["header"].encode("utf-8")
+        self.last_block_sum = meta["last_block_sum"]
+        self.categories, self.descriptions = meta["categories"], meta["descriptions"]
+        self._category_index = {name: code for code, name in enumerate(self.categories)}
+        self._description_index = {name: code for code, name in enumerate(self.descriptions)}
+        for name, values in arrays.items():
+            setattr(self, name, values)
+
+    def _save_state(self):
+        self._update_block_sums()
+        meta = {
+            "version": STATE_VERSION,
+            "path": os.path.abspath(self.path),
+            "offset": self.offset,
+            "rows": self.rows,
+            "skipped": self.skipped,
+            "header": self.header.decode("utf-8"),
+            "block_bytes": self.block_bytes,
+            "last_block_sum": self.last_block_sum,
+            "categories": self.categories,
+            "descriptions": self.descriptions,
+        }
+        folder = os.path.dirname(self.state_path)
+        if folder:
+            os.makedirs(folder, exist_ok=True)
+        # Write to a temporary file first so a crash never leaves a partial state
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "wb") as file:
+            np.savez(file, meta=np.array(json.dumps(meta)), totals=self.totals, counts=self.counts, pairs=self.pairs,
+                     days=self.days, day_totals=self.day_totals, description_totals=self.description_totals,
+                     description_counts=self.description_counts, block_sums=self.block_sums)
+        os.replace(tmp_path, self.state_path)
+
+
+
+def _extend(names, index, new_names, codes):
+    """Appends the unseen names to a ledger dictionary and its index; returns codes of new_names as ledger codes."""
+    remap = np.empty(len(new_names), dtype=np.int64)
+    for code, name in enumerate(new_names):
+        if name not in index:
+            index[name] = len(names)
+            names.append(name)
+        remap[code] = index[name]
+    return remap[codes]
+
+
+def _grow(values, size):
+    """Pads an aggregate array with zeros for newly seen categories or descriptions."""
+    return np.concatenate([values, np.zeros(size - len(values), dtype=values.dtype)])
@@ -0,0 +1,171 @@
+import json
+import numpy as np
+from collections import defaultdict
+from datetime import date
+from tools.analytics_cache import analytics_cache, unusual_transactions
+from tools.expense_engine import encode_expenses
+from tools.expense_ledger import ExpenseLedger
+from tools.expense_table import ExpenseTable
+from crew_common.tokens import count_tokens
+
+
+# Token budget of the expense summary embedded in each task prompt
+SUMMARY_TOKEN_BUDGET = 1500
+
+# Smallest budget the summary is guaranteed to fit: the overall totals without any breakdown
+MIN_TOKEN_BUDGET = 150
+
+# Progressively smaller summaries, tried in order until one fits the budget:
+# (categories kept, period granularity or None, top merchants, outlier candidates)
+SUMMARY_LEVELS = [
+    (25, "auto", 15, 20),
+    (15, "auto", 10, 10),
+    (15, "month", 10, 5),
+    (10, "quarter", 5, 5),
+    (8, "year", 5, 0),
+    (5, "year", 3, 0),
+    (5, None, 0, 0),
+    (0, None, 0, 0),
+]
+MAX_OUTLIER_CANDIDATES = max(level[3] for level in SUMMARY_LEVELS)
+
+
+def summarize_expenses(expenses, handle=None, token_budget=SUMMARY_TOKEN_BUDGET):
+    """
+    Summarizes expense records locally so the agents get the aggregates instead of the rows:
+    per-category totals, spending per period, the top merchants by description and the
+    outlier candidates. The summary is shrunk level by level until its JSON fits token_budget,
+    so its size depends on the budget, not on the number of transactions.
+    Args:
+        expenses (List[Dict]): Expense records with date, category, amount and description.
+        handle (str): Artifact handle the tools resolve to the full data.
+        token_budget (int): Maximum number of tokens of the JSON summary, at least MIN_TOKEN_BUDGET.
+    Returns:
+        dict: The summary.
+    """
+    if token_budget < MIN_TOKEN_BUDGET:
+        raise ValueError(f"The summary token budget must be at least {MIN_TOKEN_BUDGET}, got {token_budget}.")
+
+    aggregates = _aggregate(expenses)
+    for categories, granularity, merchants, outliers in SUMMARY_LEVELS:
+        summary = _build(aggregates, handle, categories, granularity, merchants, outliers)
+        if count_tokens(json.dumps(summary)) <= token_budget:
+            return summary
+    return summary
+
+
+def _aggregate(expenses):
+    """Group-by of the categories, days and merchants in one vectorized pass, see tools/expense_engine.py."""
+    engine = analytics_cache().aggregates(expenses)
+    if isinstance(expenses, ExpenseLedger):
+        # The ledger keeps its aggregates but not the rows, so there are no outlier candidates
+        return {
+            "totals": engine.category_totals(),
+            "counts": dict(zip(engine.categories, engine.counts.tolist())),
+            "day_totals": dict(zip(np.datetime_as_string(engine.days).tolist(), engine.day_totals.tolist())),
+            "merchants": expenses.merchants(),
+            "outliers": [],
+            "outliers_total": 0,
+            "rows": engine.rows,
+        }
+
+    _, categories, _, amounts = encode_expenses(expenses)
+
+    if isinstance(expenses, ExpenseTable):
+        merchant_codes, merchant_names = expenses.description_codes, expenses.descriptions
+    else:
+        merchant_index = {}
+        merchant_codes = np.fromiter((merchant_index.setdefault(e.get("description") or "", len(merchant_index))
+                                      for e in expenses), dtype=np.int32, count=len(expenses))
+        merchant_names = list(merchant_index)
+    merchant_totals = np.bincount(merchant_codes, weights=amounts, minlength=len(merchant_names))
+    merchant_counts = np.bincount(merchant_codes, minlength=len(merchant_names))
+
+    # The same robust detection as the detect_unusual_transactions tool, see tools/anomalies.py
+    unusual = unusual_transactions(expenses, limit=MAX_OUTLIER_CANDIDATES)
+
+    return {
+        "totals": engine.category_totals(),
+        "counts": dict(zip(categories, engine.counts.tolist())),
+        "day_totals": dict(zip(np.datetime_as_string(engine.days).tolist(), engine.day_totals.tolist())),
+        "merchants": {name: (total, count) for name, total, count
+                      in zip(merchant_names, merchant_totals.tolist(), merchant_counts.tolist())},
+        "outliers": unusual["unusual_transactions"][:MAX_OUTLIER_CANDIDATES],
+        "outliers_total": unusual["flagged_total"],
+        "rows": len(expenses),
+    }
+
+
+def _build(aggregates, handle, categories, granularity, merchants, outliers):
+    totals, counts, day_totals = aggregates["totals"], aggregates["counts"], aggregates["day_totals"]
+    grand_total = sum(totals.values())
+    days = sorted(day_totals)
+    summary = {
+        "handle": handle,
+        "rows": aggregates["rows"],
+        "first_date": days[0] if days else None,
+        "last_date": days[-1] if days else None,
+        "distinct_days": len(days),
+        "total_spent": round(grand_total, 2),
+        "categories": len(totals),
+    }
+
+    if categories:
+        ranked = sorted(totals, key=lambda category: -totals[category])
+        summary["by_category"] = {
+            category: {
+                "total": round(totals[category], 2),
+                "count": counts[category],
+                "mean": round(totals[category] / counts[category], 2),
+                "share_pct": round(100 * totals[category] / grand_total, 1) if grand_total else 0.0,
+            }
+            for category in ranked[:categories]
+        }
+        rest = ranked[categories:]
+        if rest:
+            summary["by_category"]["(other)"] = {
+                "categories": len(rest),
+                "total": round(sum(totals[category] for category in rest), 2),
+                "count": sum(counts[category] for category in rest),
+            }
+
+    if days and granularity:
+        if granularity == "auto":
+            granularity = _granularity(days[0], days[-1])
+        periods = defaultdict(float)
+        for day, amount in day_totals.items():
+            periods[_period(day, granularity)] += amount
+        summary["by_" + granularity] = {period: round(periods[period], 2) for period in sorted(periods)}
+
+    if merchants:
+        ranked = sorted(aggregates["merchants"].items(), key=lambda item: -item[1][0])[:merchants]
+        summary["top_merchants"] = [{"description": description, "total": round(total, 2), "count": count}
+                                    for description, (total, count) in ranked]
+
+    if outliers and aggregates["outliers"]:
+        summary["outlier_candidates"] = [
+            {"date": expense["date"], "category": expense["category"], "amount": expense["amount"],
+             "description": expense["description"], "robust_z": expense["robust_z"]}
+            for expense in aggregates["outliers"][:outliers]
+        ]
+        summary["outlier_candidates_total"] = aggregates["outliers_total"]
+    return summary
+
+
+def _granularity(first, last):
+    """Weeks for up to three months of data, months for up to three years, quarters beyond."""
+    span = (date.fromisoformat(last) - date.fromisoformat(first)).days
+    if span <= 92:
+        return "week"
+    return "month" if span <= 3 * 366 else "quarter"
+
+
+def _period(day, granularity):
+    if granularity == "week":
+        year, week, _ = date.fromisoformat(day).isocalendar()
+        return f"{year}-W{week:02d}"
+    if granularity == "month":
+        return day[:7]
+    if granularity == "quarter":
+        return f"{day[:4]}-Q{(int(day[5:7]) - 1) // 3 + 1}"
+    return day[:4]
@@ -0,0 +1,176 @@
+import logging
+import numpy as np
+
+
+REQUIRED_COLUMNS = ["date", "category", "amount", "description"]
+
+# Invalid rows kept with their line number and value for the report; the rest are only counted
+MAX_REPORTED_INVALID_ROWS = 100
+
+# Records decoded at a time when iterating over a table
+BATCH_ROWS = 10_000
+
+
+class ExpenseTable():
+
+    """
+    Expenses held as typed columns instead of one dict per row: days as datetime64[D],
+    amounts as float64 and dictionary-encoded categories and descriptions (int32 codes).
+    It still behaves like the list of expense dicts the tools used to return (len,
+    indexing, slicing, iteration), decoding records only when they are read.
+    Attributes
+    ----------
+    days : np.ndarray
+        Day of each expense.
+    category_codes : np.ndarray
+        Category code of each expense, indexing categories.
+    categories : list
+        Category names in order of first appearance.
+    amounts : np.ndarray
+        Amount of each expense.
+    description_codes : np.ndarray
+        Description code of each expense, indexing descriptions.
+    descriptions : list
+        Distinct descriptions.
+    invalid_rows : list
+        Up to MAX_REPORTED_INVALID_ROWS skipped rows as (line, column, value).
+    skipped : int
+        Number of rows skipped because of an invalid amount or date.
+    content_hash : str
+        SHA-256 of the columns once computed by tools/analytics_cache.py; the columns are never modified.
+    """
+
+    __slots__ = ("days", "category_codes", "categories", "amounts", "description_codes", "descriptions",
+                 "invalid_rows", "skipped", "content_hash")
+
+    def __init__(self, days, category_codes, categories, amounts, description_codes, descriptions,
+                 invalid_rows=None, skipped=0):
+        self.days = days
+        self.category_codes = category_codes
+        self.categories = categories
+        self.amounts = amounts
+        self.description_codes = description_codes
+        self.descriptions = descriptions
+        self.invalid_rows = invalid_rows or []
+        self.skipped = skipped
+        self.content_hash = None
+
+    def __len__(self):
+        return len(self.amounts)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.take(np.arange(len(self))[index])
+        return {
+            "date": str(self.days[index]),
+            "category": self.categories[self.category_codes[index]],
+            "amount": float(self.amounts[index]),
+            "description": self.descriptions[self.description_codes[index]],
+        }
+
+    def __iter__(self):
+        for start in range(0, len(self), BATCH_ROWS):
+            end = start + BATCH_ROWS
+            dates = np.datetime_as_string(self.days[start:end]).tolist()
+            categories = [self.categories[code] for code in self.category_codes[start:end].tolist()]
+            descriptions = [self.descriptions[code] for code in self.description_codes[start:end].tolist()]
+            for date, category, amount, description in zip(dates, categories, self.amounts[start:end].tolist(),
+                                                            descriptions):
+                yield {"date": date, "category": category, "amount": amount, "description": description}
+
+    def take(self, rows):
+        """Returns a table of the given row offsets, sharing the dictionaries."""
+        return ExpenseTable(self.days[rows], self.category_codes[rows], self.categories, self.amounts[rows],
+                            self.description_codes[rows], self.descriptions)
+
+    def to_records(self):
+        return list(self)
+
+    def to_frame(self):
+        import pandas as pd
+
+        return pd.DataFrame({
+            "date": np.datetime_as_string(self.days),
+            "category": pd.Categorical.from_codes(self.category_codes, categories=self.categories),
+            "amount": self.amounts,
+            "description": pd.Categorical.from_codes(self.description_codes, categories=self.descriptions),
+        })
+
+
+def read_expenses_csv(filepath, label=None):
+    """
+    Loads and validates an expenses CSV file into an ExpenseTable with vectorized parsing:
+    dates, categories and descriptions are read as categoricals so each distinct date is
+    parsed once, amounts are parsed as one float column. Rows with an invalid amount or
+    date are skipped and reported in one warning. The rows are sorted by date, unless the
+    file already is.
+    Args:
+        filepath (str): Path of the CSV file, or a binary file object.
+        label (str): How the data is named in the warning about invalid rows, defaults to filepath.
+    Raises:
+        FileNotFoundError: The file does not exist.
+        KeyError: A required column is missing.
+    """
+    import pandas as pd
+
+    text_columns = {"date": "category", "category": "category", "description": "category"}
+    try:
+        frame = pd.read_csv(filepath, dtype=text_columns, keep_default_na=False, na_values={"amount": [""]})
+    except FileNotFoundError:
+        raise FileNotFoundError(f"CSV file not found: {filepath}")
+    except pd.errors.EmptyDataError:
+        frame = pd.DataFrame({name: pd.Series(dtype=text_columns.get(name, "float64")) for name in REQUIRED_COLUMNS})
+    for name in REQUIRED_COLUMNS:
+        if name not in frame.columns:
+            raise KeyError(f"Missing required column: '{name}'")
+
+    amounts = pd.to_numeric(frame["amount"], errors="coerce").to_numpy(dtype=np.float64)
+    date_values = frame["date"].cat
+    parsed = pd.to_datetime(pd.Series(date_values.categories, dtype=object), format="%Y-%m-%d", errors="coerce")
+    date_codes = date_values.codes.to_numpy()
+    valid_dates = np.append(parsed.notna().to_numpy(), False)[date_codes]
+    days = np.append(parsed.to_numpy().astype("datetime64[D]"), np.datetime64("NaT"))[date_codes]
+
+    bad_amount = np.isnan(amounts)
+    bad_date = ~bad_amount & ~valid_dates
+    invalid = bad_amount | bad_date
+    invalid_rows = []
+    if invalid.any():
+        invalid_rows = _report_invalid_rows(label or filepath, frame, bad_amount, bad_date)
+
+    keep = np.flatnonzero(~invalid)
+    days = days[keep]
+    # Stable sort by date, skipped when the file is already in date order
+    if len(days) > 1 and not (days[1:] >= days[:-1]).all():
+        order = np.argsort(days, kind="stable")
+        keep, days = keep[order], days[order]
+
+    category_codes, categories = _first_appearance(frame["category"].cat, keep)
+    description_codes, descriptions = _first_appearance(frame["description"].cat, keep)
+    return ExpenseTable(days, category_codes, categories, amounts[keep], description_codes, descriptions,
+                        invalid_rows, int(invalid.sum()))
+
+
+def _report_invalid_rows(filepath, frame, bad_amount, bad_date):
+    """Logs one warning for all skipped rows and returns the first ones as (line, column, value)."""
+    rows = np.flatnonzero(bad_amount | bad_date)
+    reported = []
+    for row in rows[:MAX_REPORTED_INVALID_ROWS].tolist():
+        column = "amount" if bad_amount[row] else "date"
+        # Line numbers count the header as line 1, like csv.DictReader
+        reported.append((row + 2, column, str(frame[column].iloc[row])))
+    logging.warning("Skipped %d rows of %s with an invalid amount (%d) or date format (%d), first ones: %s",
+                    len(rows), filepath, int(bad_amount.sum()), int(bad_date.sum()),
+                    ", ".join(f"line {line} {column} '{value}'" for line, column, value in reported[:10]))
+    return reported
+
+
+def _first_appearance(values, rows):
+    """Re-encodes a categorical column for the kept rows, codes numbered by first appearance."""
+    codes = values.codes.to_numpy()[rows].astype(np.int32)
+    names = values.categories.tolist()
+    used, first = np.unique(codes, return_index=True)
+    order = used[np.argsort(first)]
+    remap = np.zeros(len(names), dtype=np.int32)
+    remap[order] = np.arange(len(order), dtype=np.int32)
+    return remap[codes], [names[code] for code in order.tolist()]
@@ -0,0 +1,159 @@
+import copy
+import logging
+import random
+import threading
+import time
+from collections import deque
+from crewai import LLM
+from crew_common.tokens import count_tokens
+
+
+# Default OpenAI budgets shared by every crew of a batch run
+DEFAULT_RPM = 500
+DEFAULT_TPM = 90_000
+
+# Tokens reserved for the completion of a call until its actual size is known
+COMPLETION_TOKEN_ESTIMATE = 500
+
+# Backoff after a rate-limit error: doubling from BACKOFF_SECONDS up to MAX_BACKOFF_SECONDS
+BACKOFF_SECONDS = 1.0
+MAX_BACKOFF_SECONDS = 60.0
+MAX_RETRIES = 6
+
+# Length of the sliding window the budgets apply to
+WINDOW_SECONDS = 60.0
+
+
+class LLMScheduler():
+
+    """
+    Admits model calls within a requests-per-minute and a tokens-per-minute budget, over a
+    sliding one-minute window, for every thread of the process. A call waits until both
+    budgets have room for it; a rate-limit error from the API pauses all callers with an
+    exponential backoff before the call is retried.
+    Attributes
+    ----------
+    rpm : int
+        Requests allowed per minute.
+    tpm : int
+        Tokens (prompt and completion) allowed per minute.
+    Methods
+    -------
+    call(fn, tokens):
+        Runs fn() once the budgets allow a call of the given estimated size, retrying on rate-limit
+        errors, and returns its result with the admitted window entry.
+    settle(entry, tokens):
+        Corrects the window entry of a finished call to its actual number of tokens.
+    stats():
+        Returns the call, token, wait and retry counters.
+    """
+
+    def __init__(self, rpm=DEFAULT_RPM, tpm=DEFAULT_TPM):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.calls = 0
+        self.tokens = 0
+        self.retries = 0
+        self.wait_seconds = 0.0
+        self._window = deque()
+        self._window_tokens = 0
+        self._paused_until = 0.0
+        self._condition = threading.Condition()
+
+    def call(self, fn, tokens):
+        for attempt in range(MAX_RETRIES + 1):
+            entry = self._acquire(tokens)
+            try:
+                return fn(), entry
+            except Exception as e:
+                if attempt == MAX_RETRIES or not is_rate_limit_error(e):
+                    raise
+                delay = min(BACKOFF_SECONDS * 2 ** attempt, MAX_BACKOFF_SECONDS) * random.uniform(0.5, 1.0)
+                logging.warning("Rate limited by the model API, retrying in %.1fs (attempt %d)", delay, attempt + 1)
+                with self._condition:
+                    self.retries += 1
+                    self._paused_until = max(self._paused_until, time.monotonic() + delay)
+
+    def settle(self, entry, tokens):
+        """Replaces the estimated size of an admitted call with its actual number of tokens."""
+        with self._condition:
+            self.tokens += tokens - entry[1]
+            if entry in self._window:
+                self._window_tokens += tokens - entry[1]
+            entry[1] = tokens
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {"calls": self.calls, "tokens": self.tokens, "retries": self.retries,
+                    "wait_seconds": round(self.wait_seconds, 1), "rpm": self.rpm, "tpm": self.tpm}
+
+    def _acquire(self, tokens):
+        start = time.monotonic()
+        with self._condition:
+            while True:
+                now = time.monotonic()
+                while self._window and self._window[0][0] <= now - WINDOW_SECONDS:
+                    self._window_tokens -= self._window.popleft()[1]
+
+                if now < self._paused_until:
+                    wait = self._paused_until - now
+                elif len(self._window) < self.rpm and (self._window_tokens + tokens <= self.tpm or not self._window):
+                    # A call larger than the whole budget is admitted alone rather than never
+                    entry = [now, tokens]
+                    self._window.append(entry)
+                    self._window_tokens += tokens
+                    self.calls += 1
+                    self.tokens += tokens
+                    self.wait_seconds += now - start
+                    return entry
+                else:
+                    wait = self._window[0][0] + WINDOW_SECONDS - now
+                self._condition.wait(max(wait, 0.01))
+
+
+class ScheduledLLM(LLM):
+
+    """
+    Wraps the LLM of the agents so each of its calls goes through an LLMScheduler.
+    Attributes
+    ----------
+    llm : LLM
+        The model actually called.
+    scheduler : LLMScheduler
+        Scheduler shared by every ScheduledLLM of the process.
+    """
+
+    def __init__(self, llm, scheduler):
+        super().__init__(model=llm.model, temperature=llm.temperature)
+        self.llm = llm
+        self.scheduler = scheduler
+
+    def call(self, messages, tools=None, callbacks=None, available_functions=None):
+        prompt = messages if isinstance(messages, str) else "\n".join(
+            str(message.get("content", "")) for message in messages)
+        prompt_tokens = count_tokens(prompt)
+
+        # CrewAI sets the stop words on the LLM of the agent, this one. The inner LLM may be
+        # shared by agents running on other threads, so each call gets its own copy
+        llm = copy.copy(self.llm)
+        llm.stop = self.stop
+        response, entry = self.scheduler.call(
+            lambda: llm.call(messages, tools=tools, callbacks=callbacks, available_functions=available_functions),
+            prompt_tokens + COMPLETION_TOKEN_ESTIMATE)
+        self.scheduler.settle(entry, prompt_tokens + count_tokens(str(response)))
+        return response
+
+    def supports_function_calling(self):
+        return self.llm.supports_function_calling()
+
+    def supports_stop_words(self):
+        return self.llm.supports_stop_words()
+
+    def get_context_window_size(self):
+        return self.llm.get_context_window_size()
+
+
+def is_rate_limit_error(error):
+    """True for HTTP 429 errors of the OpenAI client or LiteLLM, whatever their exception class."""
+    return getattr(error, "status_code", None) == 429 or "RateLimit" in type(error).__name__
@@ -0,0 +1,128 @@
+import re
+import numpy as np
+from tools.expense_engine import encode_expenses
+from tools.expense_table import ExpenseTable
+
+
+# Frequencies recognized from the typical number of days between two occurrences: (name, days, tolerance)
+PERIODS = [
+    ("daily", 1, 0),
+    ("weekly", 7, 1),
+    ("biweekly", 14, 2),
+    ("monthly", 30, 3),
+    ("quarterly", 91, 7),
+    ("yearly", 365, 10),
+]
+
+# Fewest distinct days a merchant must appear on, and share of its gaps that must match the period
+MIN_OCCURRENCES = 3
+MIN_REGULARITY = 0.7
+
+# Recurring expenses returned, most costly per year first
+MAX_RECURRING = 20
+
+
+def detect_recurring_expenses(expenses, limit=MAX_RECURRING):
+    """
+    Finds recurring expenses: transactions are grouped by category and normalized description
+    (lower case, digits and punctuation removed, so "NETFLIX.COM 0423" matches "Netflix.com 0517"),
+    the distinct days of each group are sorted and the median gap between them is matched to a
+    period. A group is recurring when it appears on MIN_OCCURRENCES days and at least
+    MIN_REGULARITY of its gaps are within the tolerance of that period. Everything is a few
+    sorts over all rows, so the result is deterministic and millions of rows take well under a second.
+    Args:
+        expenses (List[Dict]): Expense records or an ExpenseTable.
+        limit (int): Maximum number of recurring expenses returned.
+    Returns:
+        List[Dict]: category, frequency and typical_amount (the median amount) of each recurring
+            expense, with its description, occurrences, last date and estimated annual cost.
+    """
+    if not len(expenses):
+        return []
+    codes, _, days, amounts = encode_expenses(expenses)
+    if isinstance(expenses, ExpenseTable):
+        description_codes, descriptions = expenses.description_codes, expenses.descriptions
+    else:
+        index = {}
+        description_codes = np.fromiter((index.setdefault(e.get("description") or "", len(index)) for e in expenses),
+                                        dtype=np.int32, count=len(expenses))
+        descriptions = list(index)
+
+    # Normalize each distinct description once, then group rows by (category, normalized description)
+    normalized = {}
+    merchant_codes = np.array([normalized.setdefault(normalize_description(name), len(normalized))
+                               for name in descriptions], dtype=np.int64)
+    keys = codes.astype(np.int64) * max(len(normalized), 1) + merchant_codes[description_codes]
+    day_numbers = days.astype(np.int64)
+
+    # Distinct (group, day) pairs packed into one int64, in order of group then day,
+    # and the gaps between the consecutive days of a group
+    first_day = day_numbers.min()
+    span = int(day_numbers.max() - first_day) + 1
+    pairs = np.unique(keys * span + (day_numbers - first_day))
+    pair_keys, pair_days = pairs // span, pairs % span
+    group_keys, group_index, occurrences = np.unique(pair_keys, return_inverse=True, return_counts=True)
+    same_group = pair_keys[1:] == pair_keys[:-1]
+    gap_groups = group_index[1:][same_group]
+    gaps = (pair_days[1:] - pair_days[:-1])[same_group]
+
+    median_gaps = _group_medians(gap_groups, gaps, len(group_keys))
+    periods = np.full(len(group_keys), -1)
+    for number, (_, period_days, tolerance) in enumerate(PERIODS):
+        periods[np.abs(median_gaps - period_days) <= tolerance] = number
+    candidates = (occurrences >= MIN_OCCURRENCES) & (periods >= 0)
+
+    period_days = np.array([period[1] for period in PERIODS])
+    tolerances = np.array([period[2] for period in PERIODS])
+    gap_periods = periods[gap_groups]
+    matching = (gap_periods >= 0) & (np.abs(gaps - period_days[gap_periods]) <= tolerances[gap_periods])
+    regularity = (np.bincount(gap_groups, weights=matching, minlength=len(group_keys))
+                  / np.maximum(occurrences - 1, 1))
+    recurring = np.flatnonzero(candidates & (regularity >= MIN_REGULARITY))
+    if not len(recurring):
+        return []
+
+    # Typical amount and last occurrence, only over the rows of the recurring groups
+    row_groups = np.searchsorted(group_keys, keys)
+    rows = np.flatnonzero(np.isin(row_groups, recurring))
+    typical = _group_medians(row_groups[rows], amounts[rows], len(group_keys))
+    last_days = np.zeros(len(group_keys), dtype=np.int64)
+    np.maximum.at(last_days, row_groups[rows], day_numbers[rows])
+    first_rows = np.full(len(group_keys), len(keys), dtype=np.int64)
+    np.minimum.at(first_rows, row_groups[rows], rows)
+
+    annual = typical[recurring] * 365 / period_days[periods[recurring]]
+    order = np.argsort(-annual, kind="stable")[:limit]
+    results = []
+    for group, annual_cost in zip(recurring[order].tolist(), annual[order].tolist()):
+        expense = expenses[int(first_rows[group])]
+        period = int(periods[group])
+        results.append({
+            "category": expense["category"],
+            "frequency": PERIODS[period][0],
+            "typical_amount": round(float(typical[group]), 2),
+            "description": expense.get("description"),
+            "occurrences": int(occurrences[group]),
+            "last_date": str(np.datetime64(int(last_days[group]), "D")),
+            "annual_cost": round(annual_cost, 2),
+        })
+    return results
+
+
+def normalize_description(description):
+    """Lower case words of a description, without digits and punctuation."""
+    return " ".join(re.sub(r"[^a-z]+", " ", (description or "").lower()).split())
+
+
+def _group_medians(groups, values, size):
+    """Median of values per group code in one lexsort; 0 for the groups without values."""
+    order = np.lexsort((values, groups))
+    counts = np.bincount(groups, minlength=size)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    medians = np.zeros(size)
+    present = counts > 0
+    sorted_values = values[order].astype(np.float64)
+    low = starts[present] + (counts[present] - 1) // 2
+    high = starts[present] + counts[present] // 2
+    medians[present] = (sorted_values[low] + sorted_values[high]) / 2
+    return medians
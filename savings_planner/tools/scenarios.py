@@ -0,0 +1,34 @@
+import numpy as np
+
+
+def rank_scenarios(aggregates, scenarios):
+    """
+    Projects every what-if scenario in one matrix product against the precomputed category
+    totals and ranks them by annual savings.
+    Args:
+        aggregates (ExpenseAggregates): Aggregates of the expenses.
+        scenarios (Union[List[Dict], Dict[str, Dict]]): Reduction targets (percent per category),
+            as a list or keyed by scenario name.
+    Returns:
+        List[Dict]: One row per scenario, best first, with its rank, name, annual and monthly
+            savings, the share of total spending saved and the targets applied.
+    """
+    if isinstance(scenarios, dict):
+        names, scenarios = list(scenarios), list(scenarios.values())
+    else:
+        names = [f"scenario_{number}" for number in range(1, len(scenarios) + 1)]
+
+    annual = aggregates.project_scenarios(aggregates.target_matrix(scenarios))
+    yearly_spending = aggregates.total / aggregates.distinct_days * 365 if aggregates.distinct_days else 0.0
+    order = np.argsort(-annual, kind="stable")
+    return [
+        {
+            "rank": rank,
+            "scenario": names[index],
+            "annual_savings": round(float(annual[index]), 2),
+            "monthly_savings": round(float(annual[index]) / 12, 2),
+            "share_of_spending_pct": round(100 * float(annual[index]) / yearly_spending, 1) if yearly_spending else 0.0,
+            "reduction_targets": scenarios[index],
+        }
+        for rank, index in enumerate(order.tolist(), start=1)
+    ]
@@ -0,0 +1,75 @@
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+# Default number of tasks of one graph running at the same time
+MAX_PARALLEL_TASKS = 4
+
+
+class TaskGraph():
+
+    """
+    Runs CrewAI tasks as a dependency graph instead of a sequence: the dependencies of a task
+    are its `context` tasks, and every task starts in its own one-task crew as soon as they have
+    finished, so independent tasks run concurrently and the wall time follows the longest chain
+    of dependencies rather than the sum of all tasks.
+    CrewAI hands the outputs of the context tasks to the task's agent, as in a sequential crew.
+    Attributes
+    ----------
+    tasks : dict
+        Maps a task name to its Task, in an order where dependencies come first.
+    max_workers : int
+        Maximum number of tasks running at the same time.
+    Methods
+    -------
+    run():
+        Runs every task and returns {name: raw output}.
+    """
+
+    def __init__(self, tasks, max_workers=MAX_PARALLEL_TASKS, verbose=False, task_callback=None):
+        self.tasks = tasks
+        self.max_workers = max_workers
+        self.verbose = verbose
+        self.task_callback = task_callback
+        self.timings = {}
+
+        position = {id(task): index for index, task in enumerate(tasks.values())}
+        for name, task in tasks.items():
+            for dependency in task.context or []:
+                if position.get(id(dependency), len(position)) >= position[id(task)]:
+                    raise ValueError(f"Task '{name}' depends on a task that is not listed before it.")
+
+    def run(self):
+        names = {id(task): name for name, task in self.tasks.items()}
+        futures = {}
+        # Tasks are submitted in dependency order, so a task waiting for its context never
+        # holds the only worker its dependencies could run on
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="crew-task") as executor:
+            for name, task in self.tasks.items():
+                waits = [futures[names[id(dependency)]] for dependency in task.context or []]
+                futures[name] = executor.submit(self._run_task, name, task, waits)
+            return {name: future.result() for name, future in futures.items()}
+
+    def _run_task(self, name, task, waits):
+        from crewai import Crew, Process
+
+        for wait in waits:
+            # Re-raises the error of a failed dependency
+            wait.result()
+
+        start = time.perf_counter()
+        # Concurrent tasks of the same agent each get their own copy, agents are not thread-safe.
+        # The copy is only lent to the task: the outputs of the dependencies are read from the
+        # caller's Task objects, so the task itself is kept and its agent put back afterwards
+        agent = task.agent
+        task.agent = agent.copy()
+        try:
+            crew = Crew(agents=[task.agent], tasks=[task], process=Process.sequential, verbose=self.verbose,
+                        task_callback=self.task_callback)
+            output = crew.kickoff()
+        finally:
+            task.agent = agent
+        self.timings[name] = round(time.perf_counter() - start, 3)
+        logging.info("Task %s finished in %.1fs", name, self.timings[name])
+        return output.raw
@@ -1,8 +1,10 @@
-from typing import List, Dict
-import csv
-from datetime import datetime
-from collections import defaultdict
+from typing import List, Dict, Union
 from langchain.tools import tool
+from crew_common.artifact_store import artifacts
+from tools import analytics_cache
+from tools.anomalies import ROBUST_Z_THRESHOLD
+from tools.expense_ledger import ExpenseLedger
+from tools.expense_table import read_expenses_csv
 import logging
 
 # Configure logging
@@ -19,7 +21,7 @@ class FinancialTools:
             filepath (str): Path to the CSV file containing expense data
             
         Returns:
-            List[Dict]: List of validated expense records
+            List[Dict]: The validated expense records sorted by date, as an ExpenseTable of typed columns
             
         The CSV file must have the following columns:
         - date: Date in YYYY-MM-DD format
@@ -27,115 +29,105 @@ class FinancialTools:
         - amount: Numeric amount
         - description: Transaction description
         """
-        expenses = []
-        try:
-            with open(filepath, 'r') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    # Validate and convert amount to float
-                    try:
-                        amount = float(row['amount'])
-                    except ValueError:
-                        print(f"Warning: Invalid amount '{row['amount']}' in row {reader.line_num}")
-                        continue
-
-                    # Validate date format
-                    try:
-                        datetime.strptime(row['date'], '%Y-%m-%d')
-                    except ValueError:
-                        print(f"Warning: Invalid date format '{row['date']}' in row {reader.line_num}")
-                        continue
-
-                    expense = {
-                        'date': row['date'],
-                        'category': row['category'],
-                        'amount': amount,
-                        'description': row['description']
-                    }
-                    expenses.append(expense)
-        except FileNotFoundError:
-            raise FileNotFoundError(f"CSV file not found: {filepath}")
-        except KeyError as e:
-            raise KeyError(f"Missing required column: {e}")
-
-        expenses = sorted(expenses, key=lambda x: x['date'])
-        return expenses
+        return read_expenses_csv(filepath)
 
     @tool("calculate_category_totals")
-    def calculate_category_totals(expenses: List[Dict]) -> Dict[str, float]:
+    def calculate_category_totals(expenses: Union[str, List[Dict]]) -> Dict[str, float]:
         """Calculate the total spending for each expense category.
         
         Args:
-            expenses (List[Dict]): List of expense records
+            expenses (Union[str, List[Dict]]): Expenses handle (artifact://...) or list of expense records
             
         Returns:
             Dict[str, float]: Dictionary mapping categories to their total amounts
         """
-        totals = defaultdict(float)
-        for expense in expenses:
-            totals[expense["category"]] += expense["amount"]
-        
-        return dict(totals)
+        return analytics_cache.category_totals(artifacts.resolve(expenses))
 
     @tool("calculate_daily_averages")
-    def calculate_daily_averages(expenses: List[Dict]) -> Dict[str, float]:
+    def calculate_daily_averages(expenses: Union[str, List[Dict]]) -> Dict[str, float]:
         """Calculate the average daily spending for each category.
         
         Args:
-            expenses (List[Dict]): List of expense records
+            expenses (Union[str, List[Dict]]): Expenses handle (artifact://...) or list of expense records
             
         Returns:
             Dict[str, float]: Dictionary mapping categories to their daily average spending
         """
-        category_totals = defaultdict(float)
-        category_counts = defaultdict(int)
-        
-        for expense in expenses:
-            category = expense["category"]
-            category_totals[category] += expense["amount"]
-            category_counts[category] += 1
+        return analytics_cache.category_means(artifacts.resolve(expenses))
+
+    @tool("detect_unusual_transactions")
+    def detect_unusual_transactions(expenses: Union[str, List[Dict]], threshold: float = ROBUST_Z_THRESHOLD) -> Dict:
+        """Flag the transactions whose amount is unusual for their category, with the reason.
+        Use this instead of reading the transactions to find unusual ones.
         
-        averages = {
-            category: total / count
-            for category, total in category_totals.items()
-            for count in [category_counts[category]]
-        }
+        Args:
+            expenses (Union[str, List[Dict]]): Expenses handle (artifact://...) or list of expense records
+            threshold (float): Robust z-score (distance to the category median in scaled MADs) above
+                which a transaction is flagged, 3.5 by default
+            
+        Returns:
+            Dict: flagged_total and the most unusual transactions, each with date, category, amount,
+                description, robust_z and reason_flagged
+        """
+        expenses = artifacts.resolve(expenses)
+        if isinstance(expenses, ExpenseLedger):
+            raise ValueError("Unusual transactions are not available in ledger mode, the rows are not kept.")
+        return analytics_cache.unusual_transactions(expenses, threshold)
+
+    @tool("detect_recurring_expenses")
+    def detect_recurring_expenses(expenses: Union[str, List[Dict]]) -> List[Dict]:
+        """Find the recurring expenses (weekly, monthly, ...) from the gaps between their dates.
+        Use this instead of reading the transactions to find recurring ones.
         
-        return averages
+        Args:
+            expenses (Union[str, List[Dict]]): Expenses handle (artifact://...) or list of expense records
+            
+        Returns:
+            List[Dict]: Recurring expenses, most costly per year first, each with category, frequency,
+                typical_amount, description, occurrences, last_date and annual_cost
+        """
+        expenses = artifacts.resolve(expenses)
+        if isinstance(expenses, ExpenseLedger):
+            raise ValueError("Recurring expenses are not available in ledger mode, the rows are not kept.")
+        return analytics_cache.recurring_expenses(expenses)
 
     @tool("project_annual_savings")
     def project_annual_savings(reduction_targets: Dict[str, float], 
-                               expenses: List[Dict]) -> float:
+                               expenses: Union[str, List[Dict]]) -> float:
         """Project potential annual savings based on reduction targets for each category.
         
         Args:
             reduction_targets (Dict[str, float]): Percentage reduction targets per category
-            expenses (List[Dict]): List of expense records
+            expenses (Union[str, List[Dict]]): Expenses handle (artifact://...) or list of expense records
             
         Returns:
             float: Projected annual savings amount
         """
+        expenses = artifacts.resolve(expenses)
        
-        #logging.info("Received reduction_targets: %s", type(reduction_targets))
-        #logging.info("Received expenses: %s", type(expenses))
-        logging.info("Received expenses: %s", expenses)
+        # Only the size is logged; the expenses themselves can be millions of rows
+        logging.debug("Received reduction_targets %s for %d expenses", reduction_targets, len(expenses))
         
-        data = {
-            "expenses":[]
-        }
-        data["expenses"].extend(expenses)
-        category_totals = FinancialTools.calculate_category_totals(data)
-        
-        # Calculate potential savings
-        total_savings = 0
-        for category, target in reduction_targets.items():
-            if category in category_totals:
-                savings = category_totals[category] * (target / 100)
-                total_savings += savings
-        
-        # Extrapolate to annual savings
-        days_in_data = len(set(expense["date"] for expense in data['expenses']))
-        annual_savings = (total_savings / days_in_data) * 365
+        # Savings of the category totals, extrapolated from the distinct days in the data to a year
+        annual_savings = analytics_cache.annual_savings(expenses, reduction_targets)
 
         logging.info("annual_savings==>: %s", annual_savings)
-        return round(annual_savings, 2)
+        return annual_savings
+
+    @tool("compare_savings_scenarios")
+    def compare_savings_scenarios(scenarios: Union[List[Dict[str, float]], Dict[str, Dict[str, float]]],
+                                  expenses: Union[str, List[Dict]]) -> List[Dict]:
+        """Project the annual savings of several what-if scenarios at once and rank them.
+        Prefer this over calling project_annual_savings once per set of targets.
+        
+        Args:
+            scenarios (Union[List[Dict[str, float]], Dict[str, Dict[str, float]]]): Percentage reduction
+                targets per category for each scenario, as a list or keyed by scenario name
+            expenses (Union[str, List[Dict]]): Expenses handle (artifact://...) or list of expense records
+            
+        Returns:
+            List[Dict]: Scenarios ranked by annual savings, with monthly savings and share of spending saved
+        """
+        expenses = artifacts.resolve(expenses)
+        logging.debug("Comparing %d savings scenarios for %d expenses", len(scenarios), len(expenses))
+        return analytics_cache.savings_scenarios(expenses, scenarios)